@@ -0,0 +1,7 @@
+"""
+Performance benchmarks for the compiler front-end.
+
+Run each one as a module from the repository root, for example:
+
+`python3 -m benchmarks.bench_lexer`
+"""
@@ -0,0 +1,60 @@
+"""
+Batch compilation time against the number of worker processes.
+
+Writes `--files` synthetic sources to a temporary directory and
+compiles the batch with 1, 2, 4, ... up to `--max-jobs` workers,
+checking that every run writes the same bytes as the serial one.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.common import synthetic_source
+from compiler.driver import compile_batch
+
+
+def read_outputs(results) -> list[bytes]:
+    outputs = []
+    for r in results:
+        with open(r.output, "rb") as f:
+            outputs.append(f.read())
+    return outputs
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--files", type=int, default=32)
+    ap.add_argument("--size", type=int, default=100_000, help="bytes per source")
+    ap.add_argument("--max-jobs", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = []
+        for i in range(args.files):
+            sources.append(os.path.join(tmp, "src%03d.txt" % i))
+            with open(sources[-1], "w", encoding="utf-8") as f:
+                f.write(synthetic_source(args.size))
+
+        print("%4s %10s %8s %10s" % ("jobs", "seconds", "speedup", "identical"))
+        serial = None
+        jobs = 1
+        while jobs <= args.max_jobs:
+            out_dir = os.path.join(tmp, "out%d" % jobs)
+            start = time.perf_counter()
+            results = compile_batch(sources, out_dir=out_dir, jobs=jobs)
+            seconds = time.perf_counter() - start
+            outputs = read_outputs(results)
+            if serial is None:
+                serial = (seconds, outputs)
+            print(
+                "%4d %10.3f %8.2f %10s"
+                % (jobs, seconds, serial[0] / seconds, outputs == serial[1])
+            )
+            jobs *= 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""
+Scaling of the control-flow graph analyses with the size of the code.
+
+Compiles synthetic programs of doubling size, up to `--max`
+instructions, and times building the graph, its dominators and its
+natural loops. The time per instruction should stay flat.
+"""
+
+import argparse
+import sys
+import time
+
+from benchmarks.common import synthetic_source
+from compiler.cfg import CFG
+from compiler.context import CompilationContext
+from compiler.ir import Code
+from compiler.lexer import Lexer
+from compiler.parser import Parser
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--max", type=int, default=1 << 20, help="largest code, in instructions")
+    args = ap.parse_args()
+
+    print(
+        "%10s %8s %8s %9s %9s %9s %10s"
+        % ("instrs", "blocks", "loops", "graph", "idom", "loops", "us/instr")
+    )
+    size = 1 << 16
+    n = 0
+    while n < args.max:
+        code = Code()
+        ctx = CompilationContext(out=code)
+        Parser(Lexer(synthetic_source(size), ctx=ctx)).program()
+        n = len(code)
+        start = time.perf_counter()
+        cfg = CFG(code.instrs)
+        built = time.perf_counter()
+        cfg.idom
+        dominators = time.perf_counter()
+        loops = cfg.loops()
+        end = time.perf_counter()
+        print(
+            "%10d %8d %8d %8.3fs %8.3fs %8.3fs %10.2f"
+            % (
+                n,
+                len(cfg),
+                len(loops),
+                built - start,
+                dominators - built,
+                end - dominators,
+                (end - start) / n * 1e6,
+            )
+        )
+        size *= 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Code emission throughput for each output sink.
+
+Compiles a synthetic program once, then replays its instructions
+into each sink, writing to a file: `print()` per instruction (how the
+compiler used to emit), a buffered `TextSink`, a `Code` list written
+in one go, and a `NullSink`. The sinks that print must produce the
+same bytes.
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+
+from benchmarks.common import best_of, synthetic_source
+from compiler.context import CompilationContext
+from compiler.ir import Code, NullSink, Sink, TextSink, format_instr, LABEL
+from compiler.lexer import Lexer
+from compiler.parser import Parser
+
+
+class PrintSink(Sink):
+    "One `print()` per instruction, as `Node.emit` used to do."
+
+    def emit(self, instr: tuple) -> None:
+        text = format_instr(instr)
+        if instr[0] == LABEL:
+            print(text, end="")
+        else:
+            print(text[1:-1].join(["\t", ""]))
+
+
+def replay(code: Code, path: str, make_sink) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        sink = make_sink(f)
+        with contextlib.redirect_stdout(f):
+            for instr in code:
+                sink.emit(instr)
+            sink.flush()
+        if isinstance(sink, Code):
+            sink.write(f)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--size", type=int, default=2 << 20, help="source size in bytes")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    code = Code()
+    Parser(Lexer(synthetic_source(args.size), ctx=CompilationContext(out=code))).program()
+    print("%d instructions" % len(code))
+    sinks = {
+        "print() per instr": lambda f: PrintSink(),
+        "TextSink": TextSink,
+        "Code + write()": lambda f: Code(),
+        "NullSink": lambda f: NullSink(),
+    }
+    outputs = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, make_sink in sinks.items():
+            path = os.path.join(tmp, "out.tac")
+            seconds = best_of(args.repeat, lambda: replay(code, path, make_sink))
+            with open(path, "rb") as f:
+                outputs[name] = f.read()
+            print(
+                "%-18s %8.3f s %12.0f instr/s %8.1f MB/s"
+                % (name, seconds, len(code) / seconds, len(outputs[name]) / seconds / 1e6)
+            )
+    printed = {out for name, out in outputs.items() if name != "NullSink"}
+    print("identical output: %s" % (len(printed) == 1))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
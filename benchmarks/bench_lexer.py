@@ -0,0 +1,79 @@
+"""
+Lexer throughput, in tokens per second.
+
+Compares reading a file one character per call (`block_size=1`,
+the I/O pattern of the old `f.read(1)` scanner), block reads from
+the same file, a source handed over as a whole `str`, and the
+master-pattern `RegexLexer` backend.
+`--against REV` also times the lexer as it was at git revision `REV`.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import types
+
+from benchmarks.common import best_of, synthetic_source
+from compiler.lexer import Lexer, RegexLexer
+
+
+def count_tokens(lexer) -> int:
+    n = 0
+    while lexer.scan() is not None:
+        n += 1
+    return n
+
+
+def load_lexer(rev: str) -> type:
+    """The `Lexer` class from `compiler/lexer.py` at revision `rev`."""
+    src = subprocess.run(
+        ["git", "show", "%s:compiler/lexer.py" % rev],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    module = types.ModuleType("lexer_" + rev)
+    exec(compile(src, "lexer@" + rev, "exec"), module.__dict__)
+    return module.Lexer
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--size", type=int, default=4 << 20, help="source size in bytes")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--against", metavar="REV", help="also time the lexer at REV")
+    args = ap.parse_args()
+
+    src = synthetic_source(args.size)
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as tmp:
+        tmp.write(src)
+
+    def from_file(make):
+        with open(tmp.name, "r", encoding="utf-8") as f:
+            return count_tokens(make(f))
+
+    modes = {
+        "read(1) per char": lambda: from_file(lambda f: Lexer(f, block_size=1)),
+        "64 KiB blocks": lambda: from_file(Lexer),
+        "whole str": lambda: count_tokens(Lexer(src)),
+        "regex, 64 KiB blocks": lambda: from_file(RegexLexer),
+        "regex, whole str": lambda: count_tokens(RegexLexer(src)),
+    }
+    if args.against:
+        old = load_lexer(args.against)
+        modes[args.against] = lambda: from_file(old)
+
+    try:
+        tokens = count_tokens(Lexer(src))
+        print("%d bytes, %d tokens" % (len(src), tokens))
+        for name, run in modes.items():
+            seconds = best_of(args.repeat, run)
+            print("%-20s %8.3f s %12.0f tokens/s" % (name, seconds, tokens / seconds))
+    finally:
+        os.unlink(tmp.name)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Memory taken by the syntax tree of a large program.
+
+Parses (without generating code) a program of `--statements`
+statements and reports the number of AST nodes, their average
+size, traced allocation per node, and the peak RSS of the process.
+"""
+
+import argparse
+import gc
+import resource
+import sys
+import tracemalloc
+
+from benchmarks.common import BODY, DECLS
+from compiler.intermediate import Node
+from compiler.lexer import Lexer
+from compiler.parser import Parser
+
+LOOPS_PER_BLOCK = 50
+
+
+def program(statements: int) -> str:
+    """
+    `statements` statements, as copies of the example loop
+    (eight statements each) grouped into blocks of 50 loops.
+    """
+    loops = max(1, statements // 8)
+    blocks = [
+        "{\n" + BODY * min(LOOPS_PER_BLOCK, loops - i) + "}\n"
+        for i in range(0, loops, LOOPS_PER_BLOCK)
+    ]
+    return "{\n" + DECLS + "".join(blocks) + "}\n"
+
+
+def object_size(o: object) -> int:
+    """Size of `o` including its instance `__dict__`, if it has one."""
+    size = sys.getsizeof(o)
+    d = getattr(o, "__dict__", None)
+    if d is not None:
+        size += sys.getsizeof(d)
+    return size
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--statements", type=int, default=100_000)
+    args = ap.parse_args()
+
+    src = program(args.statements)
+    tree = Parser(Lexer(src)).block()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    nodes = [o for o in gc.get_objects() if isinstance(o, Node)]
+    size = sum(map(object_size, nodes)) / len(nodes)
+    count = len(nodes)
+    del tree, nodes
+
+    # a second parse, traced, for everything allocated along with the tree
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    tree = Parser(Lexer(src)).block()
+    traced = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    print("statements:          %d" % args.statements)
+    print("AST nodes:           %d" % count)
+    print("bytes per node:      %.1f" % size)
+    print("traced bytes / node: %.1f" % (traced / count))
+    print("peak RSS:            %.1f MiB" % rss)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
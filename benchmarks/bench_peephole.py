@@ -0,0 +1,50 @@
+"""
+Size of the code before and after the peephole passes.
+
+Compiles a synthetic program at -O0, then runs `peephole()` over its
+instructions, reporting instruction and label counts, the size of the
+printed code and the time the passes take.
+"""
+
+import argparse
+import sys
+
+from benchmarks.common import best_of, synthetic_source
+from compiler.context import CompilationContext
+from compiler.ir import LABEL, Code, format_instr
+from compiler.lexer import Lexer
+from compiler.parser import Parser
+from compiler.peephole import peephole
+
+
+def counts(instrs: list[tuple]) -> tuple[int, int, int]:
+    "Instructions that are not labels, labels, and characters printed."
+    labels = sum(i[0] == LABEL for i in instrs)
+    return len(instrs) - labels, labels, len("".join(map(format_instr, instrs)))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--size", type=int, default=1 << 20, help="source size in bytes")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    code = Code()
+    Parser(Lexer(synthetic_source(args.size), ctx=CompilationContext(out=code))).program()
+    optimized = peephole(code.instrs)
+    seconds = best_of(args.repeat, lambda: peephole(code.instrs))
+
+    print("%-8s %12s %10s %12s" % ("", "instrs", "labels", "chars"))
+    before = counts(code.instrs)
+    after = counts(optimized)
+    print("%-8s %12d %10d %12d" % ("before", *before))
+    print("%-8s %12d %10d %12d" % ("after", *after))
+    print(
+        "%-8s %11.1f%% %9.1f%% %11.1f%%"
+        % ("removed", *(100 * (1 - a / b) for a, b in zip(after, before)))
+    )
+    print("peephole: %.3f s, %.0f instr/s" % (seconds, len(code) / seconds))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
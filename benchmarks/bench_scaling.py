@@ -0,0 +1,54 @@
+"""
+Compile time and memory against the length of one statement list.
+
+Compiles blocks of 1k, 10k, ... statements, up to `--max`, and
+reports time and traced peak memory per statement. Both stay flat
+when parsing and code generation grow linearly.
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+
+from compiler.context import CompilationContext
+from compiler.ir import NullSink
+from compiler.lexer import Lexer
+from compiler.parser import Parser
+
+STATEMENTS = ["i = i + 1;", "a[i] = x;", "if (i >= j) x = a[j];", "j = j - 1;"]
+
+
+def program(statements: int) -> str:
+    """One block of `statements` statements."""
+    body = "\n".join(STATEMENTS[i % len(STATEMENTS)] for i in range(statements))
+    return "{\nint i; int j; float x; float[100] a;\n" + body + "\n}\n"
+
+
+def compile_source(src: str) -> None:
+    Parser(Lexer(src, ctx=CompilationContext(out=NullSink()))).program()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--max", type=int, default=100_000, help="largest statement count")
+    args = ap.parse_args()
+
+    print("%10s %10s %12s %14s" % ("statements", "seconds", "us/stmt", "peak B/stmt"))
+    n = 1000
+    while n <= args.max:
+        src = program(n)
+        start = time.perf_counter()
+        compile_source(src)
+        seconds = time.perf_counter() - start
+
+        tracemalloc.start()
+        compile_source(src)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print("%10d %10.3f %12.2f %14.1f" % (n, seconds, seconds / n * 1e6, peak / n))
+        n *= 10
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+Throughput and peak memory of lexing, parsing and compiling, against baselines.
+
+Generates programs of each of `--sizes` with `benchmarks.generator`,
+and times on each of them lexing alone, parsing (with the lexing it
+pulls tokens from, but no code generation) and full compilation, as
+`python3 -m compiler` does it. Every case runs in a fresh process, so
+its peak RSS is its own.
+
+`--save FILE` records the results as a JSON baseline. `--baseline FILE`
+compares with one, and exits with status 1 if the throughput of a case
+fell, or its peak memory grew, by more than `--threshold`:
+
+    python3 -m benchmarks.bench_suite --sizes 1K 1M --save baseline.json
+    python3 -m benchmarks.bench_suite --sizes 1K 1M --baseline baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.common import best_of
+from benchmarks.generator import ProgramGenerator, parse_size
+from compiler.context import CompilationContext
+from compiler.driver import compile_file
+from compiler.ir import NullSink
+from compiler.lexer import Lexer
+from compiler.parser import Parser
+
+SIZES = ["1K", "10K", "100K", "1M", "10M"]
+
+
+def lex_only(path: str, opt_level: int) -> None:
+    with open(path, "r", encoding="utf-8") as f:
+        lexer = Lexer(f)
+        while lexer.scan() is not None:
+            pass
+
+
+def parse_only(path: str, opt_level: int) -> None:
+    with open(path, "r", encoding="utf-8") as f:
+        Parser(Lexer(f, ctx=CompilationContext(out=NullSink()))).block()
+
+
+def compile_only(path: str, opt_level: int) -> None:
+    with open(os.devnull, "w") as out:
+        compile_file(path, out, opt_level=opt_level)
+
+
+CASES = {"lex": lex_only, "parse": parse_only, "compile": compile_only}
+
+
+def run_case(case: str, path: str, repeat: int, opt_level: int) -> dict:
+    """
+    Times `case` on the source `path` in this process. Small sources
+    are run enough times in a row to take 50 ms, and timed per run.
+    """
+    fn = CASES[case]
+    once = best_of(1, lambda: fn(path, opt_level))
+    k = max(1, int(0.05 / once)) if once > 0 else 1
+
+    def runs() -> None:
+        for _ in range(k):
+            fn(path, opt_level)
+
+    seconds = best_of(repeat, runs) / k
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return {"seconds": seconds, "peak_bytes": peak}
+
+
+def source(size: int, args: argparse.Namespace) -> str:
+    "The path of the generated program of `size` characters, made if missing."
+    name = "s%d-d%d-n%d-e%d-a%d-%d.txt" % (
+        args.seed, args.decls, args.depth, args.expr_size, args.dims, size
+    )
+    path = os.path.join(args.work_dir, name)
+    if not os.path.exists(path):
+        os.makedirs(args.work_dir, exist_ok=True)
+        gen = ProgramGenerator(args.seed, args.decls, args.depth, args.expr_size, args.dims)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(gen.program(size=size))
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def measure(case: str, path: str, args: argparse.Namespace) -> dict:
+    "Runs `case` on `path` in a child process."
+    child = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.bench_suite",
+            "--run-case",
+            case,
+            path,
+            "--repeat",
+            str(args.repeat),
+            "-O",
+            str(args.opt_level),
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(child.stdout)
+
+
+def compare(results: list[dict], baseline: dict, threshold: float) -> list[str]:
+    "Cases of `results` that regressed from `baseline` by more than `threshold`."
+    before = {(r["case"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        b = before.get((r["case"], r["size"]))
+        if b is None:
+            continue
+        if r["bytes_per_second"] < b["bytes_per_second"] * (1 - threshold):
+            regressions.append(
+                "%s %s: %.2f MB/s, was %.2f MB/s"
+                % (r["case"], r["size"], r["bytes_per_second"] / 1e6, b["bytes_per_second"] / 1e6)
+            )
+        if r["peak_bytes"] > b["peak_bytes"] * (1 + threshold):
+            regressions.append(
+                "%s %s: peak %.1f MiB, was %.1f MiB"
+                % (r["case"], r["size"], r["peak_bytes"] / 2**20, b["peak_bytes"] / 2**20)
+            )
+    return regressions
+
+
+def main() -> int | None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sizes", nargs="+", default=SIZES, help="program sizes, up to 100M")
+    ap.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("-O", type=int, default=0, dest="opt_level", help="for compile")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--decls", type=int, default=8)
+    ap.add_argument("--depth", type=int, default=3)
+    ap.add_argument("--expr-size", type=int, default=4)
+    ap.add_argument("--dims", type=int, default=2)
+    ap.add_argument(
+        "--work-dir",
+        default=os.path.join(tempfile.gettempdir(), "compiler-bench"),
+        help="where generated programs are kept between runs",
+    )
+    ap.add_argument("--save", metavar="FILE", help="write the results as a baseline")
+    ap.add_argument("--baseline", metavar="FILE", help="compare with this baseline")
+    ap.add_argument("--threshold", type=float, default=0.2, help="allowed regression")
+    ap.add_argument("--run-case", nargs=2, metavar=("CASE", "PATH"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.run_case:
+        case, path = args.run_case
+        json.dump(run_case(case, path, args.repeat, args.opt_level), sys.stdout)
+        return
+
+    results = []
+    print("%-8s %6s %12s %9s %10s %10s" % ("case", "size", "bytes", "seconds", "MB/s", "peak MiB"))
+    for size in args.sizes:
+        path = source(parse_size(size), args)
+        n = os.path.getsize(path)
+        for case in args.cases:
+            m = measure(case, path, args)
+            r = {
+                "case": case,
+                "size": size,
+                "bytes": n,
+                "seconds": m["seconds"],
+                "bytes_per_second": n / m["seconds"],
+                "peak_bytes": m["peak_bytes"],
+            }
+            results.append(r)
+            print(
+                "%-8s %6s %12d %9.3f %10.2f %10.1f"
+                % (case, size, n, r["seconds"], r["bytes_per_second"] / 1e6, r["peak_bytes"] / 2**20)
+            )
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "opt_level": args.opt_level,
+        "generator": {
+            "seed": args.seed,
+            "decls": args.decls,
+            "depth": args.depth,
+            "expr_size": args.expr_size,
+            "dims": args.dims,
+        },
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print("REGRESSION " + line)
+        if regressions:
+            return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
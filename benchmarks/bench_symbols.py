@@ -0,0 +1,71 @@
+"""
+Identifier lookup cost in deeply nested blocks.
+
+Parses a program of `--depth` nested blocks. Each declares a variable
+and assigns to it from variables of the outermost block, so every
+lookup of those has to see past all the scopes in between. Compares
+`SymbolTable` with a list of per-scope dictionaries searched
+innermost first, which is how the parser used to look identifiers up.
+"""
+
+import argparse
+import sys
+
+from benchmarks.common import best_of
+from compiler.lexer import Lexer
+from compiler.parser import Parser
+from compiler.scope import SymbolTable
+
+
+class ScopeList:
+    "Scopes as a list of dictionaries, searched innermost first."
+
+    def __init__(self) -> None:
+        self.envs = []
+
+    def enter(self) -> None:
+        self.envs.append({})
+
+    def exit(self) -> None:
+        self.envs.pop()
+
+    def put(self, w, i) -> None:
+        self.envs[-1][w] = i
+
+    def get(self, w):
+        for e in reversed(self.envs):
+            if w in e.keys():
+                return e[w]
+        return None
+
+
+def program(depth: int, uses: int) -> str:
+    use = "v%d = " + " + ".join(["a", "b"] * (uses // 2)) + ";\n"
+    opens = "".join("{ int v%d;\n" % d + use % d for d in range(depth))
+    return "{ int a; int b;\n" + opens + "}" * depth + "}\n"
+
+
+def parse(src: str, table) -> None:
+    parser = Parser(Lexer(src))
+    parser.symbols = table()
+    parser.block()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--depth", type=int, default=1000)
+    ap.add_argument("--uses", type=int, default=20, help="outer references per block")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10 * args.depth + 1000))
+    src = program(args.depth, args.uses)
+    lookups = args.depth * (args.uses + 1)
+    print("%d nested blocks, %d lookups" % (args.depth, lookups))
+    for table in (ScopeList, SymbolTable):
+        seconds = best_of(args.repeat, lambda: parse(src, table))
+        print("%-12s %8.3f s %12.0f lookups/s" % (table.__name__, seconds, lookups / seconds))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Execution speed on the quicksort partition of the example.
+
+Compiles the loop of `example/test_code.txt` around an array of
+`--size` random floats, partitioned around its middle element, and
+runs it at each optimization level on the virtual machine, reporting
+the instructions executed per second, and translated into Python.
+Checks the array is partitioned.
+"""
+
+import argparse
+import random
+import sys
+import time
+from array import array
+
+from benchmarks.common import BODY
+from compiler.context import CompilationContext
+from compiler.lexer import Lexer
+from compiler.parser import Parser
+from compiler.pyback import PythonProgram
+from compiler.vm import VM
+
+
+def partition_source(n: int) -> str:
+    return (
+        "{\nint i; int j; float v; float x; float[%d] a;\n" % n
+        + "i = 0 - 1; j = %d; v = a[%d];\n" % (n, n // 2)
+        + BODY
+        + "}\n"
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--size", type=int, default=10_000_000, help="array elements")
+    ap.add_argument("--levels", type=int, nargs="+", default=[0, 1, 2])
+    ap.add_argument(
+        "--backends", nargs="+", choices=["vm", "python"], default=["vm", "python"]
+    )
+    args = ap.parse_args()
+
+    rng = random.Random(1)
+    data = array("d", (rng.random() for _ in range(args.size)))
+    source = partition_source(args.size)
+    print("%-8s %3s %12s %9s %14s" % ("backend", "-O", "instrs", "seconds", "instr/s"))
+    for backend in args.backends:
+        for level in args.levels:
+            ctx = CompilationContext(opt_level=level)
+            parser = Parser(Lexer(source, ctx=ctx))
+            parser.program()
+            if backend == "vm":
+                program = VM(ctx.out.instrs, parser.used)
+            else:
+                program = PythonProgram(parser.tree, parser.used)
+            a = program.array("a")
+            a[:] = data
+            start = time.perf_counter()
+            n = program.run()
+            seconds = time.perf_counter() - start
+            i, j, v = program.scalar("i"), program.scalar("j"), program.scalar("v")
+            ok = max(a[:i], default=v) <= v <= min(a[j + 1 :], default=v)
+            print(
+                "%-8s %3d %12s %9.3f %14s%s"
+                % (
+                    backend,
+                    level,
+                    "-" if n is None else n,
+                    seconds,
+                    "-" if n is None else "%.0f" % (n / seconds),
+                    "" if ok else "  NOT PARTITIONED",
+                )
+            )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+"""
+Helpers shared by the benchmarks.
+"""
+
+import time
+from typing import Callable
+
+DECLS = "int i; int j; float v; float x; float[100] a;\n"
+
+BODY = """\
+while( true ) {
+    do i = i + 1; while (a[i] < v);
+    do j = j - 1; while (a[j] > v);
+    if (i >= j) break;
+    x = a[i];
+    a[i] = a[j];
+    a[j] = x;
+}
+"""
+
+
+def synthetic_source(size: int) -> str:
+    """
+    A valid program of roughly `size` characters, made of
+    copies of the loop in `example/test_code.txt`.
+    """
+    n = max(1, (size - len(DECLS)) // len(BODY))
+    return "{\n" + DECLS + BODY * n + "}\n"
+
+
+def best_of(repeat: int, fn: Callable[[], object]) -> float:
+    """Smallest wall-clock time of `repeat` calls to `fn`."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
@@ -0,0 +1,267 @@
+"""
+Seeded random programs in the language `Parser.program()` accepts.
+
+Programs are well typed, so they compile without errors: arithmetic
+mixes `float`, `int` and `char` operands, comparisons compare like
+with like, conditions are boolean and `break` only appears inside
+loops. Integer division is by a constant or by `x * x + 1`, so it
+never divides by zero. Array indexes are constants within bounds, or
+integer variables.
+
+    python3 -m benchmarks.generator --size 1M --seed 3 > program.txt
+"""
+
+import argparse
+import random
+import sys
+
+BASIC = ["int", "float", "char", "bool"]
+NARROWER = {"float": ["int", "char"], "int": ["char"], "char": []}
+RELATIONS = ["<", "<=", ">", ">=", "==", "!="]
+
+
+class ProgramGenerator:
+    """
+    Random programs of about `size` characters, or of `statements`
+    statements. Each block declares up to `decls` variables, arrays
+    have up to `dims` dimensions, blocks and loops nest `depth` deep
+    and expressions have up to `expr_size` operators.
+    """
+
+    def __init__(
+        self,
+        seed: int = 0,
+        decls: int = 8,
+        depth: int = 3,
+        expr_size: int = 4,
+        dims: int = 2,
+    ) -> None:
+        self.rng = random.Random(seed)
+        self.decls = decls
+        self.depth = depth
+        self.expr_size = expr_size
+        self.dims = dims
+        self._names = 0
+        self._scopes: list[list[tuple[str, str, list[int]]]] = []
+        self._out: list[str] = []
+        self._size = 0
+        self._statements = 0
+
+    def program(self, size: int | None = None, statements: int | None = None) -> str:
+        "A program of at least `size` characters, or of `statements` statements."
+        if size is None and statements is None:
+            size = 1 << 10
+        self._out = []
+        self._size = 0
+        self._statements = 0
+        self._emit("{\n")
+        self._scopes.append([])
+        self._declare(max(self.decls, 4), top=True)
+        while (size is None or self._size < size) and (
+            statements is None or self._statements < statements
+        ):
+            self._stmt(0, False)
+            self._emit("\n")
+        self._scopes.pop()
+        self._emit("}\n")
+        return "".join(self._out)
+
+    def _emit(self, s: str) -> None:
+        self._out.append(s)
+        self._size += len(s)
+
+    # declarations and variables
+
+    def _declare(self, n: int, top: bool = False) -> None:
+        rng = self.rng
+        if top:
+            # one scalar of each type, so every expression has a leaf
+            kinds = [(p, []) for p in BASIC]
+        else:
+            kinds = []
+        for _ in range(n - len(kinds)):
+            p = rng.choice(BASIC)
+            k = rng.randint(0, self.dims) if rng.random() < 0.3 else 0
+            kinds.append((p, [rng.randint(2, 20) for _ in range(k)]))
+        for p, sizes in kinds:
+            name = "v%d" % self._names
+            self._names += 1
+            self._scopes[-1].append((name, p, sizes))
+            self._emit("%s%s %s;\n" % (p, "".join("[%d]" % s for s in sizes), name))
+
+    def _variables(self, p: str) -> list[tuple[str, list[int]]]:
+        return [(n, s) for scope in self._scopes for n, q, s in scope if q == p]
+
+    def _place(self, p: str) -> str | None:
+        "A variable or array element of type `p`, to read or assign."
+        candidates = self._variables(p)
+        if not candidates:
+            return None
+        name, sizes = self.rng.choice(candidates)
+        return name + "".join("[%s]" % self._index(s) for s in sizes)
+
+    def _index(self, size: int) -> str:
+        ints = [n for n, s in self._variables("int") if not s]
+        if ints and self.rng.random() < 0.3:
+            return self.rng.choice(ints)
+        return str(self.rng.randrange(size))
+
+    # expressions
+
+    def _expr(self, p: str, ops: int) -> str:
+        """
+        An expression of type `p` with up to `ops` operators. One
+        operand of each operator has type `p` and the other may be of
+        a narrower numeric type, so `float` expressions are computed in
+        `float` and the others in an integral type.
+        """
+        rng = self.rng
+        if p == "bool":
+            return self._bool(ops)
+        if ops <= 0 or rng.random() < 0.3:
+            return self._leaf(p)
+        k = rng.random()
+        if k < 0.1:
+            return "-" + self._leaf(p)
+        if k < 0.2:
+            return "(%s)" % self._expr(p, ops - 1)
+        left = rng.randint(0, ops - 1)
+        op = rng.choice("+-*/")
+        p1 = p2 = p
+        if NARROWER[p] and rng.random() < 0.3:
+            if rng.random() < 0.5:
+                p1 = rng.choice(NARROWER[p])
+            else:
+                p2 = rng.choice(NARROWER[p])
+        x = self._expr(p1, left)
+        if op == "/" and p != "float":
+            return "%s / %s" % (x, self._divisor(p2))
+        return "%s %s %s" % (x, op, self._expr(p2, ops - 1 - left))
+
+    def _divisor(self, p: str) -> str:
+        "A nonzero integral divisor of type `p` or narrower."
+        if self.rng.random() < 0.5:
+            return str(self.rng.randrange(1, 10))
+        x = self._leaf(p)
+        return "(%s * %s + 1)" % (x, x)
+
+    def _leaf(self, p: str) -> str:
+        rng = self.rng
+        if rng.random() < 0.6:
+            place = self._place(p)
+            if place is not None:
+                return place
+        if p == "float":
+            return "%d.%d" % (rng.randrange(100), rng.randrange(100))
+        return str(rng.randrange(1, 100))
+
+    def _bool(self, ops: int) -> str:
+        rng = self.rng
+        if ops <= 0 or rng.random() < 0.2:
+            k = rng.random()
+            if k < 0.5:
+                p = rng.choice(["int", "float"])
+                return "%s %s %s" % (self._leaf(p), rng.choice(RELATIONS), self._leaf(p))
+            if k < 0.9:
+                return self._place("bool") or "true"
+            return rng.choice(["true", "false"])
+        k = rng.random()
+        if k < 0.4:
+            p = rng.choice(["int", "float"])
+            left = rng.randint(0, ops - 1)
+            return "%s %s %s" % (
+                self._expr(p, left),
+                rng.choice(RELATIONS),
+                self._expr(p, ops - 1 - left),
+            )
+        if k < 0.5:
+            return "!(%s)" % self._bool(ops - 1)
+        left = rng.randint(0, ops - 1)
+        return "(%s) %s (%s)" % (
+            self._bool(left),
+            rng.choice(["&&", "||"]),
+            self._bool(ops - 1 - left),
+        )
+
+    # statements
+
+    def _stmt(self, depth: int, in_loop: bool) -> None:
+        rng = self.rng
+        self._statements += 1
+        k = rng.random()
+        nested = depth < self.depth
+        if nested and k < 0.1:
+            self._emit("if (%s) " % self._bool(self._ops()))
+            self._stmt(depth + 1, in_loop)
+        elif nested and k < 0.16:
+            self._emit("if (%s) " % self._bool(self._ops()))
+            self._stmt(depth + 1, in_loop)
+            self._emit(" else ")
+            self._stmt(depth + 1, in_loop)
+        elif nested and k < 0.23:
+            self._emit("while (%s) " % self._bool(self._ops()))
+            self._stmt(depth + 1, True)
+        elif nested and k < 0.27:
+            self._emit("do ")
+            self._stmt(depth + 1, True)
+            self._emit(" while (%s);" % self._bool(self._ops()))
+        elif nested and k < 0.35:
+            self._block(depth + 1, in_loop)
+        elif in_loop and k < 0.38:
+            self._emit("break;")
+        elif k < 0.39:
+            self._emit(";")
+        else:
+            # the outermost block declares a scalar of each type
+            p = rng.choice(BASIC)
+            place = self._place(p)
+            # any numeric value can be assigned to a numeric place
+            q = p if p == "bool" else rng.choice(["int", "float"])
+            self._emit("%s = %s;" % (place, self._expr(q, self._ops())))
+
+    def _block(self, depth: int, in_loop: bool) -> None:
+        rng = self.rng
+        self._emit("{\n")
+        self._scopes.append([])
+        self._declare(rng.randint(0, self.decls // 2))
+        for _ in range(rng.randint(1, 5)):
+            self._stmt(depth, in_loop)
+            self._emit("\n")
+        self._scopes.pop()
+        self._emit("}")
+
+    def _ops(self) -> int:
+        return self.rng.randint(0, self.expr_size)
+
+
+def parse_size(s: str) -> int:
+    "A size such as `4096`, `64K`, `10M` or `1G`."
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    s = s.strip().upper().rstrip("B")
+    if s and s[-1] in units:
+        return int(float(s[:-1]) * units[s[-1]])
+    return int(s)
+
+
+def generate(size: int, seed: int = 0, **options) -> str:
+    "A random program of at least `size` characters; see `ProgramGenerator`."
+    return ProgramGenerator(seed, **options).program(size=size)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--size", type=parse_size, help="program size, e.g. 64K or 10M")
+    ap.add_argument("--statements", type=int, help="number of statements instead")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--decls", type=int, default=8, help="declarations per block")
+    ap.add_argument("--depth", type=int, default=3, help="nesting of blocks and loops")
+    ap.add_argument("--expr-size", type=int, default=4, help="operators per expression")
+    ap.add_argument("--dims", type=int, default=2, help="array dimensions")
+    args = ap.parse_args()
+
+    gen = ProgramGenerator(args.seed, args.decls, args.depth, args.expr_size, args.dims)
+    sys.stdout.write(gen.program(size=args.size, statements=args.statements))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
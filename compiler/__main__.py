@@ -1,21 +1,213 @@
-from compiler.lexer import Lexer
-from compiler.parser import Parser
-from compiler.tokens import *
-from compiler.error import ParseError
+from compiler.layout import LAYOUTS
+from compiler.client import compile_remote, write_reply
+import argparse
+import glob
+import os
 import sys
+import time
 
-if len(sys.argv) < 2:
-    print("Usage: python3 -m compiler 'filename'", file=sys.stderr)
+arg_parser = argparse.ArgumentParser(
+    prog="python3 -m compiler",
+    description="Compile source files to three-address code.",
+)
+arg_parser.add_argument(
+    "filenames",
+    nargs="+",
+    metavar="filename",
+    help="source file; several files, directories or glob patterns compile as a batch",
+)
+arg_parser.add_argument(
+    "-o", metavar="FILE", dest="output", help="write the output to FILE instead of stdout"
+)
+arg_parser.add_argument(
+    "--no-emit",
+    action="store_true",
+    help="only parse and check the source, without printing any code",
+)
+arg_parser.add_argument(
+    "-O",
+    type=int,
+    default=0,
+    metavar="LEVEL",
+    dest="opt_level",
+    help="optimization level: 0 for none, 1 for local optimizations, "
+    "2 to also move loop-invariant code out of loops (default: 0)",
+)
+arg_parser.add_argument(
+    "--layout",
+    choices=LAYOUTS,
+    default="aligned",
+    help="align each variable to the width of its type, or pack them (default: aligned)",
+)
+arg_parser.add_argument(
+    "--incremental",
+    nargs="?",
+    const=".compiler_cache",
+    metavar="DIR",
+    help="reuse the code of blocks unchanged since an earlier compile, "
+    "cached in DIR (default: .compiler_cache)",
+)
+arg_parser.add_argument(
+    "--server",
+    action="store_true",
+    help="compile on the compile server (python3 -m compiler.server), "
+    "or in this process if none is running",
+)
+arg_parser.add_argument(
+    "--socket",
+    metavar="PATH",
+    help="Unix socket of the compile server (default: $COMPILER_SOCKET, "
+    "or one of the user's own in the temporary directory)",
+)
+arg_parser.add_argument(
+    "--dot",
+    metavar="FILE",
+    help="write the control-flow graph of the code to FILE, in the DOT language",
+)
+arg_parser.add_argument(
+    "--binary",
+    metavar="FILE",
+    help="write the code, syntax tree and variable layout to FILE in a binary format "
+    "(see compiler/binfmt.py)",
+)
+arg_parser.add_argument(
+    "--run",
+    action="store_true",
+    help="run the code on the virtual machine, and report its speed",
+)
+arg_parser.add_argument(
+    "--backend",
+    choices=["vm", "python"],
+    default="vm",
+    help="run on the virtual machine, or translated into Python (default: vm)",
+)
+arg_parser.add_argument(
+    "--profile",
+    action="store_true",
+    help="print the time of each phase and counts of what it made to stderr",
+)
+arg_parser.add_argument(
+    "--profile-json",
+    metavar="FILE",
+    help="write the timings and counts of --profile to FILE as JSON",
+)
+arg_parser.add_argument(
+    "--pstats",
+    metavar="FILE",
+    help="run the compiler under cProfile and dump its statistics to FILE",
+)
+arg_parser.add_argument(
+    "-j",
+    "--jobs",
+    type=int,
+    metavar="N",
+    help="compile a batch in N worker processes (default: one per CPU)",
+)
+arg_parser.add_argument(
+    "--out-dir",
+    metavar="DIR",
+    help="write each output of a batch to DIR/<name>.tac instead of beside its source",
+)
+args = arg_parser.parse_args()
 
-test_file = sys.argv[-1]
+batch = (
+    len(args.filenames) > 1
+    or args.jobs is not None
+    or args.out_dir is not None
+    or os.path.isdir(args.filenames[0])
+    or glob.has_magic(args.filenames[0])
+)
 
-with open(test_file, "r", encoding="utf-8") as f:
-    lexer: Lexer = Lexer(f)
-    parser: Parser = Parser(lexer)
-    try:
-        parser.program()
-        print()
-        print()
-        print("Memory used for allocation: %d" % parser.used)
-    except ParseError as err:
-        print(err, file=sys.stdout)
+if args.server:
+    if batch:
+        arg_parser.error("--server takes a single source file")
+    if (
+        args.dot
+        or args.binary
+        or args.run
+        or args.incremental
+        or args.profile
+        or args.profile_json
+        or args.pstats
+    ):
+        arg_parser.error(
+            "--server does not take --dot, --binary, --run, --incremental "
+            "or the profiling options"
+        )
+    reply = compile_remote(
+        args.filenames[0],
+        emit=not args.no_emit,
+        opt_level=args.opt_level,
+        layout=args.layout,
+        address=args.socket,
+    )
+    if reply is not None:
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        write_reply(reply, out, emit=not args.no_emit)
+        if out is not sys.stdout:
+            out.close()
+        sys.exit()
+
+# Imported only now, so that a compile on the server does not pay for it.
+from compiler.driver import compile_batch, compile_file, expand_sources, print_report
+from compiler.instrument import Profile
+import cProfile
+
+if not batch:
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    profile = Profile() if args.profile or args.profile_json else None
+    profiler = cProfile.Profile() if args.pstats else None
+    if profiler is not None:
+        profiler.enable()
+    compile_file(
+        args.filenames[0],
+        out,
+        emit=not args.no_emit,
+        opt_level=args.opt_level,
+        dot=args.dot,
+        run=args.run,
+        backend=args.backend,
+        layout=args.layout,
+        cache_dir=args.incremental,
+        profile=profile,
+        binary=args.binary,
+    )
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.pstats)
+    if out is not sys.stdout:
+        out.close()
+    if args.profile:
+        profile.report(sys.stderr)
+    if args.profile_json:
+        with open(args.profile_json, "w", encoding="utf-8") as f:
+            profile.write_json(f, file=args.filenames[0], opt_level=args.opt_level)
+else:
+    if args.output:
+        arg_parser.error("-o takes a single source file; use --out-dir for a batch")
+    if (
+        args.dot
+        or args.binary
+        or args.run
+        or args.incremental
+        or args.profile
+        or args.profile_json
+        or args.pstats
+    ):
+        arg_parser.error(
+            "--dot, --binary, --run, --incremental and the profiling options "
+            "take a single source file"
+        )
+    sources = expand_sources(args.filenames)
+    start = time.perf_counter()
+    results = compile_batch(
+        sources,
+        out_dir=args.out_dir,
+        jobs=args.jobs if args.jobs is not None else os.cpu_count() or 1,
+        emit=not args.no_emit,
+        opt_level=args.opt_level,
+        layout=args.layout,
+    )
+    print_report(results, time.perf_counter() - start, sys.stdout)
+    if not all(r.ok for r in results):
+        sys.exit(1)
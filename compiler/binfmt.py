@@ -0,0 +1,569 @@
+"""
+A binary format for compiled programs: their code, syntax tree and
+variable layout, for tools to load without compiling the source again.
+
+A file starts with a header:
+
+    magic "TACB", version (u16), flags (u16): 1 with code, 2 with a tree,
+    frame size (i32), temporary slots (i32, -1 if not optimized),
+    number of sections (u32)
+
+followed by a table of sections, each a name of 4 bytes and the
+offset, length in bytes and record width (all u32) of its data. Every
+section but the string bytes is a flat array of little-endian int32
+records of a fixed width:
+
+    SOFF  offsets of each string in STRS, and the end of the last
+    STRS  the UTF-8 text of identifiers, operators and constant values
+    TYPE  (basic, size, of): a basic type 0 to 3 (int, float, char,
+          bool) has size 0 and `of` -1; an array has basic -1
+    IDS   (name, type, offset) of every variable: the storage layout
+    TEMP  (number, type) of every temporary
+    CONS  (type, text) of every constant
+    CODE  (opcode, a, b, c, d): an instruction of `compiler.ir`
+    AST   (kind, a, b, c, d): a node of the syntax tree, the root first
+    LIST  node numbers of the statements of each `Seq`
+
+Strings, types and variables are referred to by their number in their
+section. An operand of an instruction is `4 * n + k`, the `n`-th of
+the variables (`k` 0), temporaries (1), constants (2) or nodes (3),
+and -1 for none; an operator is a string, and a label its number.
+Nodes refer to expressions as operands, leaves as variables and
+constants and the others as nodes, and to statements by their number
+in AST, where the root of the tree, if written, comes first.
+Temporaries of one number and type are written once. CODE is left
+out when no code is written, AST and LIST when they are empty.
+
+`Image` reads a file through `mmap`, and makes only the objects asked
+for, as they are asked for:
+
+    with Image.open("program.tacb") as image:
+        for instr in image.instructions():
+            ...
+"""
+
+from compiler.ir import *
+from compiler.intermediate import *
+from compiler.symbols import Array, Type
+from compiler.tokens import Tag, Token, Word
+from array import array
+from typing import BinaryIO, Iterable, Iterator
+import argparse
+import mmap
+import struct
+import sys
+
+MAGIC = b"TACB"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHHiiI")
+SECTION = struct.Struct("<4sIII")
+
+CODE_FLAG = 1  # the code was written
+AST_FLAG = 2  # the syntax tree was written
+
+# record widths of the sections of int32 records, in the order written
+_WIDTHS = {b"TYPE": 3, b"IDS": 3, b"TEMP": 2, b"CONS": 2, b"CODE": 5, b"AST": 5, b"LIST": 1}
+
+_ID, _TEMP, _CONST, _NODE = 0, 1, 2, 3
+_BASIC = [Type.INT, Type.FLOAT, Type.CHAR, Type.BOOL]
+_WORDS = {
+    w.lexeme: w
+    for w in [Word.AND, Word.OR, Word.EQ, Word.NE, Word.LE, Word.GE, Word.MINUS]
+}
+
+
+class Kind:
+    "Kinds of the nodes of the syntax tree in AST."
+
+    NULL = 0
+    ARITH = 1
+    UNARY = 2
+    ACCESS = 3
+    OR = 4
+    AND = 5
+    NOT = 6
+    REL = 7
+    SEQ = 8
+    IF = 9
+    ELSE = 10
+    WHILE = 11
+    DO = 12
+    SET = 13
+    SETELEM = 14
+    BREAK = 15
+
+
+_KINDS = {
+    Arith: Kind.ARITH,
+    Unary: Kind.UNARY,
+    Access: Kind.ACCESS,
+    Or: Kind.OR,
+    And: Kind.AND,
+    Not: Kind.NOT,
+    Rel: Kind.REL,
+    Seq: Kind.SEQ,
+    If: Kind.IF,
+    Else: Kind.ELSE,
+    While: Kind.WHILE,
+    Do: Kind.DO,
+    Set: Kind.SET,
+    SetElem: Kind.SETELEM,
+    Break: Kind.BREAK,
+}
+
+# positions of the operators, and lengths, of each kind of instruction
+_OPERATORS = {UNARY: 2, BINARY: 3, IF: 3, IFFALSE: 3}
+_LENGTHS = {COPY: 3, UNARY: 4, BINARY: 5, LOAD: 4, STORE: 4, IF: 5, IFFALSE: 5}
+
+
+class _Writer:
+    "The sections of one file, filled in as objects are numbered."
+
+    def __init__(self) -> None:
+        self.strings: dict[str, int] = {}
+        self.types: dict[str, int] = {}
+        self.operands: dict[object, int] = {}
+        self.constants: dict[tuple[str, str], int] = {}
+        self.nodes: dict[int, int] = {}
+        self.sections: dict[bytes, array] = {name: array("i") for name in _WIDTHS}
+
+    def string(self, s: str) -> int:
+        n = self.strings.get(s)
+        if n is None:
+            n = self.strings[s] = len(self.strings)
+        return n
+
+    def type(self, p: Type) -> int:
+        key = str(p)
+        n = self.types.get(key)
+        if n is None:
+            if isinstance(p, Array):
+                record = (-1, p.size, self.type(p.of))
+            else:
+                record = (_BASIC.index(p), 0, -1)
+            n = self.types[key] = len(self.types)
+            self.sections[b"TYPE"].extend(record)
+        return n
+
+    def operand(self, x: Expr | None) -> int:
+        if x is None:
+            return -1
+        if isinstance(x, Constant):
+            key = (str(x.type), str(x))
+            n = self.constants.get(key)
+            if n is None:
+                n = self.constants[key] = 4 * len(self.constants) + _CONST
+                self.sections[b"CONS"].extend((self.type(x.type), self.string(str(x))))
+            return n
+        key = ("t", x.number, str(x.type)) if isinstance(x, Temp) else x
+        n = self.operands.get(key)
+        if n is None:
+            if isinstance(x, Id):
+                ids = self.sections[b"IDS"]
+                n = 4 * (len(ids) // 3) + _ID
+                ids.extend((self.string(x.op.lexeme), self.type(x.type), x.offset))
+            elif isinstance(x, Temp):
+                temps = self.sections[b"TEMP"]
+                n = 4 * (len(temps) // 2) + _TEMP
+                temps.extend((x.number, self.type(x.type)))
+            else:
+                n = 4 * self.node(x) + _NODE
+            self.operands[key] = n
+        return n
+
+    def instr(self, instr: tuple) -> None:
+        code = instr[0]
+        record = [code, 0, 0, 0, 0]
+        if code == LABEL or code == GOTO:
+            record[1] = instr[1]
+        else:
+            operands = OPERANDS[code]
+            for k in range(1, len(instr)):
+                if k in operands:
+                    record[k] = self.operand(instr[k])
+                elif k == _OPERATORS.get(code):
+                    record[k] = -1 if instr[k] is None else self.string(instr[k])
+                else:
+                    record[k] = instr[k]
+        self.sections[b"CODE"].extend(record)
+
+    def node(self, x: Node) -> int:
+        "The number of `x` in AST, written along with its children if new."
+        if x is Stmt.NULL:
+            kind = Kind.NULL
+        else:
+            kind = _KINDS.get(type(x))
+            if kind is None:
+                raise ValueError("Cannot write a %s node." % type(x).__name__)
+        n = self.nodes.get(id(x))
+        if n is not None:
+            return n
+        nodes = self.sections[b"AST"]
+        n = self.nodes[id(x)] = len(nodes) // 5
+        nodes.extend((kind, 0, 0, 0, 0))
+        e = self.operand
+        if kind in (Kind.ARITH, Kind.OR, Kind.AND, Kind.REL):
+            fields = [self.string(str(x.op)), e(x.expr1), e(x.expr2)]
+        elif kind == Kind.UNARY:
+            fields = [self.string(str(x.op)), e(x.expr)]
+        elif kind == Kind.NOT:
+            fields = [self.string(str(x.op)), e(x.expr2)]
+        elif kind == Kind.ACCESS:
+            fields = [self.type(x.type), e(x.array), e(x.index)]
+        elif kind == Kind.SEQ:
+            children = [self.node(s) for s in x.stmts]
+            stmts = self.sections[b"LIST"]
+            fields = [len(stmts), len(children)]
+            stmts.extend(children)
+        elif kind in (Kind.IF, Kind.WHILE, Kind.DO):
+            fields = [e(x.expr), self.node(x.stmt)]
+        elif kind == Kind.ELSE:
+            fields = [e(x.expr), self.node(x.stmt1), self.node(x.stmt2)]
+        elif kind == Kind.SET:
+            fields = [e(x.id), e(x.expr)]
+        elif kind == Kind.SETELEM:
+            fields = [e(x.array), e(x.index), e(x.expr)]
+        elif kind == Kind.BREAK:
+            fields = [self.node(x.stmt)]
+        else:
+            fields = []
+        nodes[5 * n + 1 : 5 * n + 1 + len(fields)] = array("i", fields)
+        return n
+
+    def write(self, f: BinaryIO, used: int, temp_slots: int | None, flags: int) -> None:
+        text = [s.encode("utf-8") for s in self.strings]
+        offsets = array("i", [0])
+        for s in text:
+            offsets.append(offsets[-1] + len(s))
+        sections = [(b"SOFF", offsets, 1), (b"STRS", b"".join(text), 1)]
+        for name, records in self.sections.items():
+            if name == b"CODE" and not flags & CODE_FLAG:
+                continue
+            if name in (b"AST", b"LIST") and not records:
+                continue
+            sections.append((name, records, _WIDTHS[name]))
+        offset = HEADER.size + SECTION.size * len(sections)
+        table = []
+        blobs = []
+        for name, data, width in sections:
+            if isinstance(data, array):
+                if sys.byteorder != "little":
+                    data = array("i", data)
+                    data.byteswap()
+                data = data.tobytes()
+            padding = -offset % 4
+            blobs.append(b"\0" * padding + data)
+            offset += padding
+            table.append(SECTION.pack(name, offset, len(data), width))
+            offset += len(data)
+        f.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                flags,
+                used,
+                -1 if temp_slots is None else temp_slots,
+                len(sections),
+            )
+        )
+        f.write(b"".join(table))
+        f.write(b"".join(blobs))
+
+
+def dump(
+    f: BinaryIO,
+    instrs: Iterable[tuple] | None = None,
+    tree: Stmt | None = None,
+    ids: Iterable[Id] = (),
+    used: int = 0,
+    temp_slots: int | None = None,
+) -> None:
+    """
+    Writes the code `instrs`, the syntax tree `tree` and the variables
+    `ids` of a program whose frame takes `used` bytes to the binary
+    file `f`. Variables the code or tree use are written after `ids`.
+    A tree with nodes the format has no kind for, such as blocks
+    spliced in from a `BlockCache`, raises `ValueError`.
+    """
+    w = _Writer()
+    for x in ids:
+        w.operand(x)
+    flags = 0
+    if tree is not None:
+        flags |= AST_FLAG
+        w.node(tree)
+    if instrs is not None:
+        flags |= CODE_FLAG
+        for instr in instrs:
+            w.instr(instr)
+    w.write(f, used, temp_slots, flags)
+
+
+class Image:
+    """
+    A program read from the binary format. `buf` is the content of
+    the file, which `Image.open()` maps into memory. Records are read
+    from it in place, and the objects they describe are made when
+    first asked for, then kept.
+    """
+
+    used: int
+    temp_slots: int | None
+
+    def __init__(self, buf) -> None:
+        self._buf = buf
+        view = self._view = memoryview(buf)
+        magic, version, flags, used, temp_slots, n = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("Not a compiled program.")
+        if version != VERSION:
+            raise ValueError("Compiled program of version %d, not %d." % (version, VERSION))
+        self.flags = flags
+        self.used = used
+        self.temp_slots = None if temp_slots < 0 else temp_slots
+        self._sections: dict[bytes, memoryview] = {}
+        self._widths: dict[bytes, int] = {}
+        for k in range(n):
+            name, offset, length, width = SECTION.unpack_from(
+                view, HEADER.size + k * SECTION.size
+            )
+            name = name.rstrip(b"\0")
+            data = view[offset : offset + length]
+            if name != b"STRS":
+                if sys.byteorder == "little":
+                    data = data.cast("i")
+                else:
+                    swapped = array("i")
+                    swapped.frombytes(data)
+                    swapped.byteswap()
+                    data = memoryview(swapped)
+            self._sections[name] = data
+            self._widths[name] = width
+        self._strings: dict[int, str] = {}
+        self._types: dict[int, Type] = {}
+        self._operands: dict[int, Expr] = {}
+        self._nodes: dict[int, Node] = {}
+        self._words: dict[str, Word] = {}
+        self._file = None
+        self._map = None
+
+    @classmethod
+    def open(cls, filename: str) -> "Image":
+        "The program in the file `filename`, mapped into memory."
+        f = open(filename, "rb")
+        try:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            image = cls(m)
+        except BaseException:
+            f.close()
+            raise
+        image._file = f
+        image._map = m
+        return image
+
+    def close(self) -> None:
+        "Releases the views of the file; objects already made stay valid."
+        for data in self._sections.values():
+            data.release()
+        self._sections.clear()
+        self._view.release()
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+    def __enter__(self) -> "Image":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def count(self, section: bytes) -> int:
+        "Number of records of `section`, 0 if it is not in the file."
+        data = self._sections.get(section)
+        if data is None:
+            return 0
+        if section == b"SOFF":
+            return len(data) - 1
+        return len(data) // self._widths[section]
+
+    def record(self, section: bytes, n: int) -> tuple:
+        "The `n`-th record of `section`, as numbers."
+        w = self._widths[section]
+        return tuple(self._sections[section][n * w : (n + 1) * w])
+
+    def string(self, n: int) -> str:
+        s = self._strings.get(n)
+        if s is None:
+            offsets = self._sections[b"SOFF"]
+            s = self._strings[n] = str(
+                self._sections[b"STRS"][offsets[n] : offsets[n + 1]], "utf-8"
+            )
+        return s
+
+    def type(self, n: int) -> Type:
+        p = self._types.get(n)
+        if p is None:
+            basic, size, of = self.record(b"TYPE", n)
+            # the records are of distinct types, so each makes one object
+            p = _BASIC[basic] if basic >= 0 else Array(size, self.type(of))
+            self._types[n] = p
+        return p
+
+    def layout(self) -> Iterator[tuple[str, str, int]]:
+        "Name, type and offset of every variable, without making `Id`s."
+        for n in range(self.count(b"IDS")):
+            name, p, offset = self.record(b"IDS", n)
+            yield self.string(name), str(self.type(p)), offset
+
+    def operand(self, ref: int) -> Expr | None:
+        "The variable, temporary or constant `ref` stands for."
+        if ref < 0:
+            return None
+        x = self._operands.get(ref)
+        if x is not None:
+            return x
+        n, kind = ref >> 2, ref & 3
+        if kind == _ID:
+            name, p, offset = self.record(b"IDS", n)
+            s = self.string(name)
+            w = self._words.get(s)
+            if w is None:
+                w = self._words[s] = Word(s, Tag.ID)
+            x = Id(w, self.type(p), offset)
+        elif kind == _NODE:
+            x = self.node(n)
+        elif kind == _TEMP:
+            number, p = self.record(b"TEMP", n)
+            x = Temp.__new__(Temp)
+            Expr.__init__(x, Word.TEMP, self.type(p))
+            x.number = number
+        else:
+            p, text = self.record(b"CONS", n)
+            p = self.type(p)
+            s = self.string(text)
+            if p == Type.BOOL:
+                x = Constant.of(s == "true", p)
+            else:
+                x = Constant.of(float(s) if p == Type.FLOAT else int(s), p)
+        self._operands[ref] = x
+        return x
+
+    def ids(self) -> list[Id]:
+        "Every variable, in the order of the layout."
+        return [self.operand(4 * n + _ID) for n in range(self.count(b"IDS"))]
+
+    def instr(self, n: int) -> tuple:
+        "The `n`-th instruction of the code."
+        record = self.record(b"CODE", n)
+        code = record[0]
+        if code == LABEL or code == GOTO:
+            return (code, record[1])
+        operands = OPERANDS[code]
+        operator = _OPERATORS.get(code)
+        instr: list = [code]
+        for k in range(1, _LENGTHS[code]):
+            if k in operands:
+                instr.append(self.operand(record[k]))
+            elif k == operator:
+                instr.append(None if record[k] < 0 else self.string(record[k]))
+            else:
+                instr.append(record[k])
+        return tuple(instr)
+
+    def instructions(self) -> Iterator[tuple]:
+        for n in range(self.count(b"CODE")):
+            yield self.instr(n)
+
+    def text(self) -> str:
+        "The code, as the compiler prints it."
+        return "".join(map(format_instr, self.instructions()))
+
+    @property
+    def tree(self) -> Stmt | None:
+        "The syntax tree, if it was written."
+        return self.node(0) if self.flags & AST_FLAG else None
+
+    def node(self, n: int) -> Node:
+        "The `n`-th node of the syntax tree, with the nodes under it."
+        x = self._nodes.get(n)
+        if x is not None:
+            return x
+        kind, a, b, c, d = self.record(b"AST", n)
+        e = self.operand
+        if kind == Kind.WHILE or kind == Kind.DO:
+            # made before its body, whose breaks refer to it
+            loop = self._nodes[n] = While() if kind == Kind.WHILE else Do()
+            if kind == Kind.WHILE:
+                loop.init(e(a), self.node(b))
+            else:
+                loop.init(self.node(b), e(a))
+            return loop
+        if kind == Kind.NULL:
+            x = Stmt.NULL
+        elif kind == Kind.ARITH:
+            x = Arith(self._token(a), e(b), e(c))
+        elif kind == Kind.UNARY:
+            x = Unary(self._token(a), e(b))
+        elif kind == Kind.ACCESS:
+            x = Access(e(b), e(c), self.type(a))
+        elif kind == Kind.OR:
+            x = Or(self._token(a), e(b), e(c))
+        elif kind == Kind.AND:
+            x = And(self._token(a), e(b), e(c))
+        elif kind == Kind.NOT:
+            x = Not(self._token(a), e(b))
+        elif kind == Kind.REL:
+            x = Rel(self._token(a), e(b), e(c))
+        elif kind == Kind.SEQ:
+            stmts = self._sections[b"LIST"][a : a + b].tolist()
+            x = Seq([self.node(s) for s in stmts])
+        elif kind == Kind.IF:
+            x = If(e(a), self.node(b))
+        elif kind == Kind.ELSE:
+            x = Else(e(a), self.node(b), self.node(c))
+        elif kind == Kind.SET:
+            x = Set(e(a), e(b))
+        elif kind == Kind.SETELEM:
+            # the element type was checked when the tree was built
+            x = SetElem.__new__(SetElem)
+            Stmt.__init__(x)
+            x.array, x.index, x.expr = e(a), e(b), e(c)
+        elif kind == Kind.BREAK:
+            x = Break(self.node(a))
+        else:
+            raise ValueError("Unknown node kind %d." % kind)
+        self._nodes[n] = x
+        return x
+
+    def _token(self, n: int) -> Token:
+        s = self.string(n)
+        w = _WORDS.get(s)
+        return w if w is not None else Token.char(s)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(
+        prog="python3 -m compiler.binfmt",
+        description="Print a program from its binary file, as the compiler prints it.",
+    )
+    ap.add_argument("filename")
+    ap.add_argument("--layout", action="store_true", help="print the variables instead")
+    args = ap.parse_args()
+
+    with Image.open(args.filename) as image:
+        if args.layout:
+            for name, p, offset in image.layout():
+                print("%s %s %d" % (name, p, offset))
+            return
+        sys.stdout.write(image.text())
+        print()
+        print()
+        print("Frame size: %d" % image.used)
+        if image.temp_slots is not None:
+            print("Temporaries live at once: %d" % image.temp_slots)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+"""
+Control-flow graph of three-address code.
+
+The code is split into basic blocks (`basic_blocks`), linked to the
+blocks control can go to next and come from. On top of the graph,
+`CFG` computes dominators and finds the natural loops, which the loops
+of `While` and `Do` statements compile to, and writes the graph in the
+DOT language of Graphviz.
+
+Every step takes time linear in the size of the code, apart from the
+bodies of nested loops, which are walked once per enclosing loop.
+"""
+
+from compiler.ir import *
+from typing import Iterator, TextIO
+
+
+def basic_blocks(instrs: list[tuple]) -> list[list[tuple]]:
+    """
+    Splits `instrs` into basic blocks: a block starts at a label or
+    after a jump, and only its first instruction can be jumped to.
+    """
+    blocks: list[list[tuple]] = []
+    block: list[tuple] = []
+    for instr in instrs:
+        if instr[0] == LABEL and block and block[-1][0] != LABEL:
+            blocks.append(block)
+            block = []
+        block.append(instr)
+        if instr[0] in JUMPS:
+            blocks.append(block)
+            block = []
+    if block:
+        blocks.append(block)
+    return blocks
+
+
+class Block:
+    "A basic block: its instructions, and its edges in the graph."
+
+    __slots__ = ("index", "instrs", "succs", "preds")
+
+    index: int
+    instrs: list[tuple]
+    succs: list["Block"]
+    preds: list["Block"]
+
+    def __init__(self, index: int, instrs: list[tuple]) -> None:
+        self.index = index
+        self.instrs = instrs
+        self.succs = []
+        self.preds = []
+
+    @property
+    def labels(self) -> list[int]:
+        "The labels at the start of the block."
+        labels = []
+        for instr in self.instrs:
+            if instr[0] != LABEL:
+                break
+            labels.append(instr[1])
+        return labels
+
+    def __repr__(self) -> str:
+        return "B%d" % self.index
+
+
+class Loop:
+    """
+    A natural loop: the blocks that can reach one of the `tails` of its
+    back edges without going through the `header`, which dominates them.
+    """
+
+    __slots__ = ("header", "tails", "blocks", "parent")
+
+    header: Block
+    tails: list[Block]
+    blocks: set[Block]
+    parent: "Loop | None"
+
+    def __init__(self, cfg: "CFG", header: Block, tails: list[Block]) -> None:
+        self.header = header
+        self.tails = tails
+        self.blocks = {header}
+        self.parent = None
+        stack = [t for t in tails if t is not header]
+        self.blocks.update(stack)
+        while stack:
+            for p in stack.pop().preds:
+                if p not in self.blocks and cfg.dominates(header, p):
+                    self.blocks.add(p)
+                    stack.append(p)
+
+    @property
+    def depth(self) -> int:
+        "1 for an outermost loop, one more for each loop it is nested in."
+        d = 1
+        loop = self.parent
+        while loop is not None:
+            d += 1
+            loop = loop.parent
+        return d
+
+    def __repr__(self) -> str:
+        return "Loop(%r)" % self.header
+
+
+class CFG:
+    """
+    Control-flow graph of a list of instructions. `blocks` are in the
+    order of the code, and control enters at the first of them.
+    """
+
+    blocks: list[Block]
+
+    def __init__(self, instrs: list[tuple]) -> None:
+        self.blocks = [Block(k, b) for k, b in enumerate(basic_blocks(instrs))]
+        start: dict[int, Block] = {}
+        for block in self.blocks:
+            for label in block.labels:
+                start[label] = block
+        for k, block in enumerate(self.blocks):
+            last = block.instrs[-1]
+            if last[0] in JUMPS:
+                block.succs.append(start[last[1]])
+            if last[0] != GOTO and k + 1 < len(self.blocks):
+                block.succs.append(self.blocks[k + 1])
+            for s in block.succs:
+                s.preds.append(block)
+        self._rpo: list[Block] | None = None
+        self._idom: list[Block | None] | None = None
+        self._order: tuple[list[int], list[int]] | None = None
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+    def __iter__(self) -> Iterator[Block]:
+        return iter(self.blocks)
+
+    def instrs(self) -> list[tuple]:
+        "The instructions of every block, in order."
+        return [instr for block in self.blocks for instr in block.instrs]
+
+    def reverse_postorder(self) -> list[Block]:
+        "The blocks reachable from the entry, in reverse postorder."
+        if self._rpo is None:
+            order: list[Block] = []
+            if self.blocks:
+                seen = {self.blocks[0]}
+                stack = [(self.blocks[0], iter(self.blocks[0].succs))]
+                while stack:
+                    block, succs = stack[-1]
+                    for s in succs:
+                        if s not in seen:
+                            seen.add(s)
+                            stack.append((s, iter(s.succs)))
+                            break
+                    else:
+                        order.append(block)
+                        stack.pop()
+            order.reverse()
+            self._rpo = order
+        return self._rpo
+
+    @property
+    def idom(self) -> list[Block | None]:
+        """
+        Immediate dominator of each block, by block index: `None` for
+        the entry and for unreachable blocks.
+
+        Computed with the iterative algorithm of Cooper, Harvey and
+        Kennedy, which settles in two passes over structured code.
+        """
+        if self._idom is None:
+            rpo = self.reverse_postorder()
+            number = {b: k for k, b in enumerate(rpo)}
+            idom: list[Block | None] = [None] * len(self.blocks)
+            if rpo:
+                entry = rpo[0]
+                idom[entry.index] = entry
+
+            def intersect(a: Block, b: Block) -> Block:
+                while a is not b:
+                    while number[a] > number[b]:
+                        a = idom[a.index]
+                    while number[b] > number[a]:
+                        b = idom[b.index]
+                return a
+
+            changed = True
+            while changed:
+                changed = False
+                for block in rpo[1:]:
+                    new = None
+                    for p in block.preds:
+                        if idom[p.index] is not None:
+                            new = p if new is None else intersect(p, new)
+                    if idom[block.index] is not new:
+                        idom[block.index] = new
+                        changed = True
+            if rpo:
+                idom[rpo[0].index] = None
+            self._idom = idom
+        return self._idom
+
+    def _dominator_order(self) -> tuple[list[int], list[int]]:
+        "Preorder and postorder numbers of the blocks in the dominator tree."
+        if self._order is None:
+            idom = self.idom
+            children: list[list[Block]] = [[] for _ in self.blocks]
+            for block in self.blocks:
+                d = idom[block.index]
+                if d is not None:
+                    children[d.index].append(block)
+            pre = [-1] * len(self.blocks)
+            post = [-1] * len(self.blocks)
+            n = 0
+            rpo = self.reverse_postorder()
+            stack = [(rpo[0], False)] if rpo else []
+            while stack:
+                block, done = stack.pop()
+                if done:
+                    post[block.index] = n
+                else:
+                    pre[block.index] = n
+                    stack.append((block, True))
+                    stack.extend((c, False) for c in children[block.index])
+                n += 1
+            self._order = (pre, post)
+        return self._order
+
+    def dominates(self, a: Block, b: Block) -> bool:
+        "Whether every path from the entry to `b` goes through `a`."
+        pre, post = self._dominator_order()
+        if pre[a.index] < 0 or pre[b.index] < 0:
+            return False
+        return pre[a.index] <= pre[b.index] and post[b.index] <= post[a.index]
+
+    def loops(self) -> list[Loop]:
+        """
+        The natural loops, one per loop header, outermost first. Each
+        loop knows the innermost loop it is nested in as its `parent`.
+        """
+        tails: dict[Block, list[Block]] = {}
+        for block in self.reverse_postorder():
+            for s in block.succs:
+                if self.dominates(s, block):
+                    tails.setdefault(s, []).append(block)
+        # headers in reverse postorder put enclosing loops first
+        number = {b: k for k, b in enumerate(self.reverse_postorder())}
+        loops = [Loop(self, h, tails[h]) for h in sorted(tails, key=number.__getitem__)]
+        innermost: dict[Block, Loop] = {}
+        for loop in loops:
+            parent = innermost.get(loop.header)
+            loop.parent = parent
+            for block in loop.blocks:
+                innermost[block] = loop
+        return loops
+
+    def write_dot(self, f: TextIO, name: str = "cfg") -> None:
+        """
+        Writes the graph in the DOT language: a box per block holding
+        its instructions, and an edge to each successor.
+        """
+        f.write("digraph %s {\n" % name)
+        f.write('  node [shape=box, fontname="monospace"];\n')
+        for block in self.blocks:
+            text = "".join(map(format_instr, block.instrs))
+            text = text.replace("\\", "\\\\").replace('"', '\\"')
+            text = text.replace("\t", " ").replace("\n", "\\l")
+            f.write('  B%d [label="B%d:\\l%s"];\n' % (block.index, block.index, text))
+        for block in self.blocks:
+            for s in block.succs:
+                f.write("  B%d -> B%d;\n" % (block.index, s.index))
+        f.write("}\n")
@@ -0,0 +1,119 @@
+"""
+Compiling on a running compile server (see `compiler.server`).
+
+Client and server exchange messages over a Unix socket: a JSON object
+in UTF-8, preceded by its length in bytes as a 4-byte big-endian
+integer. A request names a source file by its `path`, or carries its
+text as `source`, with the options `emit`, `opt_level` and `layout`
+of `compile_file`. The reply holds the `code` printed, the
+`error` message of a `ParseError` (or `null`), the frame size `used`
+and the number of `temp_slots` (`null` when not optimizing). A request
+the server could not handle, such as one naming a file it cannot read,
+is answered with a `failure` message instead.
+
+This module imports nothing of the compiler, so that a client does
+not pay for it when a server does the compiling.
+"""
+
+from typing import TextIO
+import json
+import os
+import socket
+import struct
+
+HEADER = struct.Struct(">I")
+MAX_MESSAGE = 1 << 30
+
+
+def default_address() -> str:
+    "`$COMPILER_SOCKET`, or a socket of the user's own in the temporary directory."
+    return os.environ.get("COMPILER_SOCKET") or os.path.join(
+        os.environ.get("TMPDIR") or "/tmp", "compiler-%d.sock" % os.getuid()
+    )
+
+
+def encode(message: dict) -> bytes:
+    body = json.dumps(message).encode("utf-8")
+    if len(body) > MAX_MESSAGE:
+        raise ValueError("Message of %d bytes is too long." % len(body))
+    return HEADER.pack(len(body)) + body
+
+
+def decode(body: bytes) -> dict:
+    message = json.loads(body.decode("utf-8"))
+    if not isinstance(message, dict):
+        raise ValueError("Message is not a JSON object.")
+    return message
+
+
+def _recv_exactly(sock: socket.socket, n: int) -> bytes:
+    parts = []
+    while n:
+        part = sock.recv(min(n, 1 << 20))
+        if not part:
+            raise ConnectionError("The server closed the connection.")
+        parts.append(part)
+        n -= len(part)
+    return b"".join(parts)
+
+
+def request(message: dict, address: str | None = None) -> dict:
+    """
+    Sends `message` to the server at `address` and returns its reply.
+    Raises `OSError` if no server is listening there.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(address or default_address())
+        sock.sendall(encode(message))
+        (n,) = HEADER.unpack(_recv_exactly(sock, HEADER.size))
+        if n > MAX_MESSAGE:
+            raise ConnectionError("Reply of %d bytes is too long." % n)
+        return decode(_recv_exactly(sock, n))
+
+
+def compile_remote(
+    filename: str,
+    emit: bool = True,
+    opt_level: int = 0,
+    layout: str = "aligned",
+    address: str | None = None,
+) -> dict | None:
+    """
+    Compiles `filename` on the server at `address`. Returns its reply,
+    or `None` if no server is running or it could not compile the file,
+    for the caller to compile it itself.
+    """
+    try:
+        reply = request(
+            {
+                "path": os.path.abspath(filename),
+                "emit": emit,
+                "opt_level": opt_level,
+                "layout": layout,
+            },
+            address,
+        )
+    except (OSError, ValueError):
+        return None
+    if "failure" in reply:
+        return None
+    return reply
+
+
+def write_reply(reply: dict, out: TextIO, emit: bool = True) -> int | None:
+    """
+    Prints the `reply` to a compile request to `out` as `compile_file`
+    prints a compilation, and returns the frame size, or `None` if the
+    source has an error.
+    """
+    if reply["error"] is not None:
+        print(reply["error"], file=out)
+        return None
+    if emit:
+        out.write(reply["code"])
+        print(file=out)
+        print(file=out)
+    print("Frame size: %d" % reply["used"], file=out)
+    if reply["temp_slots"] is not None:
+        print("Temporaries live at once: %d" % reply["temp_slots"], file=out)
+    return reply["used"]
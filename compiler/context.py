@@ -0,0 +1,101 @@
+"""
+Per-compilation state.
+"""
+
+from compiler.tokens import *
+from compiler.symbols import *
+from compiler.ir import Code, Sink
+from contextvars import ContextVar, Token as ContextToken
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from compiler.instrument import Profile
+
+KEYWORDS: dict[str, Word] = {
+    w.lexeme: w
+    for w in [
+        Word("if", Tag.IF),
+        Word("else", Tag.ELSE),
+        Word("while", Tag.WHILE),
+        Word("do", Tag.DO),
+        Word("break", Tag.BREAK),
+        Word.TRUE,
+        Word.FALSE,
+        Type.INT,
+        Type.CHAR,
+        Type.BOOL,
+        Type.FLOAT,
+    ]
+}
+
+
+class CompilationContext:
+    """
+    Everything one compilation owns: its label and temporary
+    counters, the word table the lexer fills in, the sink
+    generated code goes to, the optimization level and the storage
+    layout of variables (see `compiler.layout`), and the array types
+    of the program, one for each shape. A `profile`, if
+    given, collects counters and timings (see `compiler.instrument`).
+
+    Syntax tree nodes reach the context they are generating code for
+    through `current()`, which is set inside `with context:`. Context
+    variables are local to each thread, so independent compilations
+    can run side by side.
+    """
+
+    labels: int
+    temps: int
+    words: dict[str, Word]
+    arrays: dict[tuple[int, Type], Array]
+    out: Sink
+    opt_level: int
+    layout: str
+    profile: "Profile | None"
+
+    def __init__(
+        self,
+        out: Sink | None = None,
+        opt_level: int = 0,
+        layout: str = "aligned",
+        profile: "Profile | None" = None,
+    ) -> None:
+        self.labels = 0
+        self.temps = 0
+        self.words = dict(KEYWORDS)
+        self.arrays = {}
+        self.out = out if out is not None else Code()
+        self.opt_level = opt_level
+        self.layout = layout
+        self.profile = profile
+        self._tokens: list[ContextToken] = []
+
+    def new_label(self) -> int:
+        self.labels += 1
+        return self.labels
+
+    def new_temp(self) -> int:
+        self.temps += 1
+        return self.temps
+
+    def array(self, sz: int, p: Type) -> Array:
+        "The array of `sz` elements of type `p`, made once per compilation."
+        a = self.arrays.get((sz, p))
+        if a is None:
+            a = self.arrays[sz, p] = Array(sz, p)
+        return a
+
+    def __enter__(self) -> "CompilationContext":
+        self._tokens.append(_current.set(self))
+        return self
+
+    def __exit__(self, *exc) -> None:
+        _current.reset(self._tokens.pop())
+
+
+_current: ContextVar[CompilationContext] = ContextVar("compilation_context")
+
+
+def current() -> CompilationContext:
+    """The context of the compilation running in this thread."""
+    return _current.get()
@@ -0,0 +1,149 @@
+"""
+Local common-subexpression elimination.
+
+Array accesses recompute their offsets every time: `a[i] = a[j]`
+followed by `a[i] < v` computes `i * 8` twice, and each access to a
+multidimensional array recomputes the whole chain of row offsets.
+Within a basic block, each computation of an operator, negation or
+array load is looked up among those already available; a temporary
+that would recompute one is replaced by the temporary that holds it.
+Only a destination of the type the value is computed in holds it: an
+integral variable assigned a float value holds it truncated.
+
+A value stops being available when one of its operands, or the
+variable holding it, is assigned, and the loads from an array stop
+being available when an element of that array is stored. Variables of
+sibling blocks share storage (see `compiler.layout`), and the code
+stands for programs over that layout, so assigning a variable or an
+element of an array also counts as assigning every variable whose
+storage it overlaps.
+"""
+
+from compiler.ir import *
+from compiler.cfg import basic_blocks
+from compiler.intermediate import Constant, Expr, Id, Temp
+from compiler.symbols import Array, Type
+
+_COMMUTATIVE = ("+", "*")
+
+
+def cse(instrs: list[tuple]) -> list[tuple]:
+    """
+    `instrs` with the common subexpressions of each basic block
+    computed once.
+    """
+    rename: dict[Temp, Expr] = {}
+    out: list[tuple] = []
+    for block in basic_blocks(instrs):
+        _number_block(block, rename, out)
+    return out
+
+
+def _key(x: Expr) -> object:
+    "Constants are the same value when they are equal, other operands are themselves."
+    if isinstance(x, Constant):
+        return (x.type, x.value)
+    return x
+
+
+def _number_block(block: list[tuple], rename: dict[Temp, Expr], out: list[tuple]) -> None:
+    available: dict[tuple, Expr] = {}
+    for instr in block:
+        code = instr[0]
+        if code != LABEL and rename:
+            instr = _renamed(instr, rename)
+        if code == BINARY:
+            dst, x, op, y = instr[1:]
+            key = (op, _key(x), _key(y))
+            if op in _COMMUTATIVE and key not in available:
+                swapped = (op, _key(y), _key(x))
+                if swapped in available:
+                    key = swapped
+            p = Type.max(x.type, y.type)
+        elif code == UNARY:
+            dst = instr[1]
+            key = (instr[2], _key(instr[3]))
+            p = instr[3].type
+        elif code == LOAD:
+            dst = instr[1]
+            key = ("[]", instr[2], _key(instr[3]))
+            p = instr[2].type
+            while isinstance(p, Array):
+                p = p.of
+        else:
+            if code == COPY or code == STORE:
+                _kill(available, instr[1])
+            out.append(instr)
+            continue
+
+        # a destination of another type than `p` holds the value converted
+        exact = dst.type is p
+        held = available.get(key)
+        if held is not None and exact and isinstance(dst, Temp):
+            # the temporary is assigned only here, so its uses can be renamed
+            rename[dst] = held
+            continue
+        if held is not None:
+            instr = (COPY, dst, held)
+        _kill(available, dst)
+        if dst not in key and held is None and exact:
+            available[key] = dst
+        out.append(instr)
+
+
+def _kill(available: dict[tuple, Expr], v: Expr) -> None:
+    "Forgets the values that use `v` or are held by it, or by a variable it overlaps."
+    if isinstance(v, Id):
+        gone = [
+            k
+            for k, held in available.items()
+            if _overlaps(held, v) or any(_overlaps(x, v) for x in k)
+        ]
+    else:
+        gone = [k for k, held in available.items() if held is v or v in k]
+    for k in gone:
+        del available[k]
+
+
+def _overlaps(x: object, v: Id) -> bool:
+    "Whether `x` is a variable whose storage overlaps that of `v`."
+    return (
+        isinstance(x, Id)
+        and x.offset < v.offset + v.type.width
+        and v.offset < x.offset + x.type.width
+    )
+
+
+def _renamed(instr: tuple, rename: dict[Temp, Expr]) -> tuple:
+    "`instr` with its operands renamed; destinations and labels are left alone."
+    code = instr[0]
+    if code == COPY:
+        return (COPY, instr[1], rename.get(instr[2], instr[2]))
+    if code == UNARY:
+        return (UNARY, instr[1], instr[2], rename.get(instr[3], instr[3]))
+    if code == BINARY:
+        return (
+            BINARY,
+            instr[1],
+            rename.get(instr[2], instr[2]),
+            instr[3],
+            rename.get(instr[4], instr[4]),
+        )
+    if code == LOAD:
+        return (LOAD, instr[1], instr[2], rename.get(instr[3], instr[3]))
+    if code == STORE:
+        return (
+            STORE,
+            instr[1],
+            rename.get(instr[2], instr[2]),
+            rename.get(instr[3], instr[3]),
+        )
+    if code == IF or code == IFFALSE:
+        return (
+            code,
+            instr[1],
+            rename.get(instr[2], instr[2]),
+            instr[3],
+            rename.get(instr[4], instr[4]),
+        )
+    return instr
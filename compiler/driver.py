@@ -0,0 +1,256 @@
+"""
+Compiling source files, one at a time or as a batch over a process pool.
+"""
+
+from compiler.lexer import Lexer
+from compiler.parser import Parser
+from compiler.intermediate import Stmt
+from compiler.error import ExecutionError, ParseError
+from compiler.context import CompilationContext
+from compiler.ir import Code, NullSink, TextSink
+from compiler.cfg import CFG
+from compiler.vm import VM
+from compiler.pyback import PythonProgram
+from compiler.incremental import BlockCache
+from compiler.instrument import Profile, phase
+from compiler.binfmt import dump
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, TextIO
+import glob
+import os
+import time
+
+
+def compile_file(
+    filename: str,
+    out: TextIO,
+    emit: bool = True,
+    opt_level: int = 0,
+    dot: str | None = None,
+    run: bool = False,
+    backend: str = "vm",
+    layout: str = "aligned",
+    cache_dir: str | None = None,
+    profile: Profile | None = None,
+    binary: str | None = None,
+) -> int | None:
+    """
+    Compiles `filename` at `opt_level` and prints the code, followed by
+    the size of the frame its variables are laid out in with `layout`,
+    to `out`. A `ParseError` is printed instead.
+    When optimizing, the number of temporary slots the code needs is printed last.
+
+    The control-flow graph of the code is written to the file `dot`, if given.
+    With `run`, the program is then executed on the `backend`: the virtual
+    machine, which prints how many instructions it ran and how fast, or
+    the program translated into Python, which prints how long it took.
+
+    With a `cache_dir`, nested blocks are compiled incrementally with a
+    `BlockCache` there, and how many came from the cache is printed after
+    the frame size. The Python backend needs the whole syntax tree, so
+    it always compiles everything.
+
+    A `profile` collects the counters and phase timings of the compilation.
+
+    The code, the syntax tree it was generated from and the layout of
+    the variables are written to the file `binary`, if given, in the
+    format of `compiler.binfmt`. The tree is left out of incremental
+    compiles, which do not build all of it.
+
+    Returns the frame size, or `None` if the source has an error.
+    """
+    with open(filename, "r", encoding="utf-8") as f:
+        if dot is not None or binary is not None or (run and backend == "vm"):
+            sink = Code()
+        else:
+            sink = TextSink(out) if emit else NullSink()
+        ctx = CompilationContext(
+            out=sink, opt_level=opt_level, layout=layout, profile=profile
+        )
+        cache = None
+        if cache_dir is not None and not (run and backend == "python"):
+            cache = BlockCache(cache_dir)
+        parser = Parser(Lexer(f if cache is None else f.read(), ctx=ctx), cache=cache)
+        try:
+            parser.program()
+        except ParseError as err:
+            print(err, file=out)
+            return None
+        finally:
+            if cache is not None:
+                cache.save()
+    if dot is not None:
+        with open(dot, "w", encoding="utf-8") as g:
+            CFG(sink.instrs).write_dot(g)
+    if binary is not None:
+        with open(binary, "wb") as g:
+            dump(
+                g,
+                sink.instrs,
+                parser.tree if cache is None else None,
+                parser.symbols.declared,
+                parser.used,
+                parser.temp_slots,
+            )
+    if isinstance(sink, Code) and emit:
+        with phase(profile, "emit"):
+            sink.write(out)
+    if emit:
+        print(file=out)
+        print(file=out)
+    print("Frame size: %d" % parser.used, file=out)
+    if parser.temp_slots is not None:
+        print("Temporaries live at once: %d" % parser.temp_slots, file=out)
+    if cache is not None:
+        print(
+            "Blocks from the cache: %d of %d" % (cache.hits, cache.hits + cache.misses),
+            file=out,
+        )
+    if run and backend == "python":
+        run_python(parser.tree, parser.used, out)
+    elif run:
+        run_code(sink.instrs, parser.used, out)
+    return parser.used
+
+
+def run_python(tree: Stmt, used: int, out: TextIO) -> None:
+    "Runs the program `tree` translated into Python, and prints how long it took."
+    program = PythonProgram(tree, used)
+    start = time.perf_counter()
+    try:
+        program.run()
+    except ExecutionError as err:
+        print(err, file=out)
+        return
+    print(
+        "Ran in %.3f s as %s Python"
+        % (time.perf_counter() - start, "structured" if program.structured else "block dispatch"),
+        file=out,
+    )
+
+
+def run_code(instrs: list[tuple], used: int, out: TextIO) -> None:
+    "Runs `instrs` on the virtual machine, and prints how fast it went."
+    vm = VM(instrs, used)
+    start = time.perf_counter()
+    try:
+        n = vm.run()
+    except ExecutionError as err:
+        print(err, file=out)
+        return
+    seconds = time.perf_counter() - start
+    print(
+        "Executed %d instructions in %.3f s (%.0f instructions/s)"
+        % (n, seconds, n / seconds if seconds else 0),
+        file=out,
+    )
+
+
+class FileResult:
+    "Outcome of compiling one file of a batch."
+
+    def __init__(self, source: str, output: str, used: int | None, seconds: float):
+        self.source = source
+        self.output = output
+        self.used = used
+        self.seconds = seconds
+
+    @property
+    def ok(self) -> bool:
+        return self.used is not None
+
+
+def compile_to(
+    source: str,
+    output: str,
+    emit: bool = True,
+    opt_level: int = 0,
+    layout: str = "aligned",
+) -> FileResult:
+    """
+    Compiles `source` into the file `output`, timing it. A source that
+    cannot be read or compiled fails alone: the error is written to
+    `output`, and the result is not `ok`.
+    """
+    start = time.perf_counter()
+    used = None
+    try:
+        with open(output, "w", encoding="utf-8") as out:
+            try:
+                used = compile_file(source, out, emit, opt_level, layout=layout)
+            except Exception as err:
+                print("%s: %s" % (type(err).__name__, err), file=out)
+    except OSError:
+        pass
+    return FileResult(source, output, used, time.perf_counter() - start)
+
+
+def expand_sources(args: Iterable[str], suffix: str = ".txt") -> list[str]:
+    """
+    Source files named by `args`: files as given, every `*suffix`
+    file directly inside a directory, and the matches of glob patterns.
+    """
+    sources: list[str] = []
+    for arg in args:
+        if os.path.isdir(arg):
+            sources += sorted(glob.glob(os.path.join(glob.escape(arg), "*" + suffix)))
+        elif glob.has_magic(arg):
+            sources += sorted(glob.glob(arg))
+        else:
+            sources.append(arg)
+    return sources
+
+
+def output_name(source: str, out_dir: str | None, suffix: str = ".tac") -> str:
+    "Output file for `source`: beside it, or in `out_dir` if given."
+    stem = os.path.splitext(source)[0]
+    if out_dir is None:
+        return stem + suffix
+    return os.path.join(out_dir, os.path.basename(stem) + suffix)
+
+
+def compile_batch(
+    sources: list[str],
+    out_dir: str | None = None,
+    jobs: int = 1,
+    emit: bool = True,
+    opt_level: int = 0,
+    layout: str = "aligned",
+) -> list[FileResult]:
+    """
+    Compiles every file of `sources` into its own output file,
+    across `jobs` worker processes. Results are in `sources` order.
+    """
+    outputs = [output_name(s, out_dir) for s in sources]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError("Several sources would be compiled to the same output file.")
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+    emits = [emit] * len(sources)
+    levels = [opt_level] * len(sources)
+    layouts = [layout] * len(sources)
+    if jobs <= 1:
+        return list(map(compile_to, sources, outputs, emits, levels, layouts))
+    with ProcessPoolExecutor(jobs) as pool:
+        chunk = max(1, len(sources) // (jobs * 4))
+        return list(
+            pool.map(
+                compile_to, sources, outputs, emits, levels, layouts, chunksize=chunk
+            )
+        )
+
+
+def print_report(results: list[FileResult], seconds: float, out: TextIO) -> None:
+    "Per-file timing and the aggregate frame size of a batch."
+    for r in results:
+        used = "%d" % r.used if r.ok else "error"
+        print("%s -> %s  %s  %.3f s" % (r.source, r.output, used, r.seconds), file=out)
+    failed = sum(not r.ok for r in results)
+    print(
+        "%d files, %d failed, %.3f s" % (len(results), failed, seconds),
+        file=out,
+    )
+    print(
+        "Total frame size: %d" % sum(r.used for r in results if r.ok),
+        file=out,
+    )
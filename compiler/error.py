@@ -2,4 +2,7 @@ class ParseError(RuntimeError):
     pass
 
 class GrammarError(RuntimeError):
-    pass
\ No newline at end of file
+    pass
+
+class ExecutionError(RuntimeError):
+    pass
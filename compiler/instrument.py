@@ -0,0 +1,166 @@
+"""
+Instrumentation of a compilation: what it made, and where its time went.
+
+A `Profile` given to a `CompilationContext` is filled in as the parser
+works. Lexing, parsing, type checking and code generation are
+interleaved, so the profile wraps the lexer to time lexing apart, and
+counts what comes out of the sink. Type checking happens as the parser
+builds the nodes, and its time is part of parsing; a `cProfile` dump
+(`--pstats`) breaks that down by function. Code that is printed as it
+is generated is timed with generation.
+
+Without a profile, the compiler runs exactly as before: nothing is
+wrapped, and each phase costs one test of `ctx.profile`.
+"""
+
+from compiler.ir import Sink
+from compiler.intermediate import Node
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager, Iterator, TextIO
+import json
+import time
+
+PHASES = ("lex", "parse", "fold", "gen", "optimize", "emit")
+
+
+class CountingSink(Sink):
+    "Hands instructions on to `sink`, counting them."
+
+    def __init__(self, sink: Sink) -> None:
+        self.sink = sink
+        self.count = 0
+
+    def emit(self, instr: tuple) -> None:
+        self.count += 1
+        self.sink.emit(instr)
+
+    def flush(self) -> None:
+        self.sink.flush()
+
+
+class Profile:
+    """
+    Counters and phase timings of one compilation.
+
+    `seconds` holds the time spent in each of `PHASES`, exclusive of
+    lexing, which parsing pulls tokens from as it goes. `nodes` counts
+    the nodes of the syntax tree by class, before folding.
+    """
+
+    seconds: dict[str, float]
+    tokens: int
+    nodes: Counter
+    temps: int
+    labels: int
+
+    def __init__(self) -> None:
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.tokens = 0
+        self.nodes = Counter()
+        self.temps = 0
+        self.labels = 0
+        self._sink: CountingSink | None = None
+
+    @property
+    def instructions(self) -> int:
+        "Instructions handed to the sink of the compilation."
+        return self._sink.count if self._sink is not None else 0
+
+    def instrument(self, parser) -> None:
+        "Wraps the lexer and the sink of `parser` to count and time them."
+        lexer = parser.lex
+        scan = lexer.scan
+        clock = time.perf_counter
+
+        def timed_scan():
+            start = clock()
+            tok = scan()
+            self.seconds["lex"] += clock() - start
+            if tok is not None:
+                self.tokens += 1
+            return tok
+
+        lexer.scan = timed_scan
+        self._sink = CountingSink(parser.ctx.out)
+        parser.ctx.out = self._sink
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        "Adds the time the body takes, less any lexing, to the phase `name`."
+        lexing = self.seconds["lex"]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.seconds[name] += elapsed - (self.seconds["lex"] - lexing)
+
+    def count_nodes(self, tree: Node) -> None:
+        "Counts the nodes reachable from `tree`, each once."
+        slots: dict[type, list[str]] = {}
+        counts: Counter = Counter()
+        seen: set[int] = set()
+        stack: list = [tree]
+        while stack:
+            x = stack.pop()
+            if id(x) in seen:
+                continue
+            seen.add(id(x))
+            cls = type(x)
+            counts[cls] += 1
+            names = slots.get(cls)
+            if names is None:
+                names = slots[cls] = [
+                    n for c in cls.__mro__ for n in getattr(c, "__slots__", ())
+                ]
+            for n in names:
+                child = getattr(x, n, None)
+                if isinstance(child, Node):
+                    stack.append(child)
+                elif isinstance(child, list):
+                    stack += child
+        for cls, n in counts.items():
+            self.nodes[cls.__name__] += n
+
+    def finish(self, ctx) -> None:
+        "Takes the label and temporary counts of the compilation context `ctx`."
+        self.temps = ctx.temps
+        self.labels = ctx.labels
+
+    def as_dict(self) -> dict:
+        return {
+            "seconds": {name: round(s, 6) for name, s in self.seconds.items()},
+            "total": round(sum(self.seconds.values()), 6),
+            "counts": {
+                "tokens": self.tokens,
+                "nodes": sum(self.nodes.values()),
+                "temps": self.temps,
+                "labels": self.labels,
+                "instructions": self.instructions,
+            },
+            "nodes": dict(self.nodes.most_common()),
+        }
+
+    def write_json(self, f: TextIO, **extra) -> None:
+        "Writes the profile as a JSON object, with the fields of `extra` first."
+        json.dump(dict(extra, **self.as_dict()), f, indent=2)
+        f.write("\n")
+
+    def report(self, f: TextIO) -> None:
+        "Prints the timings and counts as a table."
+        total = sum(self.seconds.values())
+        for name, s in self.seconds.items():
+            share = s / total * 100 if total else 0
+            print("%-12s %9.3f s %5.1f%%" % (name, s, share), file=f)
+        print("%-12s %9.3f s" % ("total", total), file=f)
+        d = self.as_dict()
+        for name, n in d["counts"].items():
+            print("%-12s %11d" % (name, n), file=f)
+        for name, n in d["nodes"].items():
+            print("  %-10s %11d" % (name, n), file=f)
+
+
+def phase(profile: Profile | None, name: str) -> ContextManager:
+    "`profile.phase(name)`, or nothing without a profile."
+    return nullcontext() if profile is None else profile.phase(name)
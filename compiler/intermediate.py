@@ -2,32 +2,36 @@ from compiler.lexer import Lexer
 from compiler.tokens import *
 from compiler.symbols import *
 from compiler.error import GrammarError
+from compiler.ir import *
+from compiler.context import current
+import operator
 
 
 class Node:
     "Base class of nodes in syntax tree."
 
-    labels: int = 0
+    __slots__ = ()
 
     def __init__(self):
         pass
 
     @staticmethod
     def new_label() -> int:
-        Node.labels += 1
-        return Node.labels
+        return current().new_label()
 
     def error(self, s) -> None:
         raise GrammarError(s)
 
-    def emit_label(seif, i: int) -> None:
-        print("L%d:" % i, end="")
+    def emit_label(self, i: int) -> None:
+        current().out.emit((LABEL, i))
 
-    def emit(self, s: str) -> None:
-        print("\t" + s)
+    def emit(self, instr: tuple) -> None:
+        current().out.emit(instr)
 
 
 class Expr(Node):
+    __slots__ = ("op", "type")
+
     def __init__(self, op: Token, typeToken: Type) -> None:
         self.op = op
         self.type = typeToken
@@ -38,54 +42,69 @@ class Expr(Node):
     def reduce(self) -> "Expr":
         return self
 
-    def emit_jumps(self, test: str, t: int, f: int) -> None:
+    def fold(self) -> "Expr":
+        "This expression with its constant parts folded."
+        return self
+
+    def assign(self, dst: "Expr") -> tuple:
+        "Instruction storing the value of this expression in `dst`."
+        return (COPY, dst, self)
+
+    def emit_jumps(
+        self, x: "Expr", op: str | None, y: "Expr | None", t: int, f: int
+    ) -> None:
         if t != 0 and f != 0:
-            self.emit("if %s goto L%d" % (test, t))
-            self.emit("goto L%d" % f)
+            self.emit((IF, t, x, op, y))
+            self.emit((GOTO, f))
         elif t != 0:
-            self.emit("if %s goto L%d" % (test, t))
+            self.emit((IF, t, x, op, y))
         elif f != 0:
-            self.emit("iffalse %s goto L%d" % (test, f))
+            self.emit((IFFALSE, f, x, op, y))
         else:
             pass
 
     def jumping(self, t: int, f: int) -> None:
-        self.emit_jumps(self.__str__(), t, f)
+        self.emit_jumps(self, None, None, t, f)
 
     def __str__(self) -> str:
         return str(self.op)
 
 
 class Id(Expr):
+    __slots__ = ("offset",)
+
     def __init__(self, id: Word, p: Type, b: int) -> None:
         super().__init__(id, p)
         self.offset = b
 
 
 class Temp(Expr):
-    count: int = 0
+    __slots__ = ("number",)
 
     def __init__(self, p: Type) -> None:
         super().__init__(Word.TEMP, p)
-        Temp.count += 1
-        self.number = Temp.count
+        self.number = current().new_temp()
 
     def __str__(self) -> str:
         return "t%d" % self.number
 
 
 class Op(Expr):
+    __slots__ = ()
+
     def __init__(self, tok: Token, p: Type) -> None:
         super().__init__(tok, p)
 
     def reduce(self) -> Expr:
         x: Expr = self.gen()
         t: Temp = Temp(self.type)
-        self.emit(str(t) + " = " + str(x))
+        self.emit(x.assign(t))
         return t
 
 
 class Arith(Op):
+    __slots__ = ("expr1", "expr2")
+
     def __init__(self, tok: Token, expr1: Expr, expr2: Expr) -> None:
         t = Type.max(expr1.type, expr2.type)
         if t is None:
@@ -97,11 +116,35 @@ class Arith(Op):
     def gen(self) -> Expr:
         return Arith(self.op, self.expr1.reduce(), self.expr2.reduce())
 
+    def fold(self) -> Expr:
+        x = self.expr1 = self.expr1.fold()
+        y = self.expr2 = self.expr2.fold()
+        op = str(self.op)
+        if isinstance(x, Constant) and isinstance(y, Constant):
+            v = fold_arith(op, x.value, y.value, self.type)
+            if v is not None:
+                return Constant.of(v, self.type)
+        # x * 1, 1 * x, x + 0, 0 + x, x - 0
+        if op == "*" or op == "+":
+            unit = 1 if op == "*" else 0
+            if is_constant(y, unit) and x.type == self.type:
+                return x
+            if is_constant(x, unit) and y.type == self.type:
+                return y
+        elif op == "-" and is_constant(y, 0) and x.type == self.type:
+            return x
+        return self
+
+    def assign(self, dst: Expr) -> tuple:
+        return (BINARY, dst, self.expr1, str(self.op), self.expr2)
+
     def __str__(self) -> str:
         return "%s %s %s" % (str(self.expr1), str(self.op), str(self.expr2))
 
 
 class Unary(Op):
+    __slots__ = ("expr",)
+
     def __init__(self, tok: Token, expr: Expr) -> None:
         t = Type.max(Type.INT, expr.type)
         if t is None:
@@ -112,8 +155,19 @@ class Unary(Op):
     def gen(self) -> Expr:
         return Unary(self.op, self.expr.reduce())
 
+    def fold(self) -> Expr:
+        x = self.expr = self.expr.fold()
+        if isinstance(x, Constant):
+            return Constant.of(-x.value, self.type)
+        return self
+
+    def assign(self, dst: Expr) -> tuple:
+        return (UNARY, dst, str(self.op), self.expr)
+
 
 class Constant(Expr):
+    __slots__ = ()
+
     def __init__(self, tok: Token, p: Type) -> None:
         super().__init__(tok, p)
 
@@ -121,21 +175,76 @@ class Constant(Expr):
     def c_number(cls, i: int) -> "Constant":
         return Constant(Num(i), Type.INT)
 
+    @classmethod
+    def of(cls, v: int | float | bool, p: Type) -> "Constant":
+        "Constant of type `p` with value `v`."
+        if p == Type.BOOL:
+            return Constant.TRUE if v else Constant.FALSE
+        if p == Type.FLOAT:
+            return Constant(Real(float(v)), p)
+        return Constant(Num(int(v)), p)
+
+    @property
+    def value(self) -> int | float | bool:
+        if self.op.tag == Tag.TRUE:
+            return True
+        if self.op.tag == Tag.FALSE:
+            return False
+        return self.op.value
+
     def jumping(self, t: int, f: int) -> None:
         if self == Constant.TRUE and t != 0:
-            self.emit("goto L %d" % t)
+            self.emit((GOTO, t))
         if self == Constant.FALSE and f != 0:
-            self.emit("goto L %d" % f)
+            self.emit((GOTO, f))
 
 
 Constant.TRUE = Constant(Word.TRUE, Type.BOOL)
 Constant.FALSE = Constant(Word.FALSE, Type.BOOL)
 
 
+def is_constant(x: Expr, v: int) -> bool:
+    "Whether `x` is the numeric constant `v`."
+    return isinstance(x, Constant) and x.type != Type.BOOL and x.value == v
+
+
+def fold_arith(op: str, a: int | float, b: int | float, p: Type) -> int | float | None:
+    """
+    Value of `a op b` computed in type `p`: integer division truncates
+    toward zero. `None` if it is not known at compile time.
+    """
+    if p == Type.FLOAT:
+        a, b = float(a), float(b)
+    if op == "+":
+        return a + b
+    if op == "-":
+        return a - b
+    if op == "*":
+        return a * b
+    if b == 0:
+        return None
+    if p == Type.FLOAT:
+        return a / b
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+
+RELATIONS = {
+    "<": operator.lt,
+    ">": operator.gt,
+    "<=": operator.le,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
 class Logical(Expr):
+    __slots__ = ("expr1", "expr2")
+
     @classmethod
     def check(cls, p1: Type, p2: Type) -> Type | None:
-        return Type.BOOL if p1 == Type.BOOL and p2 == Type.BOOL else None
+        return Type.BOOL if p1 is Type.BOOL and p2 is Type.BOOL else None
 
     def __init__(self, tok: Token, expr1: Expr, expr2: Expr) -> None:
         t = self.check(expr1.type, expr2.type)
@@ -150,21 +259,38 @@ class Logical(Expr):
         a = Node.new_label()
         temp = Temp(self.type)
         self.jumping(0, f)
-        self.emit("%s = true" % str(temp))
-        self.emit("goto L%d" % a)
+        self.emit((COPY, temp, Constant.TRUE))
+        self.emit((GOTO, a))
         self.emit_label(f)
-        self.emit("%s = false" % str(temp))
+        self.emit((COPY, temp, Constant.FALSE))
         self.emit_label(a)
         return temp
 
+    def reduce(self) -> Expr:
+        "The temporary the jumping code of `gen()` sets to the value."
+        return self.gen()
+
     def __str__(self) -> str:
         return "%s %s %s" % (str(self.expr1), str(self.op), str(self.expr2))
 
 
 class Or(Logical):
+    __slots__ = ()
+
     def __init__(self, tok: Token, expr1: Expr, expr2: Expr) -> None:
         super().__init__(tok, expr1, expr2)
 
+    def fold(self) -> Expr:
+        x = self.expr1 = self.expr1.fold()
+        y = self.expr2 = self.expr2.fold()
+        if x == Constant.TRUE or y == Constant.TRUE:
+            return Constant.TRUE
+        if x == Constant.FALSE:
+            return y
+        if y == Constant.FALSE:
+            return x
+        return self
+
     def jumping(self, t: int, f: int) -> None:
         label = t if t != 0 else Node.new_label()
         self.expr1.jumping(label, 0)
@@ -174,9 +300,22 @@ class Or(Logical):
 
 
 class And(Logical):
+    __slots__ = ()
+
     def __init__(self, tok: Token, expr1: Expr, expr2: Expr) -> None:
         super().__init__(tok, expr1, expr2)
 
+    def fold(self) -> Expr:
+        x = self.expr1 = self.expr1.fold()
+        y = self.expr2 = self.expr2.fold()
+        if x == Constant.FALSE or y == Constant.FALSE:
+            return Constant.FALSE
+        if x == Constant.TRUE:
+            return y
+        if y == Constant.TRUE:
+            return x
+        return self
+
     def jumping(self, t: int, f: int) -> None:
         label = f if f != 0 else Node.new_label()
         self.expr1.jumping(0, label)
@@ -186,9 +325,17 @@ class And(Logical):
 
 
 class Not(Logical):
+    __slots__ = ()
+
     def __init__(self, tok: Token, expr2: Expr) -> None:
         super().__init__(tok, expr2, expr2)
 
+    def fold(self) -> Expr:
+        x = self.expr1 = self.expr2 = self.expr2.fold()
+        if isinstance(x, Constant):
+            return Constant.of(not x.value, Type.BOOL)
+        return self
+
     def jumping(self, t: int, f: int) -> None:
         self.expr2.jumping(f, t)
 
@@ -197,23 +344,33 @@ class Not(Logical):
 
 
 class Rel(Logical):
+    __slots__ = ()
+
     @classmethod
     def check(cls, p1: Type, p2: Type) -> Type | None:
-        if isinstance(p1, Array) or isinstance(p2, Array):
+        if p1 is not p2 or isinstance(p1, Array):
             return None
-        return Type.BOOL if p1 == p2 else None
+        return Type.BOOL
 
     def __init__(self, tok: Token, expr1: Expr, expr2: Expr):
         super().__init__(tok, expr1, expr2)
 
+    def fold(self) -> Expr:
+        x = self.expr1 = self.expr1.fold()
+        y = self.expr2 = self.expr2.fold()
+        if isinstance(x, Constant) and isinstance(y, Constant):
+            return Constant.of(RELATIONS[str(self.op)](x.value, y.value), Type.BOOL)
+        return self
+
     def jumping(self, t: int, f: int) -> None:
         a = self.expr1.reduce()
         b = self.expr2.reduce()
-        test = "%s %s %s" % (str(a), str(self.op), str(b))
-        self.emit_jumps(test, t, f)
+        self.emit_jumps(a, str(self.op), b, t, f)
 
 
 class Access(Op):
+    __slots__ = ("array", "index")
+
     def __init__(self, a: Id, i: Expr, p: Type) -> None:
         super().__init__(Word("[]", Tag.INDEX), p)
         self.array = a
@@ -222,14 +379,23 @@ class Access(Op):
     def gen(self) -> Expr:
         return Access(self.array, self.index.reduce(), self.type)
 
+    def fold(self) -> Expr:
+        self.index = self.index.fold()
+        return self
+
+    def assign(self, dst: Expr) -> tuple:
+        return (LOAD, dst, self.array, self.index)
+
     def jumping(self, t: int, f: int) -> None:
-        self.emit_jumps(str(self.reduce()), t, f)
+        self.emit_jumps(self.reduce(), None, None, t, f)
 
     def __str__(self) -> str:
         return "%s[%s]" % (str(self.array), str(self.index))
 
 
 class Stmt(Node):
+    __slots__ = ("after",)
+
     def __init__(self) -> None:
         self.after = 0
         super().__init__()
@@ -237,11 +403,20 @@ class Stmt(Node):
     def gen(self, b: int, a: int) -> None:
         pass
 
+    def fold(self) -> "Stmt":
+        """
+        This statement with constant expressions folded, and with
+        branches that can never run taken out.
+        """
+        return self
+
 
 Stmt.NULL = Stmt()
 
 
 class If(Stmt):
+    __slots__ = ("expr", "stmt")
+
     def __init__(self, x: Expr, s: Stmt) -> None:
         super().__init__()
         if x.type != Type.BOOL:
@@ -255,8 +430,19 @@ class If(Stmt):
         self.emit_label(label)
         self.stmt.gen(label, a)
 
+    def fold(self) -> Stmt:
+        x = self.expr = self.expr.fold()
+        s = self.stmt = self.stmt.fold()
+        if x == Constant.TRUE:
+            return s
+        if x == Constant.FALSE or s == Stmt.NULL:
+            return Stmt.NULL
+        return self
+
 
 class Else(Stmt):
+    __slots__ = ("expr", "stmt1", "stmt2")
+
     def __init__(self, x: Expr, s1: Stmt, s2: Stmt) -> None:
         super().__init__()
         if x.type != Type.BOOL:
@@ -271,12 +457,24 @@ class Else(Stmt):
         self.expr.jumping(0, label2)
         self.emit_label(label1)
         self.stmt1.gen(label1, a)
-        self.emit("goto L%d" % a)
+        self.emit((GOTO, a))
         self.emit_label(label2)
         self.stmt2.gen(label2, a)
 
+    def fold(self) -> Stmt:
+        x = self.expr = self.expr.fold()
+        self.stmt1 = self.stmt1.fold()
+        self.stmt2 = self.stmt2.fold()
+        if x == Constant.TRUE:
+            return self.stmt1
+        if x == Constant.FALSE:
+            return self.stmt2
+        return self
+
 
 class While(Stmt):
+    __slots__ = ("expr", "stmt")
+
     def init(self, x: Expr, s: Stmt) -> None:
         super().__init__()
         if x.type != Type.BOOL:
@@ -290,10 +488,18 @@ class While(Stmt):
         label = Node.new_label()
         self.emit_label(label)
         self.stmt.gen(label, b)
-        self.emit("goto L%d" % b)
+        self.emit((GOTO, b))
+
+    def fold(self) -> Stmt:
+        # the loop node is kept, since its breaks refer to it
+        x = self.expr = self.expr.fold()
+        self.stmt = self.stmt.fold()
+        return Stmt.NULL if x == Constant.FALSE else self
 
 
 class Do(Stmt):
+    __slots__ = ("expr", "stmt")
+
     def init(self, s: Stmt, x: Expr) -> None:
         super().__init__()
         if x.type != Type.BOOL:
@@ -308,16 +514,18 @@ class Do(Stmt):
         self.emit_label(label)
         self.expr.jumping(b, 0)
 
+    def fold(self) -> Stmt:
+        self.expr = self.expr.fold()
+        self.stmt = self.stmt.fold()
+        return self
+
 
 class Set(Stmt):
+    __slots__ = ("id", "expr")
+
     @classmethod
     def check(cls, p1: Type, p2: Type) -> Type | None:
-        if Type.numeric(p1) and Type.numeric(p2):
-            return p2
-        elif p1 == Type.BOOL and p2 == Type.BOOL:
-            return p2
-        else:
-            return None
+        return p2 if Type.assignable(p1, p2) else None
 
     def __init__(self, i: Id, x: Expr) -> None:
         super().__init__()
@@ -330,20 +538,24 @@ class Set(Stmt):
         self.expr = x
 
     def gen(self, b: int, a: int) -> None:
-        self.emit("%s = %s" % (str(self.id), str(self.expr.gen())))
+        self.emit(self.expr.gen().assign(self.id))
+
+    def fold(self) -> Stmt:
+        x = self.expr = self.expr.fold()
+        p = self.id.type
+        if isinstance(x, Constant) and x.type == Type.FLOAT and p in (Type.INT, Type.CHAR):
+            # the variable holds the value truncated toward zero
+            self.expr = Constant.of(int(x.value), p)
+        return self
 
 
 class SetElem(Stmt):
+    __slots__ = ("array", "index", "expr")
+
     @classmethod
     def check(cls, p1: Type, p2: Type) -> Type | None:
-        if isinstance(p1, Array) or isinstance(p2, Array):
-            return None
-        elif p1 == p2:
-            return p2
-        elif Type.numeric(p1) and Type.numeric(p2):
-            return p2
-        else:
-            return None
+        # arrays are not assignable, and a scalar is assignable to its own type
+        return p2 if Type.assignable(p1, p2) else None
 
     def __init__(self, x: Access, y: Expr) -> None:
         super().__init__()
@@ -357,31 +569,46 @@ class SetElem(Stmt):
         self.expr = y
 
     def gen(self, b: int, a: int) -> None:
-        self.emit(
-            "%s[%s] = %s"
-            % (str(self.array), str(self.index.reduce()), str(self.expr.reduce()))
-        )
+        self.emit((STORE, self.array, self.index.reduce(), self.expr.reduce()))
+
+    def fold(self) -> Stmt:
+        self.index = self.index.fold()
+        self.expr = self.expr.fold()
+        return self
 
 
 class Seq(Stmt):
-    def __init__(self, s1: Stmt, s2: Stmt) -> None:
+    __slots__ = ("stmts",)
+
+    def __init__(self, stmts: list[Stmt]) -> None:
+        """
+        A statement list, kept flat so that neither building
+        nor generating it recurses once per statement.
+        """
         super().__init__()
-        self.stmt1 = s1
-        self.stmt2 = s2
+        self.stmts = stmts
 
     def gen(self, b: int, a: int) -> None:
-        if self.stmt1 == Stmt.NULL:
-            self.stmt2.gen(b, a)
-        elif self.stmt2 == Stmt.NULL:
-            self.stmt1.gen(b, a)
-        else:
-            label: int = Node.new_label()
-            self.stmt1.gen(b, label)
-            self.emit_label(label)
-            self.stmt2.gen(label, a)
+        last = len(self.stmts) - 1
+        for i, s in enumerate(self.stmts):
+            if s == Stmt.NULL:
+                continue
+            if i == last:
+                s.gen(b, a)
+            else:
+                label: int = Node.new_label()
+                s.gen(b, label)
+                self.emit_label(label)
+                b = label
+
+    def fold(self) -> Stmt:
+        self.stmts = [s.fold() for s in self.stmts]
+        return self
 
 
 class Break(Stmt):
+    __slots__ = ("stmt",)
+
     def __init__(self, enclosing: Stmt) -> None:
         if enclosing == Stmt.NULL:
             self.error("Unclosed 'break' statement.")
@@ -389,4 +616,4 @@ class Break(Stmt):
         self.stmt = enclosing
 
     def gen(self, b: int, a: int) -> None:
-        self.emit("goto L%d" % self.stmt.after)
+        self.emit((GOTO, self.stmt.after))
@@ -0,0 +1,160 @@
+"""
+Three-address intermediate representation.
+
+Code generation hands instructions to a `Sink`: a `Code` list that
+keeps them, a `TextSink` that prints them as they come, or a
+`NullSink`. Each instruction is a tuple led by its opcode:
+
+    (LABEL, i)                  Li:
+    (GOTO, i)                   goto Li
+    (IF, i, x, op, y)           if x op y goto Li
+    (IFFALSE, i, x, op, y)      iffalse x op y goto Li
+    (COPY, dst, x)              dst = x
+    (UNARY, dst, op, x)         dst = op x
+    (BINARY, dst, x, op, y)     dst = x op y
+    (LOAD, dst, a, i)           dst = a[i]
+    (STORE, a, i, x)            a[i] = x
+
+Operands are the `Id`, `Temp` and `Constant` nodes themselves, `op`
+is the operator's text and labels are plain label numbers. A jump
+that tests a single value has `None` for both `op` and `y`.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Callable, TextIO
+
+LABEL = 0
+GOTO = 1
+IF = 2
+IFFALSE = 3
+COPY = 4
+UNARY = 5
+BINARY = 6
+LOAD = 7
+STORE = 8
+
+JUMPS = (GOTO, IF, IFFALSE)
+
+# positions of the operands of each kind of instruction
+OPERANDS = {
+    COPY: (1, 2),
+    UNARY: (1, 3),
+    BINARY: (1, 2, 4),
+    LOAD: (1, 2, 3),
+    STORE: (1, 2, 3),
+    IF: (2, 4),
+    IFFALSE: (2, 4),
+}
+
+
+def label_name(i: int) -> str:
+    return "L%d" % i
+
+
+def format_instr(
+    instr: tuple,
+    name: Callable[[object], str] = str,
+    label: Callable[[int], str] = label_name,
+) -> str:
+    """
+    Text of one instruction, in the format the compiler has always
+    printed: a label is written as `Li:` and an instruction as a
+    tab-indented line, so labels share the line of what follows them.
+
+    `name` and `label` render operands and label numbers.
+    """
+    code = instr[0]
+    if code == LABEL:
+        return label(instr[1]) + ":"
+    if code == COPY:
+        return "\t%s = %s\n" % (name(instr[1]), name(instr[2]))
+    if code == BINARY:
+        return "\t%s = %s %s %s\n" % (
+            name(instr[1]),
+            name(instr[2]),
+            instr[3],
+            name(instr[4]),
+        )
+    if code == LOAD:
+        return "\t%s = %s[%s]\n" % (name(instr[1]), name(instr[2]), name(instr[3]))
+    if code == STORE:
+        return "\t%s[%s] = %s\n" % (name(instr[1]), name(instr[2]), name(instr[3]))
+    if code == GOTO:
+        return "\tgoto %s\n" % label(instr[1])
+    if code == IF or code == IFFALSE:
+        test = name(instr[2])
+        if instr[3] is not None:
+            test = "%s %s %s" % (test, instr[3], name(instr[4]))
+        word = "if" if code == IF else "iffalse"
+        return "\t%s %s goto %s\n" % (word, test, label(instr[1]))
+    if code == UNARY:
+        return "\t%s = %s %s\n" % (name(instr[1]), instr[2], name(instr[3]))
+    raise ValueError("Unknown opcode %r." % (code,))
+
+
+class Sink(ABC):
+    """
+    Destination of the instructions emitted during code generation.
+    """
+
+    @abstractmethod
+    def emit(self, instr: tuple) -> None:
+        "Takes the next instruction of the code."
+
+    def flush(self) -> None:
+        pass
+
+
+class Code(Sink):
+    "A list of three-address instructions."
+
+    instrs: list[tuple]
+
+    def __init__(self) -> None:
+        self.instrs = []
+        # the list's own method, without a call through this class
+        self.emit = self.instrs.append
+
+    def emit(self, instr: tuple) -> None:
+        self.instrs.append(instr)
+
+    def __len__(self) -> int:
+        return len(self.instrs)
+
+    def __iter__(self):
+        return iter(self.instrs)
+
+    def text(self) -> str:
+        return "".join(map(format_instr, self.instrs))
+
+    def write(self, f: TextIO) -> None:
+        """Prints the instructions with a single write."""
+        f.write(self.text())
+
+
+class TextSink(Sink):
+    """
+    Prints instructions as they are emitted, without keeping them,
+    writing to `f` once every `lines` instructions.
+    """
+
+    def __init__(self, f: TextIO, lines: int = 8192) -> None:
+        self.f = f
+        self.lines = lines
+        self._buf: list[str] = []
+
+    def emit(self, instr: tuple) -> None:
+        self._buf.append(format_instr(instr))
+        if len(self._buf) >= self.lines:
+            self.flush()
+
+    def flush(self) -> None:
+        self.f.write("".join(self._buf))
+        self._buf.clear()
+
+
+class NullSink(Sink):
+    "Discards every instruction, for runs that only parse and check."
+
+    def emit(self, instr: tuple) -> None:
+        pass
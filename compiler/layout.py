@@ -0,0 +1,65 @@
+"""
+Storage layout of the variables of a program.
+
+`Frame` hands out offsets the way a stack frame does: the variables
+of a block are placed after those of the blocks enclosing it, and
+when the block ends its storage is given back, for the next block to
+reuse. Sibling blocks are never live at the same time, so their
+variables share storage, and the frame is only as large as the
+deepest chain of nested blocks. As in C, a variable holds whatever
+was left in its storage until it is assigned.
+
+With the `aligned` layout, every variable is placed at a multiple of
+its alignment, the width of its basic type (of its elements, for an
+array). The `packed` layout places variables right after one another.
+"""
+
+from compiler.symbols import Array, Type
+
+LAYOUTS = ("aligned", "packed")
+
+
+def alignment(p: Type) -> int:
+    "The alignment of a variable of type `p`, in bytes."
+    while isinstance(p, Array):
+        p = p.of
+    return p.width
+
+
+class Frame:
+    """
+    Offsets of the variables of nested blocks. `top` is the end of
+    the storage of the blocks open now, `size` the largest it has been.
+    """
+
+    aligned: bool
+    top: int
+    size: int
+
+    def __init__(self, layout: str = "aligned") -> None:
+        if layout not in LAYOUTS:
+            raise ValueError("Unknown layout '%s'." % layout)
+        self.aligned = layout == "aligned"
+        self.top = 0
+        self.size = 0
+        self._marks: list[int] = []
+
+    def enter(self) -> None:
+        self._marks.append(self.top)
+
+    def exit(self) -> None:
+        self.top = self._marks.pop()
+
+    def reserve(self, width: int) -> None:
+        "Makes room for a nested block whose variables take `width` bytes."
+        self.size = max(self.size, self.top + width)
+
+    def allocate(self, p: Type) -> int:
+        "The offset of a new variable of type `p` in the innermost block."
+        offset = self.top
+        if self.aligned:
+            a = alignment(p)
+            offset = (offset + a - 1) // a * a
+        self.top = offset + p.width
+        self.size = max(self.size, self.top)
+        return offset
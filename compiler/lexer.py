@@ -4,132 +4,281 @@ Lexical analyzer.
 
 from compiler.tokens import *
 from compiler.symbols import *
+from compiler.context import CompilationContext
 from io import TextIOWrapper
+from mmap import mmap
+import re
+from typing import Iterator
 
+_BLANKS = re.compile("[ \t]*")
+_ALNUMS = re.compile(r"[^\W_]*")  # the characters `str.isalnum()` accepts
+
+_PAIRS = {w.lexeme: w for w in [Word.AND, Word.OR, Word.EQ, Word.NE, Word.LE, Word.GE]}
 
-class Lexer:
-    line: int = 1
 
-    f: TextIOWrapper
+class Lexer:
+    ctx: CompilationContext
+    line: int
+    f: TextIOWrapper | None
     words: dict[str, Word]
-    peak: str
-    line_buffer: str
-
-    def _reserve(self, w: Word) -> None:
-        self.words.update({w.lexeme: w})
-
-    def __init__(self, f: TextIOWrapper) -> None:
-        Lexer.line = 1
-        self.f = f
-        self.words = {}
-        self.peek = " "
-        self.line_buffer = ""
-        self._reserve(Word("if", Tag.IF))
-        self._reserve(Word("else", Tag.ELSE))
-        self._reserve(Word("while", Tag.WHILE))
-        self._reserve(Word("do", Tag.DO))
-        self._reserve(Word("break", Tag.BREAK))
-        for w in [Word.TRUE, Word.FALSE, Type.INT, Type.CHAR, Type.BOOL, Type.FLOAT]:
-            self._reserve(w)
-
-    def _read_char(self) -> None:
-        self.peek = self.f.read(1)
-        if self.peek != "\n":
-            self.line_buffer += self.peek
-
-    def _read_comp_char(self, c: str) -> bool:
-        self._read_char()
-        if self.peek != c:
+    buf: str
+    pos: int
+    peeked: bool
+    line_start: int
+    block_size: int
+
+    def __init__(
+        self,
+        f: TextIOWrapper | str | bytes | mmap,
+        block_size: int = 1 << 16,
+        ctx: CompilationContext | None = None,
+    ) -> None:
+        """
+        Lexer constructor.
+
+        `f` is either a text file, which is read `block_size`
+        characters at a time, or the whole source given up front
+        as `str` or as UTF-8 encoded `bytes`/`mmap`.
+
+        Words are entered into the table of `ctx`, a new
+        compilation context unless one is given.
+        """
+        self.ctx = ctx if ctx is not None else CompilationContext()
+        self.line = 1
+        if isinstance(f, str):
+            self.f = None
+            self.buf = f
+        elif isinstance(f, (bytes, bytearray, memoryview, mmap)):
+            self.f = None
+            self.buf = str(f, "utf-8")
+        else:
+            self.f = f
+            self.buf = ""
+        self.block_size = block_size
+        self._rest = ""
+        self.pos = 0
+        self.line_start = 0
+        self.peeked = False
+        self.words = self.ctx.words
+
+    @property
+    def line_buffer(self) -> str:
+        """
+        Current line, up to and including the character
+        the scanner peeked at after the last token.
+
+        Only sliced out of the buffer when asked for,
+        which happens when an error is reported.
+        """
+        end = self.pos
+        if self.peeked and end < len(self.buf) and self.buf[end] != "\n":
+            end += 1
+        return self.buf[self.line_start : end]
+
+    def _fill(self) -> bool:
+        """
+        Replaces the buffer with the next run of complete lines,
+        so that no lexeme is ever split between two buffers.
+
+        Returns `False` when the input is exhausted.
+        """
+        if self.f is None:
             return False
-        self.peek = " "
+        chunk = self.f.read(self.block_size)
+        while chunk:
+            cut = chunk.rfind("\n") + 1
+            if cut:
+                self.buf = self._rest + chunk[:cut]
+                self._rest = chunk[cut:]
+                break
+            self._rest += chunk
+            chunk = self.f.read(self.block_size)
+        else:
+            if not self._rest:
+                return False
+            self.buf = self._rest
+            self._rest = ""
+        self.pos = 0
+        self.line_start = 0
         return True
 
+    def skip_to(self, pos: int) -> None:
+        """
+        Moves the scanner ahead to `pos` in the buffer, counting the
+        lines it skips. The whole source must be in the buffer.
+        """
+        newlines = self.buf.count("\n", self.pos, pos)
+        if newlines:
+            self.line += newlines
+            self.line_start = self.buf.rfind("\n", self.pos, pos) + 1
+        self.pos = pos
+        self.peeked = False
+
+    def tokens(self) -> Iterator[Token]:
+        """Generator over the remaining tokens of the input."""
+        while (tok := self.scan()) is not None:
+            yield tok
+
     def scan(self) -> Token | None:
+        buf = self.buf
+        pos = self.pos
+        n = len(buf)
         while True:
             # skips any whitespace word
-            if self.peek in [" ", "\t"]:
-                self._read_char()
-            elif self.peek == "\n":
-                Lexer.line += 1
-                self.line_buffer = ""
-                self._read_char()
-            else:
-                break
+            pos = _BLANKS.match(buf, pos).end()
+            if pos < n:
+                c = buf[pos]
+                if c != "\n":
+                    break
+                self.line += 1
+                pos += 1
+                self.line_start = pos
+            elif self._fill():
+                buf = self.buf
+                pos = 0
+                n = len(buf)
+            else:  # EOF is encountered
+                self.pos = n
+                self.peeked = False
+                return None
 
-        if len(self.peek) == 0:  # EOF is encountered
-            return None
+        if c in "&|=!<>":
+            w = _PAIRS.get(buf[pos : pos + 2])
+            if w is not None:
+                self.pos = pos + 2
+                self.peeked = False
+                return w
+            # the second character was peeked at
+            self.pos = pos + 1
+            self.peeked = True
+            return Token.char(c)
 
-        if self.peek == "&":
-            if self._read_comp_char("&"):
-                return Word.AND
-            else:
-                return Token.char("&")
+        if c.isdigit():
+            # An integer or float token.
+            end = pos + 1
+            while end < n and buf[end].isdigit():
+                end += 1
+            v: int = int(buf[pos:end])
+            self.peeked = True
+            if end == n or buf[end] != ".":
+                self.pos = end
+                return Num(v)
+            # dot peeked, dealing with float token
+            pos = end = end + 1
+            while end < n and buf[end].isdigit():
+                end += 1
+            self.pos = end
+            return Real(real_value(v, buf[pos:end]))
 
-        if self.peek == "|":
-            if self._read_comp_char("|"):
-                return Word.OR
-            else:
-                return Token.char("|")
+        if c.isalpha():
+            end = _ALNUMS.match(buf, pos + 1).end()
+            b: str = buf[pos:end]
+            self.pos = end
+            self.peeked = True
+            w = self.words.get(b)
+            if w is None:
+                w = Word(b, Tag.ID)
+                self.words[b] = w
+            return w
 
-        if self.peek == "=":
-            if self._read_comp_char("="):
-                return Word.EQ
-            else:
-                return Token.char("=")
+        self.pos = pos + 1
+        self.peeked = False
+        return Token.char(c)
 
-        if self.peek == "!":
-            if self._read_comp_char("="):
-                return Word.NE
-            else:
-                return Token.char("!")
 
-        if self.peek == "<":
-            if self._read_comp_char("="):
-                return Word.LE
-            else:
-                return Token.char("<")
+def real_value(v: int, digits: str) -> float:
+    """
+    Value of the real literal `v.digits`.
 
-        if self.peek == ">":
-            if self._read_comp_char("="):
-                return Word.GE
-            else:
-                return Token.char(">")
+    Digits are accumulated one at a time, the same way the
+    scanner has always built real literals.
+    """
+    fl: float = v
+    deg: float = 10.0
+    for d in digits:
+        fl = fl + int(d) / deg
+        deg /= 10.0
+    return fl
 
-        if self.peek.isdigit():
-            # An integer or float token.
-            v: int = 0
-            while True:
-                v = 10 * v + int(self.peek)
-                self._read_char()
-                if not self.peek.isdigit():
-                    break
-            if self.peek != ".":
-                return Num(v)
-            # dot peeked, dealing with float token
-            fl: float = v
-            deg: float = 10.0
-            while True:
-                self._read_char()
-                if not self.peek.isdigit():
-                    break
-                fl = fl + int(self.peek) / deg
-                deg /= 10.0
-            return Real(fl)
-
-        if self.peek.isalpha():
-            b: str = ""
-            while True:
-                b = b + self.peek
-                self._read_char()
-                if not self.peek.isalnum():
-                    break
-            if b in self.words.keys():
-                return self.words[b]
+
+def _master_pattern() -> re.Pattern:
+    """
+    One alternation over every lexeme class of the language, after
+    any run of blanks. The group that matched tells `RegexLexer`
+    what it has found: a run of line breaks, or the kind of token.
+    """
+    pairs = "|".join(re.escape(s) for s in _PAIRS)
+    singles = "".join(sorted({s[0] for s in _PAIRS}))
+    return re.compile(
+        r"[ \t]*(?:(\n[ \t\n]*)|(\d+\.\d*)|(\d+)|([^\W\d_][^\W_]*)|(%s)|([%s])|(.))?"
+        % (pairs, re.escape(singles))
+    )
+
+
+_MASTER = _master_pattern()
+_NEWLINES, _REAL, _NUM, _WORD, _PAIR, _SINGLE, _OTHER = range(1, 8)
+
+
+class RegexLexer(Lexer):
+    """
+    Lexer backend that matches each lexeme with one precompiled
+    master pattern instead of walking it character by character.
+
+    Produces exactly the tokens, line numbers and line buffers of `Lexer`.
+    """
+
+    _it: Iterator[re.Match] | None = None
+
+    def _matches(self) -> None:
+        """Restarts matching at `pos` in the current buffer."""
+        self._it = _MASTER.finditer(self.buf, self.pos)
+
+    def skip_to(self, pos: int) -> None:
+        super().skip_to(pos)
+        self._it = None
+
+    def scan(self) -> Token | None:
+        if self._it is None:
+            self._matches()
+        while True:
+            m = next(self._it)
+            k = m.lastindex
+            if k is None:
+                self.pos = m.end()
+                filled = self._fill()
+                self._matches()
+                if not filled:  # EOF is encountered
+                    self.peeked = False
+                    return None
+            elif k == _NEWLINES:
+                g: str = m[k]
+                self.line += g.count("\n")
+                self.line_start = m.end() - len(g) + g.rfind("\n") + 1
             else:
-                new_word = Word(b, Tag.ID)
-                self.words.update({b: new_word})
-                return new_word
+                break
 
-        tok = Token.char(self.peek)
-        self.peek = " "
-        return tok
+        g = m[k]
+        self.pos = m.end()
+        if k == _WORD:
+            self.peeked = True
+            w = self.words.get(g)
+            if w is None:
+                w = Word(g, Tag.ID)
+                self.words[g] = w
+            return w
+        if k == _OTHER:
+            self.peeked = False
+            return Token.char(g)
+        if k == _NUM:
+            self.peeked = True
+            return Num(int(g))
+        if k == _PAIR:
+            self.peeked = False
+            return _PAIRS[g]
+        if k == _SINGLE:
+            # the second character was peeked at
+            self.peeked = True
+            return Token.char(g)
+        self.peeked = True
+        v, digits = g.split(".")
+        return Real(real_value(int(v), digits))
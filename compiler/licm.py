@@ -0,0 +1,132 @@
+"""
+Loop-invariant code motion.
+
+The loops of `While` and `Do` statements evaluate their whole
+condition and body on every iteration, including address arithmetic
+such as `i * 20` for a row of `m[i][j]` in a loop over `j`. A
+computation inside a natural loop whose operands are not assigned in
+the loop (by a `Set` or another computation) or are themselves
+invariant, is moved to a preheader: a new block that control goes
+through once, right before entering the loop.
+
+Only computations into temporaries assigned nowhere else are moved,
+so the moved value is the same one every use sees. A moved
+instruction also runs when the loop would not have reached it, such
+as when the condition of a `While` is false on entry, so loads stay
+in the loop, where their index has been checked against the bounds
+of the array, and division moves only by a constant other than zero.
+"""
+
+from compiler.ir import *
+from compiler.cfg import CFG, Block, Loop
+from compiler.peephole import retarget
+from compiler.liveness import defined, uses
+from compiler.intermediate import Constant, Temp
+from collections import Counter
+from typing import Callable
+
+
+def hoist_invariants(instrs: list[tuple], new_label: Callable[[], int]) -> list[tuple]:
+    """
+    `instrs` with the invariant computations of each loop moved to
+    a preheader, which gets its label from `new_label`. A computation
+    invariant in several nested loops leaves the outermost of them.
+    """
+    cfg = CFG(instrs)
+    loops = cfg.loops()
+    if not loops:
+        return instrs
+    assignments = Counter(defined(i) for i in instrs if defined(i) is not None)
+
+    moved: set[tuple[int, int]] = set()
+    hoisted: dict[Loop, list[tuple]] = {}
+    for loop in loops:
+        found = _invariants(loop, moved, assignments)
+        if found:
+            hoisted[loop] = [instr for _, instr in sorted(found.items())]
+            moved.update(found)
+    if not hoisted:
+        return instrs
+
+    preheaders: dict[int, tuple[Loop, int]] = {}
+    headers: dict[Block, tuple[Loop, int]] = {}
+    for loop in hoisted:
+        p = new_label()
+        headers[loop.header] = (loop, p)
+        for label in loop.header.labels:
+            preheaders[label] = (loop, p)
+
+    out: list[tuple] = []
+    for block in cfg.blocks:
+        if block in headers:
+            loop, p = headers[block]
+            if out and out[-1][0] != GOTO and block.index > 0:
+                if cfg.blocks[block.index - 1] in loop.blocks:
+                    # the loop falls into its header from inside
+                    out.append((GOTO, block.labels[0]))
+            out.append((LABEL, p))
+            out += hoisted[loop]
+        for k, instr in enumerate(block.instrs):
+            if (block.index, k) in moved:
+                continue
+            if instr[0] in JUMPS and instr[1] in preheaders:
+                loop, p = preheaders[instr[1]]
+                if block not in loop.blocks:
+                    instr = retarget(instr, p)
+            out.append(instr)
+    return out
+
+
+def _invariants(
+    loop: Loop, moved: set[tuple[int, int]], assignments: Counter
+) -> dict[tuple[int, int], tuple]:
+    """
+    The computations of `loop` that can move to its preheader, by
+    (block index, position) in the code. Those in `moved` are already
+    out of the loop.
+    """
+    body = [
+        ((block.index, k), instr)
+        for block in loop.blocks
+        for k, instr in enumerate(block.instrs)
+        if (block.index, k) not in moved
+    ]
+    assigned = {d for _, instr in body if (d := defined(instr)) is not None}
+    candidates = [
+        (at, instr)
+        for at, instr in body
+        if isinstance(instr[1], Temp)
+        and assignments[instr[1]] == 1
+        and _movable(instr)
+    ]
+    candidates.sort()
+
+    found: dict[tuple[int, int], tuple] = {}
+    invariant: set = set()
+    changed = True
+    while changed:
+        changed = False
+        for at, instr in candidates:
+            if at in found:
+                continue
+            if all(
+                isinstance(x, Constant) or x not in assigned or x in invariant
+                for x in uses(instr)
+            ):
+                found[at] = instr
+                invariant.add(instr[1])
+                changed = True
+    return found
+
+
+def _movable(instr: tuple) -> bool:
+    "Whether `instr` can run where the loop would not have run it."
+    code = instr[0]
+    if code == UNARY:
+        return True
+    if code == BINARY:
+        if instr[3] != "/":
+            return True
+        y = instr[4]
+        return isinstance(y, Constant) and y.value != 0
+    return False
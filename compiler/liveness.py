@@ -0,0 +1,125 @@
+"""
+Liveness of temporaries, and their renumbering into reusable slots.
+
+Every `Temp` gets a number of its own, yet almost all of them are dead
+right after their only use. Liveness is solved over the basic blocks
+of the code; each temporary then lives over an interval of positions
+in the code, and intervals that do not overlap share one slot, in the
+style of linear-scan register allocation.
+"""
+
+from compiler.ir import *
+from compiler.cfg import CFG
+from compiler.intermediate import Temp
+import heapq
+
+
+def uses(instr: tuple) -> list:
+    "The operands `instr` reads."
+    code = instr[0]
+    if code == COPY:
+        return [instr[2]]
+    if code == UNARY:
+        return [instr[3]]
+    if code == BINARY:
+        return [instr[2], instr[4]]
+    if code == LOAD:
+        return [instr[3]]
+    if code == STORE:
+        return [instr[2], instr[3]]
+    if code == IF or code == IFFALSE:
+        return [instr[2], instr[4]]
+    return []
+
+
+def defined(instr: tuple) -> object:
+    "The operand `instr` assigns, or `None`."
+    code = instr[0]
+    if code == COPY or code == UNARY or code == BINARY or code == LOAD:
+        return instr[1]
+    return None
+
+
+def liveness(cfg: CFG) -> tuple[list[set[Temp]], list[set[Temp]]]:
+    "Temporaries live at the start and at the end of each block, by block index."
+    gen: list[set[Temp]] = []
+    kill: list[set[Temp]] = []
+    for block in cfg.blocks:
+        g: set[Temp] = set()
+        k: set[Temp] = set()
+        for instr in reversed(block.instrs):
+            d = defined(instr)
+            if isinstance(d, Temp):
+                k.add(d)
+                g.discard(d)
+            g.update(x for x in uses(instr) if isinstance(x, Temp))
+        gen.append(g)
+        kill.append(k)
+
+    live_in: list[set[Temp]] = [set(g) for g in gen]
+    out: list[set[Temp]] = [set() for _ in cfg.blocks]
+    changed = True
+    while changed:
+        changed = False
+        for k in reversed(range(len(cfg.blocks))):
+            o = set().union(*(live_in[s.index] for s in cfg.blocks[k].succs))
+            if o != out[k]:
+                out[k] = o
+                live_in[k] = gen[k] | (o - kill[k])
+                changed = True
+    return live_in, out
+
+
+def renumber_temps(instrs: list[tuple]) -> int:
+    """
+    Renumbers the temporaries of `instrs` so that temporaries that are
+    never live at the same time share a number, numbering them from 1.
+
+    Returns the number of slots, which is the largest number of
+    temporaries live at once.
+    """
+    cfg = CFG(instrs)
+    live_in, live_out = liveness(cfg)
+
+    # The interval each temporary is live over. Instruction k reads its
+    # operands at point 2k and writes its result at point 2k + 1, so a
+    # result can take the slot of an operand read for the last time.
+    first: dict[Temp, int] = {}
+    last: dict[Temp, int] = {}
+
+    def extend(t: Temp, pos: int) -> None:
+        if t not in first or pos < first[t]:
+            first[t] = pos
+        if last.get(t, -1) < pos:
+            last[t] = pos
+
+    pos = 0
+    for k, block in enumerate(cfg.blocks):
+        for t in live_in[k]:
+            extend(t, pos)
+        for instr in block.instrs:
+            for x in uses(instr):
+                if isinstance(x, Temp):
+                    extend(x, pos)
+            d = defined(instr)
+            if isinstance(d, Temp):
+                extend(d, pos + 1)
+            pos += 2
+        for t in live_out[k]:
+            extend(t, pos - 1)
+
+    free: list[int] = []
+    active: list[tuple[int, int]] = []
+    slots = 0
+    for t in sorted(first, key=first.__getitem__):
+        start = first[t]
+        while active and active[0][0] < start:
+            heapq.heappush(free, heapq.heappop(active)[1])
+        if free:
+            slot = heapq.heappop(free)
+        else:
+            slots += 1
+            slot = slots
+        heapq.heappush(active, (last[t], slot))
+        t.number = slot
+    return slots
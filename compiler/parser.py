@@ -1,68 +1,153 @@
 from compiler.lexer import Lexer
+from compiler.context import CompilationContext
+from compiler.stream import TokenCursor
 from compiler.tokens import *
 from compiler.symbols import *
 from compiler.intermediate import *
+from compiler.scope import SymbolTable
+from compiler.layout import Frame
+from compiler.peephole import peephole
+from compiler.cse import cse
+from compiler.liveness import renumber_temps
+from compiler.licm import hoist_invariants
+from compiler.incremental import BlockCache
+from compiler.instrument import phase
 from compiler.error import ParseError, GrammarError
 from typing import cast
 
 
 class Parser:
-    used: int
+    frame: Frame
+    cache: BlockCache | None
+    temp_slots: int | None
+    tree: Stmt | None
+    ctx: CompilationContext
     lex: Lexer
+    tokens: TokenCursor
     look: Token | None
-    envs: list[dict[Token, Id]]
+    symbols: SymbolTable
     enclosing: Stmt
 
-    def __init__(self, l: Lexer) -> None:
+    def __init__(
+        self, l: Lexer, batch_size: int = 0, cache: BlockCache | None = None
+    ) -> None:
+        """
+        Parser constructor.
+
+        The parser works in the compilation context of its lexer, and
+        generates code to that context's sink. A positive `batch_size`
+        makes the lexer run ahead of the parser that many tokens at a
+        time (see `TokenCursor`).
+
+        With a `cache`, nested blocks seen in an earlier compilation
+        are not parsed again (see `compiler.incremental`).
+        """
         self.lex = l
-        self.used = 0
-        self.envs = []
+        self.ctx = l.ctx
+        if self.ctx.profile is not None:
+            self.ctx.profile.instrument(self)
+        self.tokens = TokenCursor(l, batch_size)
+        self.frame = Frame(self.ctx.layout)
+        self.cache = cache
+        self.temp_slots = None
+        self.tree = None
+        self.symbols = SymbolTable()
         self.enclosing = Stmt.NULL
         self.move()
 
+    @property
+    def used(self) -> int:
+        "Bytes of storage the variables declared so far take."
+        return self.frame.size
+
     def parseError(self, s: str) -> None:
         raise ParseError(
             "Near line %d:\n%s\n%s\n  %s"
-            % (self.lex.line, self.lex.line_buffer, "~" * len(self.lex.line_buffer), s)
+            % (
+                self.tokens.line,
+                self.tokens.line_buffer,
+                "~" * len(self.tokens.line_buffer),
+                s,
+            )
         )
 
     def move(self) -> None:
-        self.look = self.lex.scan()
+        self.look = self.tokens.advance()
+
+    def peek(self, k: int = 1) -> Token | None:
+        """The `k`-th token after the lookahead `look`."""
+        return self.tokens.peek(k)
 
     def match(self, t: int | str) -> None:
         _tag = ord(t) if isinstance(t, str) else t
         if self.look.tag == _tag:
             self.move()
         else:
-            self.error("Unexpected token '%s'." % str(self.look))
+            self.parseError("Unexpected token '%s'." % str(self.look))
 
     def save_to_env(self, w: Token, i: Id) -> None:
-        self.envs[-1][w] = i
+        self.symbols.put(w, i)
 
     def get_from_env(self, w: Token) -> Id | None:
-        for e in reversed(self.envs):
-            if w in e.keys():
-                return e[w]
-        return None
+        return self.symbols.get(w)
 
     def program(self) -> None:
+        """
+        Parses the program and generates its three-address code
+        into the sink of the compilation context. The syntax tree of the
+        program is kept in `tree`.
+
+        From optimization level 1, constant expressions are folded first,
+        and the code is collected, cleaned up by the peephole passes and
+        rid of common subexpressions before it is handed to the sink.
+        From level 2, loop-invariant computations are moved out of loops.
+        Temporaries are renumbered last, into `temp_slots` reusable slots.
+        """
+        profile = self.ctx.profile
         try:
-            s: Stmt = self.block()
-            begin: int = s.new_label()
-            after: int = s.new_label()
-            s.emit_label(begin)
-            s.gen(begin, after)
-            s.emit_label(after)
+            with phase(profile, "parse"):
+                s: Stmt = self.block()
+            if profile is not None:
+                profile.count_nodes(s)
+            out = self.ctx.out
+            if self.ctx.opt_level >= 1:
+                with phase(profile, "fold"):
+                    s = s.fold()
+                self.ctx.out = Code()
+            self.tree = s
+            with self.ctx, phase(profile, "gen"):
+                begin: int = s.new_label()
+                after: int = s.new_label()
+                s.emit_label(begin)
+                s.gen(begin, after)
+                s.emit_label(after)
+            if out is not self.ctx.out:
+                code, self.ctx.out = self.ctx.out, out
+                with phase(profile, "optimize"):
+                    instrs = cse(peephole(code.instrs))
+                    if self.ctx.opt_level >= 2:
+                        instrs = peephole(hoist_invariants(instrs, self.ctx.new_label))
+                    self.temp_slots = renumber_temps(instrs)
+                with phase(profile, "emit"):
+                    for instr in instrs:
+                        out.emit(instr)
+            with phase(profile, "emit"):
+                out.flush()
         except GrammarError as err:
             self.parseError(err.args[0])
+        finally:
+            if profile is not None:
+                profile.finish(self.ctx)
 
     def block(self) -> Stmt:
         self.match("{")
-        self.envs.append({})
+        self.symbols.enter()
+        self.frame.enter()
         self.decls()
         s: Stmt = self.stmts()
         self.match("}")
-        self.envs.pop()
+        self.frame.exit()
+        self.symbols.exit()
         return s
 
     def decls(self) -> None:
@@ -72,9 +157,8 @@ class Parser:
             self.match(Tag.ID)
             self.match(";")
 
-            id = Id(cast(Word, tok), p, self.used)
+            id = Id(cast(Word, tok), p, self.frame.allocate(p))
             self.save_to_env(tok, id)
-            self.used += p.width
 
     def type(self) -> Type:
         p: Type = cast(Type, self.look)
@@ -90,13 +174,13 @@ class Parser:
         self.match(Tag.NUM)
         self.match("]")
         para = self.dims(p) if self.look.tag == ord("[") else p
-        return Array(cast(Num, tok).value, para)
+        return self.ctx.array(cast(Num, tok).value, para)
 
     def stmts(self) -> Stmt:
-        if self.look.tag == ord("}"):
-            return Stmt.NULL
-        else:
-            return Seq(self.stmt(), self.stmts())
+        stmts: list[Stmt] = []
+        while self.look.tag != ord("}"):
+            stmts.append(self.stmt())
+        return Seq(stmts) if stmts else Stmt.NULL
 
     def stmt(self) -> Stmt:
         if self.look.tag == ord(";"):
@@ -144,6 +228,8 @@ class Parser:
             self.match(";")
             return Break(self.enclosing)
         elif self.look.tag == ord("{"):
+            if self.cache is not None:
+                return self.cache.block(self)
             return self.block()
         else:
             return self.assign()
@@ -0,0 +1,148 @@
+"""
+Peephole optimization of three-address code.
+
+Code generation is generous with labels: `Seq` puts one between every
+two statements and `program()` brackets the code with two more, so
+most labels are never jumped to and jumps often land on the very next
+instruction. The passes here clean that up on a list of instructions:
+
+- runs of consecutive labels are merged into their first label,
+- a jump to a `goto` is sent straight to that `goto`'s target,
+- a conditional jump over a `goto` becomes the opposite jump,
+- jumps to the next instruction and code after a `goto` that no
+  label leads to are removed,
+- labels that no jump refers to are dropped.
+"""
+
+from compiler.ir import *
+
+_OPPOSITE = {IF: IFFALSE, IFFALSE: IF}
+
+
+def peephole(instrs: list[tuple]) -> list[tuple]:
+    """
+    Runs every pass over `instrs` until none of them changes the code.
+    Returns the new list of instructions.
+    """
+    while True:
+        n = len(instrs)
+        instrs = merge_labels(instrs)
+        instrs = thread_jumps(instrs)
+        instrs = skip_jumps(instrs)
+        instrs = drop_unreachable(instrs)
+        instrs = drop_labels(instrs)
+        if len(instrs) == n:
+            return instrs
+
+
+def retarget(instr: tuple, label: int) -> tuple:
+    "The jump `instr` with its target replaced by `label`."
+    return (instr[0], label) + instr[2:]
+
+
+def merge_labels(instrs: list[tuple]) -> list[tuple]:
+    "Replaces each run of consecutive labels with its first label."
+    alias: dict[int, int] = {}
+    out: list[tuple] = []
+    first = None
+    for instr in instrs:
+        if instr[0] == LABEL:
+            if first is None:
+                first = instr[1]
+                out.append(instr)
+            else:
+                alias[instr[1]] = first
+        else:
+            first = None
+            out.append(instr)
+    if not alias:
+        return out
+    return [
+        retarget(i, alias[i[1]]) if i[0] in JUMPS and i[1] in alias else i
+        for i in out
+    ]
+
+
+def thread_jumps(instrs: list[tuple]) -> list[tuple]:
+    "Sends every jump to a label followed by `goto L` directly to `L`."
+    goes_to: dict[int, int] = {}
+    pending: list[int] = []
+    for instr in instrs:
+        if instr[0] == LABEL:
+            pending.append(instr[1])
+        else:
+            if instr[0] == GOTO:
+                for label in pending:
+                    goes_to[label] = instr[1]
+            pending.clear()
+    if not goes_to:
+        return instrs
+
+    def final(label: int) -> int:
+        seen = {label}
+        while label in goes_to and goes_to[label] not in seen:
+            label = goes_to[label]
+            seen.add(label)
+        return label
+
+    return [
+        retarget(i, final(i[1])) if i[0] in JUMPS and i[1] in goes_to else i
+        for i in instrs
+    ]
+
+
+def skip_jumps(instrs: list[tuple]) -> list[tuple]:
+    """
+    Removes jumps to the labels right after them, and turns
+    `if x goto L1; goto L2; L1:` into `iffalse x goto L2; L1:`.
+    """
+    out: list[tuple] = []
+    n = len(instrs)
+    k = 0
+    while k < n:
+        instr = instrs[k]
+        if instr[0] in JUMPS:
+            if instr[1] in _labels_at(instrs, k + 1):
+                k += 1
+                continue
+            if (
+                instr[0] in _OPPOSITE
+                and k + 1 < n
+                and instrs[k + 1][0] == GOTO
+                and instr[1] in _labels_at(instrs, k + 2)
+            ):
+                out.append((_OPPOSITE[instr[0]], instrs[k + 1][1]) + instr[2:])
+                k += 2
+                continue
+        out.append(instr)
+        k += 1
+    return out
+
+
+def _labels_at(instrs: list[tuple], k: int) -> list[int]:
+    "The labels of the run of labels starting at position `k`."
+    labels = []
+    while k < len(instrs) and instrs[k][0] == LABEL:
+        labels.append(instrs[k][1])
+        k += 1
+    return labels
+
+
+def drop_unreachable(instrs: list[tuple]) -> list[tuple]:
+    "Removes the instructions between a `goto` and the next label."
+    out: list[tuple] = []
+    reachable = True
+    for instr in instrs:
+        if instr[0] == LABEL:
+            reachable = True
+        if reachable:
+            out.append(instr)
+        if instr[0] == GOTO:
+            reachable = False
+    return out
+
+
+def drop_labels(instrs: list[tuple]) -> list[tuple]:
+    "Removes the labels no jump refers to."
+    used = {i[1] for i in instrs if i[0] in JUMPS}
+    return [i for i in instrs if i[0] != LABEL or i[1] in used]
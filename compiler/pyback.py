@@ -0,0 +1,337 @@
+"""
+Translation of programs into Python, to run them at the speed of
+CPython itself.
+
+`PythonProgram` turns the syntax tree of a program into the source
+of one Python function: `while`, `do` and `if` statements become
+Python `while` and `if` statements, `break` stays `break`, and
+expressions become Python expressions, with no temporaries. Each
+scalar variable is a local of the function, under a name of its own
+even where a nested block reuses a name or the storage of another.
+Arrays are memoryviews over the data segment, as on the virtual
+machine, which `compiler.vm` describes along with the semantics of
+division and truncation.
+
+CPython does not compile more than 20 nested loops, nor arbitrarily
+deep expressions. For such programs the function is made from the
+three-address code instead: a state machine that goes from basic
+block to basic block, each of which is a state.
+"""
+
+from compiler.ir import *
+from compiler.intermediate import *
+from compiler.cfg import basic_blocks
+from compiler.context import CompilationContext
+from compiler.error import ExecutionError
+from compiler.vm import FORMATS, SHIFTS, element_type, integral
+import struct
+
+
+def idiv(x: int, y: int) -> int:
+    "Integer division, truncating toward zero."
+    q = abs(x) // abs(y)
+    return q if (x < 0) == (y < 0) else -q
+
+
+def out_of_bounds() -> int:
+    "Fails an access at a negative index, which Python would count from the end."
+    raise IndexError
+
+
+class PythonProgram:
+    """
+    A program translated into the Python function `source`, and the
+    data segment `memory` it runs on. Scalar variables are read from
+    `memory` when it starts and written back when it ends.
+
+    `ids` names the variables of the program; when several have the
+    same name, it keeps the one declared first.
+    """
+
+    source: str
+    structured: bool
+    memory: bytearray
+    ids: dict[str, Id]
+
+    def __init__(self, tree: Stmt, used: int) -> None:
+        self.memory = bytearray(used)
+        self.ids = {}
+        self._names: dict[Id, str] = {}
+        self._scalars: list[Id] = []
+        self._arrays: list[Id] = []
+        try:
+            self.source = self._structured(tree)
+            code = compile(self.source, "<program>", "exec")
+            self.structured = True
+        except (SyntaxError, RecursionError, MemoryError):
+            self.source = self._dispatch(tree)
+            code = compile(self.source, "<program>", "exec")
+            self.structured = False
+        namespace = {"idiv": idiv, "out_of_bounds": out_of_bounds}
+        exec(code, namespace)
+        self._function = namespace["program"]
+        self._views = [self._view(a) for a in self._arrays]
+        self._values: dict[Id, object] = {}
+
+    def _view(self, a: Id) -> memoryview:
+        segment = memoryview(self.memory)[a.offset : a.offset + a.type.width]
+        return segment.cast(FORMATS[element_type(a.type).lexeme])
+
+    def _name(self, x: Id) -> str:
+        "The Python name of the variable `x`."
+        name = self._names.get(x)
+        if name is None:
+            lexeme = x.op.lexeme
+            if isinstance(x.type, Array):
+                name = "a_%s_%d" % (lexeme, len(self._names))
+                self._arrays.append(x)
+            else:
+                name = "v_%s_%d" % (lexeme, len(self._names))
+                self._scalars.append(x)
+            self._names[x] = name
+            if lexeme not in self.ids or x.offset < self.ids[lexeme].offset:
+                self.ids[lexeme] = x
+        return name
+
+    def _function_source(self, body: list[str]) -> str:
+        "Source of the function `program` around the lines of `body`."
+        scalars = [self._names[x] for x in self._scalars]
+        arrays = [self._names[a] for a in self._arrays]
+        lines = ["def program(%s):" % ", ".join(scalars + arrays)]
+        lines += body
+        lines.append("    return (%s)" % "".join(s + ", " for s in scalars))
+        return "\n".join(lines) + "\n"
+
+    # structured translation of the syntax tree
+
+    def _structured(self, tree: Stmt) -> str:
+        body: list[str] = []
+        self._stmt(tree, 1, body)
+        return self._function_source(body)
+
+    def _stmt(self, s: Stmt, depth: int, out: list[str]) -> None:
+        indent = "    " * depth
+        if isinstance(s, Seq):
+            for t in s.stmts:
+                self._stmt(t, depth, out)
+        elif isinstance(s, Set):
+            out.append(indent + "%s = %s" % (self._name(s.id), self._value(s.expr, s.id.type)))
+        elif isinstance(s, SetElem):
+            out.append(
+                indent
+                + "%s = %s"
+                % (self._element(s.array, s.index), self._value(s.expr, element_type(s.array.type)))
+            )
+        elif isinstance(s, Else):
+            out.append(indent + "if %s:" % self._expr(s.expr))
+            self._block(s.stmt1, depth + 1, out)
+            out.append(indent + "else:")
+            self._block(s.stmt2, depth + 1, out)
+        elif isinstance(s, If):
+            out.append(indent + "if %s:" % self._expr(s.expr))
+            self._block(s.stmt, depth + 1, out)
+        elif isinstance(s, While):
+            out.append(indent + "while %s:" % self._expr(s.expr))
+            self._block(s.stmt, depth + 1, out)
+        elif isinstance(s, Do):
+            out.append(indent + "while True:")
+            self._block(s.stmt, depth + 1, out)
+            out.append(indent + "    if not %s:" % self._expr(s.expr))
+            out.append(indent + "        break")
+        elif isinstance(s, Break):
+            out.append(indent + "break")
+
+    def _block(self, s: Stmt, depth: int, out: list[str]) -> None:
+        n = len(out)
+        self._stmt(s, depth, out)
+        if len(out) == n:
+            out.append("    " * depth + "pass")
+
+    def _value(self, x: Expr, p: Type) -> str:
+        "`x` as a value of type `p`: a float is truncated for an integral type."
+        if integral(p) and x.type == Type.FLOAT:
+            return "int(%s)" % self._expr(x)
+        return self._expr(x)
+
+    def _element(self, a: Id, index: Expr) -> str:
+        return self._element_of(a, self._expr(index))
+
+    def _expr(self, x: Expr) -> str:
+        if isinstance(x, Id):
+            return self._name(x)
+        if isinstance(x, Constant):
+            return repr(x.value)
+        if isinstance(x, Access):
+            return self._element(x.array, x.index)
+        if isinstance(x, Arith):
+            op = str(x.op)
+            if op == "/" and integral(x.expr1.type) and integral(x.expr2.type):
+                return "idiv(%s, %s)" % (self._expr(x.expr1), self._expr(x.expr2))
+            return "(%s %s %s)" % (self._expr(x.expr1), op, self._expr(x.expr2))
+        if isinstance(x, Unary):
+            return "(-%s)" % self._expr(x.expr)
+        if isinstance(x, Not):
+            return "(not %s)" % self._expr(x.expr2)
+        if isinstance(x, Rel):
+            return "(%s %s %s)" % (self._expr(x.expr1), str(x.op), self._expr(x.expr2))
+        word = "and" if isinstance(x, And) else "or"
+        return "(%s %s %s)" % (self._expr(x.expr1), word, self._expr(x.expr2))
+
+    # block dispatch over the three-address code
+
+    def _dispatch(self, tree: Stmt) -> str:
+        ctx = CompilationContext()
+        with ctx:
+            begin = tree.new_label()
+            after = tree.new_label()
+            tree.emit_label(begin)
+            tree.gen(begin, after)
+            tree.emit_label(after)
+        blocks = basic_blocks(ctx.out.instrs)
+        state: dict[int, int] = {}
+        for k, block in enumerate(blocks):
+            for instr in block:
+                if instr[0] != LABEL:
+                    break
+                state[instr[1]] = k
+
+        body = ["    state = 0", "    while True:"]
+        self._dispatch_tree(blocks, state, 0, len(blocks), 2, body)
+        return self._function_source(body)
+
+    def _dispatch_tree(
+        self,
+        blocks: list[list[tuple]],
+        state: dict[int, int],
+        lo: int,
+        hi: int,
+        depth: int,
+        out: list[str],
+    ) -> None:
+        "Tests `state` by halves until it picks one block of `blocks[lo:hi]`."
+        indent = "    " * depth
+        if hi - lo == 1:
+            self._dispatch_block(blocks, state, lo, depth, out)
+            return
+        mid = (lo + hi) // 2
+        out.append(indent + "if state < %d:" % mid)
+        self._dispatch_tree(blocks, state, lo, mid, depth + 1, out)
+        out.append(indent + "else:")
+        self._dispatch_tree(blocks, state, mid, hi, depth + 1, out)
+
+    def _dispatch_block(
+        self, blocks: list[list[tuple]], state: dict[int, int], k: int, depth: int, out: list[str]
+    ) -> None:
+        indent = "    " * depth
+        last = None
+        for instr in blocks[k]:
+            c = instr[0]
+            last = c
+            if c == LABEL:
+                continue
+            if c == GOTO:
+                out.append(indent + "state = %d" % state[instr[1]])
+                out.append(indent + "continue")
+            elif c == IF or c == IFFALSE:
+                test = self._operand(instr[2])
+                if instr[3] is not None:
+                    test = "%s %s %s" % (test, instr[3], self._operand(instr[4]))
+                out.append(indent + "if %s%s:" % ("" if c == IF else "not ", test))
+                out.append(indent + "    state = %d" % state[instr[1]])
+                out.append(indent + "    continue")
+            else:
+                out.append(indent + self._assignment(instr))
+        if last != GOTO:
+            if k + 1 < len(blocks):
+                out.append(indent + "state = %d" % (k + 1))
+            else:
+                out.append(indent + "break")
+
+    def _operand(self, x: Expr) -> str:
+        if isinstance(x, Temp):
+            return "t%d" % x.number
+        if isinstance(x, Constant):
+            return repr(x.value)
+        return self._name(x)
+
+    def _assignment(self, instr: tuple) -> str:
+        c = instr[0]
+        if c == STORE:
+            a, i, x = instr[1:]
+            p = element_type(a.type)
+            value = self._operand(x)
+            if integral(p) and x.type == Type.FLOAT:
+                value = "int(%s)" % value
+            return "%s = %s" % (self._element_of(a, self._operand(i)), value)
+        dst = instr[1]
+        if c == COPY:
+            x = instr[2]
+            value, p = self._operand(x), x.type
+        elif c == UNARY:
+            x = instr[3]
+            value, p = "-%s" % self._operand(x), x.type
+        elif c == BINARY:
+            x, op, y = instr[2:]
+            p = Type.max(x.type, y.type)
+            if op == "/" and integral(x.type) and integral(y.type):
+                value = "idiv(%s, %s)" % (self._operand(x), self._operand(y))
+            else:
+                value = "%s %s %s" % (self._operand(x), op, self._operand(y))
+        else:  # LOAD
+            value = self._element_of(instr[2], self._operand(instr[3]))
+            p = dst.type
+        if integral(dst.type) and p == Type.FLOAT:
+            value = "int(%s)" % value
+        return "%s = %s" % (self._operand(dst), value)
+
+    def _element_of(self, a: Id, i: str) -> str:
+        """
+        The element of `a` at the byte offset `i`. A negative offset
+        fails, as on the virtual machine; an offset past the end fails
+        in the memoryview itself.
+        """
+        shift = SHIFTS[element_type(a.type).width]
+        if i.isdigit():
+            return "%s[%d]" % (self._name(a), int(i) >> shift)
+        if i.isidentifier():
+            k = "%s if %s >= 0 else out_of_bounds()" % (i, i)
+        else:
+            k = "k if (k := %s) >= 0 else out_of_bounds()" % i
+        return "%s[%s]" % (self._name(a), k if shift == 0 else "(%s) >> %d" % (k, shift))
+
+    def array(self, name: str) -> memoryview:
+        "The elements of the array `name`, flattened to one dimension."
+        return self._views[self._arrays.index(self.ids[name])]
+
+    def scalar(self, name: str) -> object:
+        "The value the scalar variable `name` had when the program ended."
+        x = self.ids[name]
+        if x in self._values:
+            return self._values[x]
+        return struct.unpack_from(FORMATS[x.type.lexeme], self.memory, x.offset)[0]
+
+    def run(self) -> None:
+        """
+        Runs the program. An `ExecutionError` is raised on division by
+        zero, or on an index past the end of an array.
+        """
+        args = [
+            struct.unpack_from(FORMATS[x.type.lexeme], self.memory, x.offset)[0]
+            for x in self._scalars
+        ]
+        try:
+            values = self._function(*args, *self._views)
+        except ZeroDivisionError:
+            raise ExecutionError("Runtime error: Division by zero.")
+        except IndexError:
+            raise ExecutionError("Runtime error: Array index out of bounds.")
+        except (ValueError, OverflowError, TypeError):
+            raise ExecutionError("Runtime error: Value out of the range of its type.")
+        self._values = dict(zip(self._scalars, values))
+        for x, v in self._values.items():
+            try:
+                struct.pack_into(FORMATS[x.type.lexeme], self.memory, x.offset, v)
+            except struct.error:
+                raise ExecutionError(
+                    "Runtime error: %s = %r is out of the range of its type." % (x, v)
+                )
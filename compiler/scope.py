@@ -0,0 +1,69 @@
+"""
+Symbol table for nested block scopes.
+"""
+
+from compiler.tokens import *
+from compiler.intermediate import Id
+
+
+class SymbolTable:
+    """
+    Identifiers declared in the blocks enclosing the parser's position.
+
+    Each name maps to the stack of its bindings, innermost last, so a
+    lookup is a single dictionary access at any nesting depth. Each
+    open scope logs the names it declared, and leaving the scope pops
+    exactly those bindings.
+
+    `declared` keeps every `Id` ever declared, in declaration order,
+    for tools that want the storage layout. While `lookups` is a list,
+    every `Id` a lookup finds is added to it, which is how the block
+    cache learns the variables a block names from enclosing blocks.
+    """
+
+    bindings: dict[Token, list[Id]]
+    scopes: list[list[Token]]
+    declared: list[Id]
+    lookups: list[Id] | None
+
+    def __init__(self) -> None:
+        self.bindings = {}
+        self.scopes = []
+        self.declared = []
+        self.lookups = None
+
+    @property
+    def depth(self) -> int:
+        return len(self.scopes)
+
+    def enter(self) -> None:
+        self.scopes.append([])
+
+    def exit(self) -> None:
+        bindings = self.bindings
+        for w in reversed(self.scopes.pop()):
+            stack = bindings[w]
+            stack.pop()
+            if not stack:
+                del bindings[w]
+
+    def put(self, w: Token, i: Id) -> None:
+        stack = self.bindings.get(w)
+        if stack is None:
+            self.bindings[w] = [i]
+        else:
+            stack.append(i)
+        self.scopes[-1].append(w)
+        self.declared.append(i)
+
+    def get(self, w: Token) -> Id | None:
+        stack = self.bindings.get(w)
+        if not stack:
+            return None
+        if self.lookups is not None:
+            self.lookups.append(stack[-1])
+        return stack[-1]
+
+    def layout(self) -> list[tuple[str, int, int]]:
+        "Name, offset and width of every declared `Id`."
+        return [(str(i), i.offset, i.type.width) for i in self.declared]
@@ -0,0 +1,174 @@
+"""
+A compile server: a long-running process that compiles on request.
+
+A compile with `python3 -m compiler` spends much of its time starting
+the interpreter and importing the compiler. The server pays for that
+once, and serves compile requests over a Unix socket, in the protocol
+of `compiler.client`. Compiling is CPU-bound, so requests are handed
+to a pool of worker processes, and clients connected at the same time
+do not wait for one another. Requests on one connection are answered
+in order.
+
+    python3 -m compiler.server --jobs 4 &
+    python3 -m compiler --server source.txt
+"""
+
+from compiler.lexer import Lexer
+from compiler.parser import Parser
+from compiler.error import ParseError
+from compiler.context import CompilationContext
+from compiler.ir import NullSink, TextSink
+from compiler.layout import LAYOUTS
+from compiler.client import HEADER, MAX_MESSAGE, decode, default_address, encode
+from concurrent.futures import Executor, ProcessPoolExecutor
+import argparse
+import asyncio
+import io
+import os
+import signal
+import socket
+import sys
+
+
+def compile_request(message: dict) -> dict:
+    "Compiles the source of the request `message`, and returns the reply."
+    try:
+        emit = message.get("emit", True)
+        opt_level = message.get("opt_level", 0)
+        layout = message.get("layout", "aligned")
+        if not isinstance(emit, bool) or not isinstance(opt_level, int):
+            raise ValueError("Malformed options.")
+        if layout not in LAYOUTS:
+            raise ValueError("Unknown layout '%s'." % layout)
+        if "source" in message:
+            text = message["source"]
+            if not isinstance(text, str):
+                raise ValueError("Malformed source.")
+        else:
+            with open(message["path"], "r", encoding="utf-8") as f:
+                text = f.read()
+    except KeyError:
+        return {"failure": "The request has neither a source nor a path."}
+    except (OSError, TypeError, ValueError) as err:
+        return {"failure": str(err)}
+    code = io.StringIO()
+    ctx = CompilationContext(
+        out=TextSink(code) if emit else NullSink(), opt_level=opt_level, layout=layout
+    )
+    parser = Parser(Lexer(text, ctx=ctx))
+    try:
+        parser.program()
+    except ParseError as err:
+        return {"code": "", "error": str(err), "used": None, "temp_slots": None}
+    except Exception as err:
+        # such as a truncated source; the worker must keep serving
+        return {"failure": "%s: %s" % (type(err).__name__, err)}
+    return {
+        "code": code.getvalue(),
+        "error": None,
+        "used": parser.used,
+        "temp_slots": parser.temp_slots,
+    }
+
+
+class CompileServer:
+    """
+    Serves compile requests on the Unix socket `address`, compiling
+    them on `pool`.
+    """
+
+    def __init__(self, address: str, pool: Executor) -> None:
+        self.address = address
+        self.pool = pool
+        self.requests = 0
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        "Answers the requests of one connection, until the client closes it."
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    (n,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+                except asyncio.IncompleteReadError:
+                    break
+                if n > MAX_MESSAGE:
+                    break
+                try:
+                    message = decode(await reader.readexactly(n))
+                except ValueError as err:
+                    reply = {"failure": "Malformed request: %s" % err}
+                else:
+                    reply = await loop.run_in_executor(self.pool, compile_request, message)
+                self.requests += 1
+                writer.write(encode(reply))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self) -> None:
+        "Serves until the process is interrupted or terminated."
+        claim(self.address)
+        server = await asyncio.start_unix_server(self.handle, self.address)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            if os.path.exists(self.address):
+                os.unlink(self.address)
+
+
+def claim(address: str) -> None:
+    """
+    Removes the socket a server that is no longer running left at
+    `address`. Raises `OSError` if a server is listening there.
+    """
+    if not os.path.exists(address):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(address)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(address)
+            return
+    raise OSError("A compile server is already listening on %s." % address)
+
+
+def main() -> int | None:
+    ap = argparse.ArgumentParser(
+        prog="python3 -m compiler.server", description=__doc__.strip().splitlines()[0]
+    )
+    ap.add_argument(
+        "--socket",
+        default=default_address(),
+        help="Unix socket to listen on (default: $COMPILER_SOCKET or %(default)s)",
+    )
+    ap.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        metavar="N",
+        default=os.cpu_count() or 1,
+        help="compile in N worker processes (default: one per CPU)",
+    )
+    args = ap.parse_args()
+
+    with ProcessPoolExecutor(args.jobs) as pool:
+        server = CompileServer(args.socket, pool)
+        try:
+            asyncio.run(server.serve())
+        except OSError as err:
+            print(err, file=sys.stderr)
+            return 1
+    print("Served %d requests." % server.requests, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+Token streams.
+
+`batches()` lexes ahead into `TokenBatch` columns, and `TokenCursor`
+hands tokens to the parser with k-token lookahead.
+"""
+
+from compiler.lexer import Lexer
+from compiler.tokens import *
+from array import array
+from collections import deque
+from typing import Iterator
+
+
+class TokenBatch:
+    """
+    A run of tokens stored column-wise.
+
+    `tags` and `lines` hold each token's tag and line number.
+    `values` holds an index into `pool` for words, numbers and reals,
+    or -1 for one-character tokens, which are rebuilt from the tag.
+    The pool is shared by all batches of a stream, so every distinct
+    word or literal is kept only once.
+    """
+
+    tags: array
+    lines: array
+    values: array
+    pool: list[Token]
+
+    def __init__(self, pool: list[Token], index: dict[object, int]) -> None:
+        self.tags = array("i")
+        self.lines = array("i")
+        self.values = array("i")
+        self.pool = pool
+        self._index = index
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+    def append(self, tok: Token, line: int) -> None:
+        self.tags.append(tok.tag)
+        self.lines.append(line)
+        if tok.tag < 256:
+            self.values.append(-1)
+            return
+        key = tok if isinstance(tok, Word) else (tok.tag, type(tok.value), tok.value)
+        i = self._index.get(key)
+        if i is None:
+            i = self._index[key] = len(self.pool)
+            self.pool.append(tok)
+        self.values.append(i)
+
+    def token(self, i: int) -> Token:
+        v = self.values[i]
+        if v >= 0:
+            return self.pool[v]
+        tag = self.tags[i]
+        tok = _chars.get(tag)
+        if tok is None:
+            tok = _chars[tag] = Token(tag)
+        return tok
+
+
+_chars: dict[int, Token] = {}
+
+
+def batches(lexer: Lexer, size: int = 4096) -> Iterator[TokenBatch]:
+    """Lexes the rest of the input `size` tokens at a time."""
+    pool: list[Token] = []
+    index: dict[object, int] = {}
+    while True:
+        batch = TokenBatch(pool, index)
+        for _ in range(size):
+            tok = lexer.scan()
+            if tok is None:
+                break
+            batch.append(tok, lexer.line)
+        if len(batch):
+            yield batch
+        if tok is None:
+            return
+
+
+class TokenCursor:
+    """
+    Cursor over the tokens of a `Lexer`, with k-token lookahead.
+
+    With `batch_size` 0 tokens are scanned one at a time, only as far
+    as they have been asked for. Otherwise the input is lexed ahead in
+    `TokenBatch`es of `batch_size` tokens.
+
+    `line` is the line number of the token last returned by `advance()`.
+    """
+
+    line: int
+
+    def __init__(self, lexer: Lexer, batch_size: int = 0) -> None:
+        self.lexer = lexer
+        self.line = lexer.line
+        self._ahead: deque[tuple[Token | None, int]] = deque()
+        self._batches = batches(lexer, batch_size) if batch_size > 0 else None
+        self._batch: TokenBatch | None = None
+        self._i = 0
+
+    def _pull(self) -> tuple[Token | None, int]:
+        if self._batches is None:
+            tok = self.lexer.scan()
+            return tok, self.lexer.line
+        if self._batch is None or self._i == len(self._batch):
+            self._batch = next(self._batches, None)
+            self._i = 0
+            if self._batch is None:
+                return None, self.lexer.line
+        i = self._i
+        self._i = i + 1
+        return self._batch.token(i), self._batch.lines[i]
+
+    def advance(self) -> Token | None:
+        """Moves to the next token and returns it."""
+        if self._ahead:
+            tok, self.line = self._ahead.popleft()
+        else:
+            tok, self.line = self._pull()
+        return tok
+
+    def peek(self, k: int = 1) -> Token | None:
+        """The `k`-th token after the one last returned by `advance()`."""
+        while len(self._ahead) < k:
+            self._ahead.append(self._pull())
+        return self._ahead[k - 1][0]
+
+    @property
+    def offset(self) -> int | None:
+        """
+        Position in the lexer's buffer right after the token last
+        returned by `advance()`, or `None` once the lexer has moved
+        past it.
+        """
+        if self._ahead or self._batches is not None:
+            return None
+        return self.lexer.pos
+
+    def skip_to(self, pos: int) -> None:
+        "Makes the lexer go on from `pos` in its buffer, which `offset` must be short of."
+        self.lexer.skip_to(pos)
+
+    @property
+    def line_buffer(self) -> str:
+        """
+        Text of the current line, for error messages.
+
+        Empty once the lexer has moved past the current token,
+        because the text it would report belongs to a later one.
+        """
+        if self._ahead or self._batches is not None:
+            return ""
+        return self.lexer.line_buffer
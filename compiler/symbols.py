@@ -1,33 +1,74 @@
 from compiler.tokens import Word, Tag
 
+_BASIC_COUNT = 4  # basic types, numbered 0 to 3
+
 
 class Type(Word):
-    def __init__(self, s: str, tag: int, w: int) -> None:
+    """
+    A type. There is one `Type` for each basic type, so those can be
+    compared with `is`, and a compilation makes one `Array` of each
+    shape (see `CompilationContext.array()`). Each basic type has a small number `tid`,
+    0 to 3, which the tables of `max()` and `assignable()` are indexed
+    by; all other types have the same `tid`, past those.
+    """
+
+    __slots__ = ("width", "tid")
+
+    def __init__(self, s: str, tag: int, w: int, tid: int = _BASIC_COUNT) -> None:
         super().__init__(s, tag)
         self.width = w
+        self.tid = tid
 
     def numeric(self) -> bool:
-        return self == Type.INT or self == Type.CHAR or self == Type.FLOAT
+        return self.tid < _BASIC_COUNT and _NUMERIC[self.tid]
 
     @staticmethod
     def max(p1: "Type", p2: "Type") -> "Type | None":
-        if not (p1.numeric() and p2.numeric()):
-            return None
-        elif p1 == Type.FLOAT or p2 == Type.FLOAT:
-            return Type.FLOAT
-        elif p1 == Type.INT or p2 == Type.INT:
-            return Type.INT
-        else:
-            return Type.CHAR
+        "The type arithmetic on `p1` and `p2` is done in, if any."
+        i, j = p1.tid, p2.tid
+        if i < _BASIC_COUNT and j < _BASIC_COUNT:
+            return _MAX[i * _BASIC_COUNT + j]
+        return None
+
+    @staticmethod
+    def assignable(p1: "Type", p2: "Type") -> bool:
+        "Whether a value of type `p2` can be stored in a scalar of type `p1`."
+        i, j = p1.tid, p2.tid
+        return i < _BASIC_COUNT and j < _BASIC_COUNT and _ASSIGNABLE[i * _BASIC_COUNT + j]
+
 
+Type.INT = Type("int", Tag.BASIC, 4, 0)
+Type.FLOAT = Type("float", Tag.BASIC, 8, 1)
+Type.CHAR = Type("char", Tag.BASIC, 1, 2)
+Type.BOOL = Type("bool", Tag.BASIC, 1, 3)
 
-Type.INT = Type("int", Tag.BASIC, 4)
-Type.FLOAT = Type("float", Tag.BASIC, 8)
-Type.CHAR = Type("char", Tag.BASIC, 1)
-Type.BOOL = Type("bool", Tag.BASIC, 1)
+_TYPES = [Type.INT, Type.FLOAT, Type.CHAR, Type.BOOL]
+_NUMERIC = [p is not Type.BOOL for p in _TYPES]
+
+
+def _max(p1: Type, p2: Type) -> Type | None:
+    if not (_NUMERIC[p1.tid] and _NUMERIC[p2.tid]):
+        return None
+    elif p1 is Type.FLOAT or p2 is Type.FLOAT:
+        return Type.FLOAT
+    elif p1 is Type.INT or p2 is Type.INT:
+        return Type.INT
+    else:
+        return Type.CHAR
+
+
+# indexed by `p1.tid * _BASIC_COUNT + p2.tid`
+_MAX = [_max(p1, p2) for p1 in _TYPES for p2 in _TYPES]
+_ASSIGNABLE = [
+    (_NUMERIC[p1.tid] and _NUMERIC[p2.tid]) or p1 is p2 is Type.BOOL
+    for p1 in _TYPES
+    for p2 in _TYPES
+]
 
 
 class Array(Type):
+    __slots__ = ("size", "of")
+
     def __init__(self, sz: int, p: Type) -> None:
         super().__init__("[]", Tag.INDEX, sz * p.width)
         self.size = sz
@@ -22,6 +22,8 @@ class Tag:
 
 
 class Token:
+    __slots__ = ("tag",)
+
     def __init__(self, tag: int) -> None:
         """
         Token constructor.
@@ -47,6 +49,8 @@ class Token:
 
 
 class Num(Token):
+    __slots__ = ("value",)
+
     def __init__(self, value: int) -> None:
         super().__init__(Tag.NUM)
         self.value = value
@@ -56,6 +60,8 @@ class Num(Token):
 
 
 class Real(Token):
+    __slots__ = ("value",)
+
     def __init__(self, value: float) -> None:
         super().__init__(Tag.REAL)
         self.value = value
@@ -65,6 +71,8 @@ class Real(Token):
 
 
 class Word(Token):
+    __slots__ = ("lexeme",)
+
     def __init__(self, s: str, tag: int) -> None:
         super().__init__(tag)
         self.lexeme = s
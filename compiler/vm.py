@@ -0,0 +1,302 @@
+"""
+A virtual machine that runs the three-address code.
+
+`VM` translates the instructions into bytecode: every instruction
+becomes five integers in an `array`, an opcode and four operands.
+Scalar variables, temporaries and constants live in a register file;
+arrays live in a flat data segment of `Parser.used` bytes, each one
+at its `Id.offset` and read through a memoryview of its element type.
+Scalars are written to the data segment when the program ends.
+
+Instructions run in one dispatch loop over the bytecode. Integer
+division truncates toward zero, and a value assigned to an `int` or
+`char` from a `float` is truncated the same way.
+"""
+
+from compiler.ir import *
+from compiler.intermediate import Constant, Id, Temp
+from compiler.symbols import Array, Type
+from compiler.error import ExecutionError
+from array import array
+import struct
+
+HALT = 0
+MOV = 1
+TRUNC = 2
+NEG = 3
+ADD = 4
+SUB = 5
+MUL = 6
+IDIV = 7
+FDIV = 8
+LOADM = 9
+STOREM = 10
+JMP = 11
+JT = 12
+JF = 13
+JLT = 14
+JLE = 15
+JGT = 16
+JGE = 17
+JEQ = 18
+JNE = 19
+
+WIDTH = 5  # integers per instruction
+
+_ARITH = {"+": ADD, "-": SUB, "*": MUL}
+_RELATIONS = {"<": JLT, "<=": JLE, ">": JGT, ">=": JGE, "==": JEQ, "!=": JNE}
+_NEGATED = {"<": ">=", "<=": ">", ">": "<=", ">=": "<", "==": "!=", "!=": "=="}
+
+# memoryview formats and initial values of the basic types
+FORMATS = {"int": "i", "float": "d", "char": "b", "bool": "?"}
+_ZEROS = {"int": 0, "float": 0.0, "char": 0, "bool": False}
+SHIFTS = {1: 0, 4: 2, 8: 3}
+
+
+def element_type(p: Type) -> Type:
+    "The basic type of the elements of `p`, or `p` itself."
+    while isinstance(p, Array):
+        p = p.of
+    return p
+
+
+def integral(p: Type) -> bool:
+    return p == Type.INT or p == Type.CHAR
+
+
+class VM:
+    """
+    Bytecode of a list of instructions, and the machine state that
+    runs it: `registers` and the data segment `memory`.
+
+    `ids` names the variables the code uses; when several have the
+    same name, it keeps the one declared first.
+    """
+
+    code: array
+    registers: list
+    memory: bytearray
+    ids: dict[str, Id]
+
+    def __init__(self, instrs: list[tuple], used: int) -> None:
+        self.code = array("q")
+        self.registers = []
+        self.memory = bytearray(used)
+        self.ids = {}
+        self._regs: dict[object, int] = {}
+        self._scalars: dict[Id, int] = {}
+        self._arrays: dict[Id, int] = {}
+        self._views: list[memoryview] = []
+        self._source: list[tuple] = []
+        self._compile(instrs)
+
+    def _reg(self, x) -> int:
+        "The register of the operand `x`."
+        if isinstance(x, Constant):
+            key = (x.type.lexeme, x.value)
+        elif isinstance(x, Temp):
+            key = x.number
+        elif isinstance(x, Id):
+            key = x
+        else:
+            raise ValueError("Operand %s is not a variable, temporary or constant." % x)
+        r = self._regs.get(key)
+        if r is None:
+            r = self._regs[key] = len(self.registers)
+            if isinstance(x, Constant):
+                self.registers.append(x.value)
+            else:
+                self.registers.append(_ZEROS[x.type.lexeme])
+            if isinstance(x, Id):
+                self._scalars[x] = r
+                self._name(x)
+        return r
+
+    def _view(self, a: Id) -> int:
+        "The index of the memoryview over the elements of the array `a`."
+        k = self._arrays.get(a)
+        if k is None:
+            fmt = FORMATS[element_type(a.type).lexeme]
+            segment = memoryview(self.memory)[a.offset : a.offset + a.type.width]
+            k = self._arrays[a] = len(self._views)
+            self._views.append(segment.cast(fmt))
+            self._name(a)
+        return k
+
+    def _name(self, x: Id) -> None:
+        name = x.op.lexeme
+        if name not in self.ids or x.offset < self.ids[name].offset:
+            self.ids[name] = x
+
+    def _emit(self, instr: tuple, *words: int) -> None:
+        self.code.extend(words + (0,) * (WIDTH - len(words)))
+        self._source.append(instr)
+
+    def _truncate(self, instr: tuple, dst, p: Type) -> None:
+        "Truncates `dst` after `instr` computed it in type `p`, if it is integral."
+        if integral(dst.type) and p == Type.FLOAT:
+            r = self._reg(dst)
+            self._emit(instr, TRUNC, r, r)
+
+    def _compile(self, instrs: list[tuple]) -> None:
+        targets: dict[int, int] = {}
+        fixups: list[tuple[int, int]] = []
+        scratch = len(self.registers)
+        self.registers.append(0)
+        for instr in instrs:
+            c = instr[0]
+            if c == LABEL:
+                targets[instr[1]] = len(self.code)
+            elif c == COPY:
+                dst, x = instr[1], instr[2]
+                self._emit(instr, MOV, self._reg(dst), self._reg(x))
+                self._truncate(instr, dst, x.type)
+            elif c == UNARY:
+                dst, x = instr[1], instr[3]
+                self._emit(instr, NEG, self._reg(dst), self._reg(x))
+                self._truncate(instr, dst, x.type)
+            elif c == BINARY:
+                dst, x, o, y = instr[1:]
+                if o != "/":
+                    kind = _ARITH[o]
+                elif integral(x.type) and integral(y.type):
+                    kind = IDIV
+                else:
+                    kind = FDIV
+                self._emit(instr, kind, self._reg(dst), self._reg(x), self._reg(y))
+                self._truncate(instr, dst, Type.max(x.type, y.type))
+            elif c == LOAD:
+                dst, a, i = instr[1:]
+                shift = SHIFTS[element_type(a.type).width]
+                self._emit(instr, LOADM, self._reg(dst), self._view(a), self._reg(i), shift)
+                self._truncate(instr, dst, element_type(a.type))
+            elif c == STORE:
+                a, i, x = instr[1:]
+                s = self._reg(x)
+                p = element_type(a.type)
+                if integral(p) and x.type == Type.FLOAT:
+                    self._emit(instr, TRUNC, scratch, s)
+                    s = scratch
+                shift = SHIFTS[p.width]
+                self._emit(instr, STOREM, self._view(a), self._reg(i), s, shift)
+            else:
+                if c == GOTO:
+                    kind, x, y = JMP, 0, 0
+                elif instr[3] is None:
+                    kind, x, y = (JT if c == IF else JF), self._reg(instr[2]), 0
+                else:
+                    o = instr[3] if c == IF else _NEGATED[instr[3]]
+                    kind, x, y = _RELATIONS[o], self._reg(instr[2]), self._reg(instr[4])
+                fixups.append((len(self.code) + 3, instr[1]))
+                self._emit(instr, kind, x, y, 0)
+        self._emit((LABEL, 0), HALT)
+        for at, label in fixups:
+            self.code[at] = targets[label]
+
+    def array(self, name: str) -> memoryview:
+        "The elements of the array `name`, flattened to one dimension."
+        return self._views[self._view(self.ids[name])]
+
+    def scalar(self, name: str) -> object:
+        "The value of the scalar variable `name`."
+        return self.registers[self._scalars[self.ids[name]]]
+
+    def run(self) -> int:
+        """
+        Runs the code from the start, and returns the number of
+        instructions executed. An `ExecutionError` is raised on
+        division by zero, or on an index out of the bounds of an array.
+        """
+        code = self.code.tolist()
+        r = self.registers
+        views = self._views
+        pc = 0
+        n = 0
+        try:
+            while True:
+                o = code[pc]
+                n += 1
+                if o == LOADM:
+                    i = r[code[pc + 3]]
+                    if i < 0:
+                        raise IndexError
+                    r[code[pc + 1]] = views[code[pc + 2]][i >> code[pc + 4]]
+                    pc += WIDTH
+                elif o == ADD:
+                    r[code[pc + 1]] = r[code[pc + 2]] + r[code[pc + 3]]
+                    pc += WIDTH
+                elif o == MUL:
+                    r[code[pc + 1]] = r[code[pc + 2]] * r[code[pc + 3]]
+                    pc += WIDTH
+                elif o == JLT:
+                    pc = code[pc + 3] if r[code[pc + 1]] < r[code[pc + 2]] else pc + WIDTH
+                elif o == JGT:
+                    pc = code[pc + 3] if r[code[pc + 1]] > r[code[pc + 2]] else pc + WIDTH
+                elif o == MOV:
+                    r[code[pc + 1]] = r[code[pc + 2]]
+                    pc += WIDTH
+                elif o == SUB:
+                    r[code[pc + 1]] = r[code[pc + 2]] - r[code[pc + 3]]
+                    pc += WIDTH
+                elif o == STOREM:
+                    i = r[code[pc + 2]]
+                    if i < 0:
+                        raise IndexError
+                    views[code[pc + 1]][i >> code[pc + 4]] = r[code[pc + 3]]
+                    pc += WIDTH
+                elif o == JMP:
+                    pc = code[pc + 3]
+                elif o == JGE:
+                    pc = code[pc + 3] if r[code[pc + 1]] >= r[code[pc + 2]] else pc + WIDTH
+                elif o == JLE:
+                    pc = code[pc + 3] if r[code[pc + 1]] <= r[code[pc + 2]] else pc + WIDTH
+                elif o == JEQ:
+                    pc = code[pc + 3] if r[code[pc + 1]] == r[code[pc + 2]] else pc + WIDTH
+                elif o == JNE:
+                    pc = code[pc + 3] if r[code[pc + 1]] != r[code[pc + 2]] else pc + WIDTH
+                elif o == JT:
+                    pc = code[pc + 3] if r[code[pc + 1]] else pc + WIDTH
+                elif o == JF:
+                    pc = code[pc + 3] if not r[code[pc + 1]] else pc + WIDTH
+                elif o == IDIV:
+                    x = r[code[pc + 2]]
+                    y = r[code[pc + 3]]
+                    q = abs(x) // abs(y)
+                    r[code[pc + 1]] = q if (x < 0) == (y < 0) else -q
+                    pc += WIDTH
+                elif o == FDIV:
+                    r[code[pc + 1]] = r[code[pc + 2]] / r[code[pc + 3]]
+                    pc += WIDTH
+                elif o == NEG:
+                    r[code[pc + 1]] = -r[code[pc + 2]]
+                    pc += WIDTH
+                elif o == TRUNC:
+                    r[code[pc + 1]] = int(r[code[pc + 2]])
+                    pc += WIDTH
+                else:  # HALT
+                    n -= 1
+                    break
+        except ZeroDivisionError:
+            self._fail("Division by zero", pc)
+        except IndexError:
+            self._fail("Array index out of bounds", pc)
+        except (ValueError, OverflowError, TypeError):
+            self._fail("Value out of the range of its type", pc)
+        self._write_scalars()
+        return n
+
+    def _fail(self, message: str, pc: int) -> None:
+        instr = format_instr(self._source[pc // WIDTH]).strip()
+        raise ExecutionError("Runtime error: %s, at:\n%s" % (message, instr))
+
+    def _write_scalars(self) -> None:
+        "Writes the value of each scalar variable to its place in memory."
+        for x, reg in self._scalars.items():
+            fmt = FORMATS[x.type.lexeme]
+            try:
+                struct.pack_into(fmt, self.memory, x.offset, self.registers[reg])
+            except struct.error:
+                raise ExecutionError(
+                    "Runtime error: %s = %r is out of the range of its type."
+                    % (x, self.registers[reg])
+                )
@@ -0,0 +1,34 @@
+"""
+Compiling and running programs for the tests.
+"""
+
+from compiler.context import CompilationContext
+from compiler.lexer import Lexer
+from compiler.parser import Parser
+from compiler.ir import Code
+from compiler.vm import VM
+from compiler.pyback import PythonProgram
+
+
+def compile_source(text: str, opt_level: int = 0) -> tuple[Parser, list[tuple]]:
+    "The parser that compiled `text`, and the code it generated."
+    ctx = CompilationContext(out=Code(), opt_level=opt_level)
+    parser = Parser(Lexer(text, ctx=ctx))
+    parser.program()
+    return parser, ctx.out.instrs
+
+
+def run_vm(text: str, opt_level: int = 0) -> VM:
+    "The virtual machine after running `text` compiled at `opt_level`."
+    parser, instrs = compile_source(text, opt_level)
+    vm = VM(instrs, parser.used)
+    vm.run()
+    return vm
+
+
+def run_python(text: str, opt_level: int = 0) -> PythonProgram:
+    "`text` compiled at `opt_level` and run translated into Python."
+    parser, _ = compile_source(text, opt_level)
+    program = PythonProgram(parser.tree, parser.used)
+    program.run()
+    return program
@@ -0,0 +1,110 @@
+"""
+The virtual machine and the Python backend run programs alike.
+"""
+
+from benchmarks.generator import ProgramGenerator
+from compiler.error import ExecutionError
+from compiler.vm import VM
+from compiler.pyback import PythonProgram
+from tests.helpers import compile_source, run_python, run_vm
+import signal
+import unittest
+
+BACKENDS = {"vm": run_vm, "python": run_python}
+LEVELS = (0, 1, 2)
+
+
+class Timeout(Exception):
+    pass
+
+
+def _alarm(signum, frame):
+    raise Timeout
+
+
+def _outcome(program, seconds: float) -> tuple[object, str | None]:
+    """
+    `program` after running it, or the kind of runtime error it
+    stopped on. Raises `Timeout` if it runs longer than `seconds`.
+    """
+    previous = signal.signal(signal.SIGALRM, _alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        program.run()
+        return program, None
+    except ExecutionError as err:
+        # the machine also names the instruction it stopped at
+        return None, str(err).split(",")[0].rstrip(".")
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+class TestBackends(unittest.TestCase):
+    def test_comparison_stored_to_element(self):
+        text = """{int i; int x; int y; bool[4] a; bool b;
+            i = 1; x = 1; y = 2; a[i] = x < y; b = a[i]; if (b) x = 100;}"""
+        for backend, run in BACKENDS.items():
+            for opt_level in LEVELS:
+                with self.subTest(backend=backend, opt_level=opt_level):
+                    program = run(text, opt_level)
+                    self.assertEqual(program.scalar("x"), 100)
+                    self.assertEqual(list(program.array("a")), [False, True, False, False])
+
+    def test_load_truncates(self):
+        text = "{float[2] a; char c; a[0] = 3.5; c = a[0];}"
+        for backend, run in BACKENDS.items():
+            for opt_level in LEVELS:
+                with self.subTest(backend=backend, opt_level=opt_level):
+                    self.assertEqual(run(text, opt_level).scalar("c"), 3)
+
+    def test_negative_index(self):
+        text = "{int[4] a; int i; i = 0 - 1; a[i] = 5;}"
+        for backend, run in BACKENDS.items():
+            for opt_level in LEVELS:
+                with self.subTest(backend=backend, opt_level=opt_level):
+                    with self.assertRaisesRegex(ExecutionError, "Array index out of bounds"):
+                        run(text, opt_level)
+
+    def test_load_in_loop_not_entered(self):
+        text = """{int i; int k; int s; int[4] a; i = 0; k = 10; s = 0;
+            while (i < 0) { s = s + a[k]; i = i + 1; }}"""
+        for backend, run in BACKENDS.items():
+            with self.subTest(backend=backend):
+                self.assertEqual(run(text, 2).scalar("s"), 0)
+
+    def test_generated_programs(self):
+        "Generated programs end alike on both backends, at every level."
+        seeds = list(range(150)) + [186, 260]
+        for seed in seeds:
+            text = ProgramGenerator(seed, decls=5, depth=2, expr_size=3, dims=1).program(
+                statements=20
+            )
+            for opt_level in LEVELS:
+                parser, instrs = compile_source(text, opt_level)
+                try:
+                    vm, vm_error = _outcome(VM(instrs, parser.used), 0.05)
+                except Timeout:
+                    # most likely a loop that does not end
+                    break
+                with self.subTest(seed=seed, opt_level=opt_level):
+                    python, python_error = _outcome(
+                        PythonProgram(parser.tree, parser.used), 5
+                    )
+                    self.assertEqual(vm_error, python_error)
+                    if vm_error is not None:
+                        continue
+                    for x, r in vm._scalars.items():
+                        if x in python._values:
+                            self.assertEqual(vm.registers[r], python._values[x], str(x))
+                    for a, k in vm._arrays.items():
+                        if a in python._arrays:
+                            self.assertEqual(
+                                vm._views[k].tolist(),
+                                python._views[python._arrays.index(a)].tolist(),
+                                str(a),
+                            )
+
+
+if __name__ == "__main__":
+    unittest.main()
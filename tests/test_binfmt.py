@@ -0,0 +1,62 @@
+"""
+Programs written in the binary format read back as they were.
+"""
+
+from benchmarks.generator import ProgramGenerator
+from compiler.binfmt import Image, dump
+from compiler.context import CompilationContext
+from compiler.intermediate import Stmt
+from compiler.ir import Code, format_instr
+from tests.helpers import compile_source
+import os
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def generated(tree: Stmt, opt_level: int) -> str:
+    "The code generated from `tree` alone, as `Parser.program()` brackets it."
+    ctx = CompilationContext(out=Code(), opt_level=opt_level)
+    with ctx:
+        begin = tree.new_label()
+        after = tree.new_label()
+        tree.emit_label(begin)
+        tree.gen(begin, after)
+        tree.emit_label(after)
+    return ctx.out.text()
+
+
+class TestBinaryFormat(unittest.TestCase):
+    def test_round_trip(self):
+        with open(os.path.join(ROOT, "example", "test_code.txt"), encoding="utf-8") as f:
+            sources = [f.read()]
+        sources += [
+            ProgramGenerator(seed, depth=4, dims=3).program(size=5000) for seed in range(5)
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "program.tacb")
+            for k, text in enumerate(sources):
+                for opt_level in (0, 1, 2):
+                    with self.subTest(source=k, opt_level=opt_level):
+                        parser, instrs = compile_source(text, opt_level)
+                        declared = parser.symbols.declared
+                        with open(path, "wb") as f:
+                            dump(f, instrs, parser.tree, declared, parser.used, parser.temp_slots)
+                        with Image.open(path) as image:
+                            code = "".join(map(format_instr, instrs))
+                            self.assertEqual(image.text(), code)
+                            self.assertEqual(image.used, parser.used)
+                            self.assertEqual(image.temp_slots, parser.temp_slots)
+                            self.assertEqual(
+                                list(image.layout()),
+                                [(x.op.lexeme, str(x.type), x.offset) for x in declared],
+                            )
+                            tree = image.tree
+                        # unoptimized code is generated from the tree as it is
+                        expected = code if opt_level == 0 else generated(parser.tree, opt_level)
+                        self.assertEqual(generated(tree, opt_level), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
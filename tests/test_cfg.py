@@ -0,0 +1,70 @@
+"""
+Dominators and natural loops of the control-flow graph.
+"""
+
+from compiler.cfg import CFG
+from compiler.ir import BINARY, COPY, GOTO, IFFALSE, LABEL
+import unittest
+
+# {i = 0; while (i < 3) { j = 0; while (j < i) { s = s + j; j = j + 1; } i = i + 1; }}
+NESTED = [
+    (COPY, "i", 0),  # B0
+    (LABEL, 4),  # B1
+    (IFFALSE, 2, "i", "<", 3),
+    (COPY, "j", 0),  # B2
+    (LABEL, 6),  # B3
+    (IFFALSE, 7, "j", "<", "i"),
+    (BINARY, "s", "s", "+", "j"),  # B4
+    (BINARY, "j", "j", "+", 1),
+    (GOTO, 6),
+    (LABEL, 7),  # B5
+    (BINARY, "i", "i", "+", 1),
+    (GOTO, 4),
+    (LABEL, 2),  # B6
+]
+
+
+class TestCFG(unittest.TestCase):
+    def setUp(self):
+        self.cfg = CFG(NESTED)
+        self.b = self.cfg.blocks
+
+    def test_blocks(self):
+        b = self.b
+        self.assertEqual(len(b), 7)
+        self.assertEqual([s.index for s in b[1].succs], [6, 2])
+        self.assertEqual([s.index for s in b[4].succs], [3])
+        self.assertEqual(sorted(p.index for p in b[3].preds), [2, 4])
+
+    def test_dominators(self):
+        b = self.b
+        idom = [d if d is None else d.index for d in self.cfg.idom]
+        self.assertEqual(idom, [None, 0, 1, 2, 3, 3, 1])
+        self.assertTrue(self.cfg.dominates(b[1], b[5]))
+        self.assertTrue(self.cfg.dominates(b[3], b[3]))
+        self.assertFalse(self.cfg.dominates(b[4], b[5]))
+        self.assertFalse(self.cfg.dominates(b[3], b[6]))
+
+    def test_nested_loops(self):
+        b = self.b
+        outer, inner = self.cfg.loops()
+        self.assertIs(outer.header, b[1])
+        self.assertEqual(outer.tails, [b[5]])
+        self.assertEqual(outer.blocks, {b[1], b[2], b[3], b[4], b[5]})
+        self.assertIsNone(outer.parent)
+        self.assertEqual(outer.depth, 1)
+        self.assertIs(inner.header, b[3])
+        self.assertEqual(inner.tails, [b[4]])
+        self.assertEqual(inner.blocks, {b[3], b[4]})
+        self.assertIs(inner.parent, outer)
+        self.assertEqual(inner.depth, 2)
+
+    def test_unreachable_block(self):
+        cfg = CFG([(GOTO, 1), (COPY, "x", 0), (LABEL, 1)])
+        self.assertEqual(cfg.idom, [None, None, cfg.blocks[0]])
+        self.assertFalse(cfg.dominates(cfg.blocks[0], cfg.blocks[1]))
+        self.assertEqual(cfg.loops(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
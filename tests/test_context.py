@@ -0,0 +1,67 @@
+"""
+Compilations running side by side keep their state apart.
+"""
+
+from benchmarks.generator import ProgramGenerator
+from compiler.context import CompilationContext
+from compiler.ir import Code, format_instr
+from compiler.lexer import Lexer
+from compiler.parser import Parser
+from tests.helpers import compile_source
+import threading
+import unittest
+
+
+class LockstepCode(Code):
+    "Code that waits for the other thread after every instruction."
+
+    def __init__(self, barrier: threading.Barrier) -> None:
+        super().__init__()
+        self.barrier = barrier
+        self.emit = self.lockstep
+
+    def lockstep(self, instr: tuple) -> None:
+        self.instrs.append(instr)
+        try:
+            self.barrier.wait(timeout=5)
+        except threading.BrokenBarrierError:
+            # the other compilation has ended
+            pass
+
+
+class TestThreads(unittest.TestCase):
+    def test_compilations_in_threads(self):
+        texts = [ProgramGenerator(seed).program(statements=40) for seed in (1, 2)]
+        for opt_level in (0, 1):
+            expected = [
+                "".join(map(format_instr, compile_source(text, opt_level)[1]))
+                for text in texts
+            ]
+            barrier = threading.Barrier(2)
+            sinks = [LockstepCode(barrier) for _ in texts]
+            errors: list[BaseException] = []
+
+            def compile_in_thread(text: str, sink: Code) -> None:
+                try:
+                    ctx = CompilationContext(out=sink, opt_level=opt_level)
+                    Parser(Lexer(text, ctx=ctx)).program()
+                except BaseException as err:
+                    errors.append(err)
+                finally:
+                    barrier.abort()
+
+            threads = [
+                threading.Thread(target=compile_in_thread, args=args)
+                for args in zip(texts, sinks)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            with self.subTest(opt_level=opt_level):
+                self.assertEqual(errors, [])
+                self.assertEqual([sink.text() for sink in sinks], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
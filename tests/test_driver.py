@@ -0,0 +1,64 @@
+"""
+Batches of files, and the compile server.
+"""
+
+from compiler.driver import compile_batch
+from compiler.server import compile_request
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write(path: str, text: str) -> str:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
+
+
+class TestBatch(unittest.TestCase):
+    def test_failing_files_fail_alone(self):
+        with tempfile.TemporaryDirectory() as directory:
+            sources = [
+                write(os.path.join(directory, "ok.txt"), "{int x; x = 1;}"),
+                write(os.path.join(directory, "trunc.txt"), "{int x; x = "),
+                os.path.join(directory, "missing.txt"),
+                write(os.path.join(directory, "ok2.txt"), "{int x; x = 2;}"),
+            ]
+            out = os.path.join(directory, "out")
+            results = compile_batch(sources, out_dir=out)
+            self.assertEqual([r.ok for r in results], [True, False, False, True])
+            with open(os.path.join(out, "missing.tac"), encoding="utf-8") as f:
+                self.assertIn("FileNotFoundError", f.read())
+
+    def test_glob_pattern_is_a_batch(self):
+        with tempfile.TemporaryDirectory() as directory:
+            write(os.path.join(directory, "a.txt"), "{int x; x = 1;}")
+            write(os.path.join(directory, "b.txt"), "{int x; x = 2;}")
+            env = dict(os.environ, PYTHONPATH=ROOT)
+            done = subprocess.run(
+                [sys.executable, "-m", "compiler", "*.txt"],
+                cwd=directory,
+                env=env,
+                capture_output=True,
+                text=True,
+            )
+            self.assertIn("2 files, 0 failed", done.stdout, done.stderr)
+            self.assertTrue(os.path.exists(os.path.join(directory, "a.tac")))
+
+
+class TestServer(unittest.TestCase):
+    def test_crashing_source_fails(self):
+        reply = compile_request({"source": "{int x; x = "})
+        self.assertIn("failure", reply)
+
+    def test_parse_error(self):
+        reply = compile_request({"source": "{int x; y = 1;}"})
+        self.assertIn("'y' undeclared", reply["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
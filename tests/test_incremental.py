@@ -0,0 +1,46 @@
+"""
+Blocks compiled from the cache come out as without it.
+"""
+
+from compiler.context import CompilationContext
+from compiler.error import ParseError
+from compiler.incremental import BlockCache
+from compiler.ir import Code
+from compiler.lexer import Lexer
+from compiler.parser import Parser
+import tempfile
+import unittest
+
+
+def compile_cached(text: str, directory: str, opt_level: int = 1) -> BlockCache:
+    cache = BlockCache(directory)
+    ctx = CompilationContext(out=Code(), opt_level=opt_level)
+    try:
+        Parser(Lexer(text, ctx=ctx), cache=cache).program()
+    finally:
+        cache.save()
+    return cache
+
+
+class TestIncremental(unittest.TestCase):
+    def test_folded_away_name_is_checked(self):
+        block = "{ int k; k = x + 1; if (false) y = true; z = k; }"
+        with tempfile.TemporaryDirectory() as directory:
+            cache = compile_cached("{int x; bool y; int z; %s}" % block, directory)
+            self.assertEqual(cache.misses, 1)
+            cache = compile_cached("{int x; bool y; int z; %s}" % block, directory)
+            self.assertEqual(cache.hits, 1)
+            # the same layout, without `y`
+            with self.assertRaisesRegex(ParseError, "'y' undeclared"):
+                compile_cached("{int x; bool w; int z; %s}" % block, directory)
+
+    def test_folded_away_type_is_checked(self):
+        block = "{ if (false) y = 1; }"
+        with tempfile.TemporaryDirectory() as directory:
+            compile_cached("{char y; %s}" % block, directory)
+            with self.assertRaises(ParseError):
+                compile_cached("{bool y; %s}" % block, directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
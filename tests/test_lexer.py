@@ -0,0 +1,142 @@
+"""
+The scanner gives the same tokens however its input is read.
+"""
+
+from benchmarks.generator import ProgramGenerator
+from compiler.lexer import Lexer, RegexLexer
+from compiler.symbols import Type
+from compiler.tokens import Num, Real, Tag, Token, Word
+import io
+import unittest
+
+SOURCES = [
+    "{int x; x = 1;}",
+    "{ int  a1;\tfloat f;\n\n  f = 12.5 + 3.;\n a1 = a1<=2 && a1 != 3 || !(a1 >= 4);\n}",
+    "a<b>c=d!e&f|g==h\n\n\n   \t\n x 007 1.0625 toolongidentifiername\n",
+    "{}\n  no newline at the end",
+    "",
+    "\n\n\n",
+] + [ProgramGenerator(seed).program(size=2000) for seed in range(3)]
+
+BLOCK_SIZES = [1, 2, 3, 7, 64, 1 << 16]
+
+
+class CharScanner:
+    """
+    The scanner the lexer replaced, which read its input one character
+    at a time and built the line buffer as it went.
+    """
+
+    def __init__(self, f: io.StringIO) -> None:
+        self.f = f
+        self.line = 1
+        self.peek = " "
+        self.line_buffer = ""
+        self.words = {
+            w.lexeme: w
+            for w in [Word("if", Tag.IF), Word("else", Tag.ELSE), Word("while", Tag.WHILE)]
+            + [Word("do", Tag.DO), Word("break", Tag.BREAK), Word.TRUE, Word.FALSE]
+            + [Type.INT, Type.CHAR, Type.BOOL, Type.FLOAT]
+        }
+
+    def _read_char(self) -> None:
+        self.peek = self.f.read(1)
+        if self.peek != "\n":
+            self.line_buffer += self.peek
+
+    def _read_comp_char(self, c: str) -> bool:
+        self._read_char()
+        if self.peek != c:
+            return False
+        self.peek = " "
+        return True
+
+    def scan(self) -> Token | None:
+        while True:
+            if self.peek in [" ", "\t"]:
+                self._read_char()
+            elif self.peek == "\n":
+                self.line += 1
+                self.line_buffer = ""
+                self._read_char()
+            else:
+                break
+        if len(self.peek) == 0:
+            return None
+        pairs = {"&": ("&", Word.AND), "|": ("|", Word.OR), "=": ("=", Word.EQ)}
+        pairs.update({"!": ("=", Word.NE), "<": ("=", Word.LE), ">": ("=", Word.GE)})
+        if self.peek in pairs:
+            c = self.peek
+            second, w = pairs[c]
+            return w if self._read_comp_char(second) else Token.char(c)
+        if self.peek.isdigit():
+            v = 0
+            while True:
+                v = 10 * v + int(self.peek)
+                self._read_char()
+                if not self.peek.isdigit():
+                    break
+            if self.peek != ".":
+                return Num(v)
+            fl: float = v
+            deg = 10.0
+            while True:
+                self._read_char()
+                if not self.peek.isdigit():
+                    break
+                fl = fl + int(self.peek) / deg
+                deg /= 10.0
+            return Real(fl)
+        if self.peek.isalpha():
+            b = ""
+            while True:
+                b = b + self.peek
+                self._read_char()
+                if not self.peek.isalnum():
+                    break
+            if b not in self.words:
+                self.words[b] = Word(b, Tag.ID)
+            return self.words[b]
+        tok = Token.char(self.peek)
+        self.peek = " "
+        return tok
+
+
+def key(tok: Token) -> tuple:
+    return (type(tok).__name__, tok.tag, str(tok))
+
+
+def scanned(lexer: Lexer | CharScanner) -> list[tuple]:
+    "Every token of `lexer`, with the line and line buffer after it."
+    out = []
+    while True:
+        tok = lexer.scan()
+        if tok is None:
+            return out
+        out.append((key(tok), lexer.line, lexer.line_buffer))
+
+
+class LexerCase(unittest.TestCase):
+    lexer = Lexer
+
+    def test_whole_source_matches_char_scanner(self):
+        for k, text in enumerate(SOURCES):
+            with self.subTest(source=k):
+                expected = scanned(CharScanner(io.StringIO(text)))
+                self.assertEqual(scanned(self.lexer(text)), expected)
+
+    def test_blocks_match_whole_source(self):
+        for k, text in enumerate(SOURCES):
+            expected = scanned(Lexer(text))
+            for block_size in BLOCK_SIZES:
+                with self.subTest(source=k, block_size=block_size):
+                    got = scanned(self.lexer(io.StringIO(text), block_size=block_size))
+                    self.assertEqual(got, expected)
+
+
+class RegexLexerCase(LexerCase):
+    lexer = RegexLexer
+
+
+if __name__ == "__main__":
+    unittest.main()
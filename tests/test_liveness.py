@@ -0,0 +1,75 @@
+"""
+Temporaries share slots only while one of them is dead.
+"""
+
+from compiler.cfg import CFG
+from compiler.context import CompilationContext
+from compiler.intermediate import Temp
+from compiler.ir import BINARY, COPY, IF, LABEL
+from compiler.liveness import defined, liveness, renumber_temps, uses
+from compiler.symbols import Type
+import unittest
+
+
+def _live_sets(instrs: list[tuple]) -> list[list[Temp]]:
+    "The temporaries live right after each instruction of `instrs`."
+    cfg = CFG(instrs)
+    _, live_out = liveness(cfg)
+    sets: list[list[Temp]] = []
+    for k, block in enumerate(cfg.blocks):
+        live = set(live_out[k])
+        after: list[list[Temp]] = []
+        for instr in reversed(block.instrs):
+            after.append(list(live))
+            live.discard(defined(instr))
+            live.update(x for x in uses(instr) if isinstance(x, Temp))
+        sets.extend(reversed(after))
+    return sets
+
+
+class TestLiveness(unittest.TestCase):
+    def setUp(self):
+        self.ctx = CompilationContext()
+        self.ctx.__enter__()
+        self.addCleanup(self.ctx.__exit__)
+
+    def assertNoSharedSlot(self, instrs):
+        for k, live in enumerate(_live_sets(instrs)):
+            numbers = [t.number for t in live]
+            self.assertEqual(len(numbers), len(set(numbers)), (k, live))
+
+    def test_straight_line(self):
+        t1, t2, t3, t4 = [Temp(Type.INT) for _ in range(4)]
+        instrs = [
+            (BINARY, t1, "a", "+", 1),
+            (BINARY, t2, "a", "+", 2),
+            (BINARY, t3, t1, "*", t2),
+            (BINARY, t4, t3, "+", 1),
+            (COPY, "x", t4),
+        ]
+        self.assertEqual(renumber_temps(instrs), 2)
+        self.assertNoSharedSlot(instrs)
+        # a result takes the slot of an operand read for the last time
+        self.assertEqual(t4.number, t3.number)
+
+    def test_live_around_loop(self):
+        # t1 is live across the back edge, so t2 and t3 cannot take its slot
+        t1, t2, t3 = [Temp(Type.INT) for _ in range(3)]
+        instrs = [
+            (BINARY, t1, "a", "+", 1),
+            (LABEL, 1),
+            (BINARY, t2, "x", "+", 2),
+            (BINARY, "x", t2, "+", t1),
+            (BINARY, t3, "x", "*", 2),
+            (COPY, "y", t3),
+            (IF, 1, "x", "<", 10),
+        ]
+        self.assertEqual(renumber_temps(instrs), 2)
+        self.assertNoSharedSlot(instrs)
+        self.assertNotEqual(t2.number, t1.number)
+        self.assertNotEqual(t3.number, t1.number)
+        self.assertEqual(t3.number, t2.number)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+The optimizations keep the meaning of programs.
+"""
+
+from compiler.ir import BINARY, COPY, IFFALSE, LOAD
+from tests.helpers import compile_source, run_vm
+import unittest
+
+
+class TestOptimize(unittest.TestCase):
+    def test_truncated_value_not_reused(self):
+        # i holds f * 2.0 truncated, so x must not be copied from it
+        text = "{int i; float f; float x; f = 6.2; i = f * 2.0; x = f * 2.0;}"
+        for opt_level in (1, 2):
+            with self.subTest(opt_level=opt_level):
+                vm = run_vm(text, opt_level)
+                self.assertEqual(vm.scalar("i"), 12)
+                self.assertEqual(vm.scalar("x"), 12.4)
+
+    def test_sibling_storage_ends_values(self):
+        # x and y share storage, so x no longer holds i + j once y is assigned
+        text = "{int i; int j; {int x; x = i + j;} {int y; y = 7; i = i + j;}}"
+        parser, instrs = compile_source(text, 1)
+        x, y = [v for v in parser.symbols.declared if str(v) in ("x", "y")]
+        self.assertEqual(x.offset, y.offset)
+        self.assertEqual(instrs[-1][0], BINARY, instrs[-1])
+
+    def test_sibling_array_store_ends_values(self):
+        text = "{int i; int j; {int x; x = i + j;} {int[2] b; b[0] = 7; i = i + j;}}"
+        _, instrs = compile_source(text, 1)
+        self.assertNotIn("x", [str(instr[2]) for instr in instrs if instr[0] == COPY])
+
+    def test_loads_stay_in_loop(self):
+        text = """{int i; int k; int s; int[4] a; i = 0; k = 10; s = 0;
+            while (i < 0) { s = s + a[k]; i = i + 1; }}"""
+        _, instrs = compile_source(text, 2)
+        codes = [instr[0] for instr in instrs]
+        self.assertGreater(codes.index(LOAD), codes.index(IFFALSE))
+
+    def test_fold_division_toward_zero(self):
+        text = "{int i; int j; i = -7 / 2; j = 7 / -2;}"
+        _, instrs = compile_source(text, 1)
+        self.assertEqual([(str(x), str(v)) for _, x, v in instrs], [("i", "-3"), ("j", "-3")])
+
+    def test_division_by_zero_not_folded(self):
+        text = "{int i; i = 7 / (2 - 2);}"
+        _, instrs = compile_source(text, 1)
+        self.assertEqual(len(instrs), 1)
+        self.assertEqual(instrs[0][0], BINARY)
+        self.assertEqual((instrs[0][3], str(instrs[0][4])), ("/", "0"))
+
+    def test_fold_truncates_assigned_float(self):
+        text = "{int i; char c; float f; i = 3.5; c = -2.5; f = 3.5;}"
+        _, instrs = compile_source(text, 1)
+        self.assertEqual([str(instr[2]) for instr in instrs], ["3", "-2", "3.5"])
+        for opt_level in (0, 1):
+            with self.subTest(opt_level=opt_level):
+                vm = run_vm(text, opt_level)
+                self.assertEqual((vm.scalar("i"), vm.scalar("c")), (3, -2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+The peephole passes clean up jumps and labels.
+"""
+
+from compiler.ir import COPY, GOTO, IF, IFFALSE, LABEL
+from compiler.peephole import drop_labels, peephole, thread_jumps
+import unittest
+
+
+class TestPeephole(unittest.TestCase):
+    def test_thread_jumps(self):
+        instrs = [
+            (IF, 1, "x", None, None),
+            (COPY, "y", 1),
+            (LABEL, 1),
+            (GOTO, 2),
+            (LABEL, 2),
+            (GOTO, 3),
+            (LABEL, 3),
+        ]
+        self.assertEqual(
+            thread_jumps(instrs),
+            [
+                (IF, 3, "x", None, None),
+                (COPY, "y", 1),
+                (LABEL, 1),
+                (GOTO, 3),
+                (LABEL, 2),
+                (GOTO, 3),
+                (LABEL, 3),
+            ],
+        )
+
+    def test_thread_jumps_cycle(self):
+        instrs = [(LABEL, 1), (GOTO, 2), (LABEL, 2), (GOTO, 1)]
+        self.assertEqual(thread_jumps(instrs), [(LABEL, 1), (GOTO, 1), (LABEL, 2), (GOTO, 2)])
+
+    def test_drop_labels(self):
+        instrs = [(LABEL, 1), (IF, 3, "x", None, None), (LABEL, 2), (COPY, "y", 1), (LABEL, 3)]
+        self.assertEqual(
+            drop_labels(instrs),
+            [(IF, 3, "x", None, None), (COPY, "y", 1), (LABEL, 3)],
+        )
+
+    def test_peephole(self):
+        instrs = [
+            (LABEL, 1),
+            (LABEL, 2),
+            (IF, 4, "x", "<", "y"),
+            (GOTO, 5),
+            (LABEL, 4),
+            (GOTO, 6),
+            (COPY, "z", 0),
+            (LABEL, 5),
+            (COPY, "y", 1),
+            (LABEL, 6),
+        ]
+        self.assertEqual(
+            peephole(instrs),
+            [(IF, 6, "x", "<", "y"), (COPY, "y", 1), (LABEL, 6)],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+"""
+Types and their tables.
+"""
+
+from compiler.context import CompilationContext
+from compiler.symbols import Array, Type
+from tests.helpers import compile_source
+import unittest
+
+
+class TestSymbols(unittest.TestCase):
+    def test_star_import_names(self):
+        names = {}
+        exec("from compiler.symbols import *", names)
+        self.assertNotIn("BASIC", names)
+
+    def test_arrays_made_once_per_compilation(self):
+        ctx = CompilationContext()
+        a = ctx.array(3, Type.INT)
+        self.assertIs(ctx.array(3, Type.INT), a)
+        self.assertIsNot(ctx.array(3, Type.CHAR), a)
+        self.assertIsNot(CompilationContext().array(3, Type.INT), a)
+        self.assertIsNone(Type.max(a, Type.INT))
+        self.assertFalse(Type.assignable(a, a))
+
+    def test_declared_arrays_shared(self):
+        text = "{int[3][2] a; {int[3][2] b; int[2] c;}}"
+        parser, _ = compile_source(text)
+        a, b, c = sorted(parser.symbols.declared, key=str)
+        self.assertIsInstance(a.type, Array)
+        self.assertIs(a.type, b.type)
+        self.assertIs(a.type.of, c.type)
+
+    def test_max(self):
+        self.assertIs(Type.max(Type.CHAR, Type.INT), Type.INT)
+        self.assertIs(Type.max(Type.INT, Type.FLOAT), Type.FLOAT)
+        self.assertIsNone(Type.max(Type.BOOL, Type.INT))
+
+    def test_assignable(self):
+        self.assertTrue(Type.assignable(Type.INT, Type.FLOAT))
+        self.assertTrue(Type.assignable(Type.BOOL, Type.BOOL))
+        self.assertFalse(Type.assignable(Type.BOOL, Type.INT))
+        self.assertFalse(Type.assignable(Type.CHAR, Type.BOOL))
+
+
+if __name__ == "__main__":
+    unittest.main()